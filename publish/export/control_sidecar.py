@@ -0,0 +1,103 @@
+"""Control variants stored as column-only sidecars of `final_features.parquet`.
+
+A sidecar holds `pair_id` and the control columns of one control merge, one row per
+row of the features file and in the same order, instead of a full merged copy of
+every feature column. `read_with_controls` joins the two at read time, reading only
+the requested columns, and returns what the merged output would contain.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from publish.export.export import export_to_parquet
+
+SIDECAR_SUFFIX = ".sidecar.parquet"
+
+# Schema metadata key listing the features columns that the merged output suffixes
+# with `_compact`, because the control data has a column of the same name.
+OVERLAP_METADATA_KEY = b"control_overlap"
+
+
+def sidecar_path(output_dir: str | Path, basename: str) -> Path:
+    """`final_features_control_combined_y0` -> `final_features_control_combined_y0.sidecar.parquet`."""
+    return Path(output_dir) / f"{basename}{SIDECAR_SUFFIX}"
+
+
+def sidecar_order(features: pa.Table, sort_by: Optional[Sequence[str]]) -> Optional[pa.Array]:
+    """Row order `export_to_parquet(features, sort_by=sort_by)` writes, or None if unsorted."""
+    if not sort_by:
+        return None
+    return pc.sort_indices(features, sort_keys=[(c, "ascending") for c in sort_by])
+
+
+def write_control_sidecar(
+    controls: pd.DataFrame,
+    path: str | Path,
+    *,
+    order: Optional[pa.Array] = None,
+    **parquet_options,
+) -> Path:
+    """Write an `align_controls` frame, taking its rows in `order` (see `sidecar_order`).
+
+    `parquet_options` are passed to `export_to_parquet`; a sidecar is always a single,
+    unpartitioned file.
+    """
+    table = pa.Table.from_pandas(controls, preserve_index=False)
+    if order is not None:
+        table = table.take(order)
+    metadata = dict(table.schema.metadata or {})
+    metadata[OVERLAP_METADATA_KEY] = json.dumps(controls.attrs.get("control_overlap", [])).encode()
+    table = table.replace_schema_metadata(metadata)
+    return export_to_parquet(table, path, **parquet_options)
+
+
+def _overlap(schema: pa.Schema) -> list[str]:
+    return json.loads((schema.metadata or {}).get(OVERLAP_METADATA_KEY, b"[]"))
+
+
+def read_with_controls(
+    features_path: str | Path,
+    sidecar: str | Path,
+    *,
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """`final_features` joined with a control sidecar, as in the merged control output.
+
+    `columns` are names of the merged output (e.g. `journal_impact_compact` when the
+    control data also has `journal_impact`); only those are read from either file. Rows
+    are matched by position when both files have the same `pair_id` sequence, and by
+    `pair_id` otherwise (e.g. for a hive-partitioned features output).
+    """
+    features_schema = pq.ParquetDataset(features_path).schema
+    sidecar_schema = pq.read_schema(sidecar)
+    overlap = set(_overlap(sidecar_schema))
+    renamed = {c: f"{c}_compact" if c in overlap else c for c in features_schema.names}
+    control_names = [c for c in sidecar_schema.names if c != "pair_id"]
+    names = [renamed[c] for c in features_schema.names] + control_names
+    wanted = names if columns is None else list(columns)
+    unknown = [c for c in wanted if c not in names]
+    if unknown:
+        raise ValueError(f"read_with_controls: unknown columns: {', '.join(unknown)}")
+
+    source = {new: old for old, new in renamed.items()}
+    feature_columns = [source[c] for c in wanted if c in source]
+    control_columns = [c for c in wanted if c in control_names]
+    features = pq.read_table(features_path, columns=list(dict.fromkeys(["pair_id", *feature_columns])))
+    controls = pq.read_table(sidecar, columns=["pair_id", *control_columns])
+
+    if not features["pair_id"].equals(controls["pair_id"]):
+        rows = pc.index_in(features["pair_id"], value_set=controls["pair_id"].combine_chunks())
+        controls = controls.take(rows)
+
+    # Each side is converted with its own pandas metadata, so nullable dtypes survive.
+    features_df = features.select(feature_columns).to_pandas()
+    features_df.columns = [renamed[c] for c in feature_columns]
+    controls_df = controls.select(control_columns).to_pandas()
+    return pd.concat([features_df, controls_df], axis=1)[wanted]
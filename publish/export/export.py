@@ -1,10 +1,19 @@
 """Prepare and export the final feature set."""
 from __future__ import annotations
 
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Sequence
+from typing import Optional, Sequence
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 
 from publish.utils import strip_illegal_excel_chars
 
@@ -35,8 +44,16 @@ FINAL_COLUMNS = [
     "word_overlap_score",
     "semantic_similarity_score",
     "citation_overlap_score",
+    "corpus_coupling_count",
+    "co_citation_count",
     "previous_experience",
     "previous_experience_first_last",
+    "author_prior_pairs_1y",
+    "author_prior_pairs_3y",
+    "author_prior_pairs_5y",
+    "inventor_prior_pairs_1y",
+    "inventor_prior_pairs_3y",
+    "inventor_prior_pairs_5y",
     "primary_topic_display_name",
     "primary_subfield_display_name",
     "primary_field_display_name",
@@ -84,13 +101,210 @@ def prepare_export(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def _without_pandas_metadata_for(table: pa.Table, columns: Sequence[str]) -> pa.Table:
+    """Drop pandas dtype metadata for `columns`.
+
+    Partition columns are read back as dictionary-encoded values, which conflicts with
+    the nullable dtypes recorded by pandas and makes `pd.read_parquet` fail.
+    """
+    metadata = dict(table.schema.metadata or {})
+    if b"pandas" not in metadata:
+        return table
+    pandas_meta = json.loads(metadata[b"pandas"])
+    pandas_meta["columns"] = [c for c in pandas_meta["columns"] if c.get("name") not in columns]
+    metadata[b"pandas"] = json.dumps(pandas_meta).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def export_to_parquet(
+    df: pd.DataFrame | pa.Table,
+    output_path: str | Path,
+    *,
+    partition_cols: Optional[Sequence[str]] = None,
+    sort_by: Optional[Sequence[str]] = None,
+    compression: str = "snappy",
+    compression_level: Optional[int] = None,
+    row_group_size: Optional[int] = None,
+    write_page_index: bool = False,
+    write_statistics: bool = True,
+) -> Path:
+    """Write parquet straight from Arrow, tuned for predicate pushdown.
+
+    Rows are sorted by `sort_by` (recorded as the file's sorting columns) so row-group
+    statistics and the optional page index let readers skip data. With
+    `partition_cols`, `output_path` becomes a hive-partitioned dataset directory.
+    """
+    output_path = Path(output_path)
+    table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+
+    sort_keys = [(c, "ascending") for c in sort_by or []]
+    if sort_keys:
+        table = table.sort_by(sort_keys)
+
+    partition_cols = list(partition_cols or [])
+    file_columns = [c for c in table.column_names if c not in partition_cols]
+    sorting_columns = None
+    if sort_keys:
+        file_keys = [(c, order) for c, order in sort_keys if c in file_columns]
+        if file_keys:
+            sorting_columns = pq.SortingColumn.from_ordering(
+                table.select(file_columns).schema, file_keys
+            )
+
+    write_options = dict(
+        compression=compression,
+        compression_level=compression_level,
+        write_statistics=write_statistics,
+        write_page_index=write_page_index,
+        sorting_columns=sorting_columns,
+    )
+    if not partition_cols:
+        pq.write_table(table, output_path, row_group_size=row_group_size, **write_options)
+        return output_path
+
+    table = _without_pandas_metadata_for(table, partition_cols)
+    if output_path.is_file():
+        output_path.unlink()
+    elif output_path.exists():
+        shutil.rmtree(output_path)
+    row_group_kwargs = (
+        {"max_rows_per_group": row_group_size, "min_rows_per_group": row_group_size}
+        if row_group_size
+        else {}
+    )
+    ds.write_dataset(
+        table,
+        output_path,
+        format="parquet",
+        partitioning=ds.partitioning(table.select(partition_cols).schema, flavor="hive"),
+        file_options=ds.ParquetFileFormat().make_write_options(**write_options),
+        basename_template="part-{i}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        **row_group_kwargs,
+    )
+    return output_path
+
+
 def export_to_excel(df: pd.DataFrame, output_path: str | Path) -> Path:
     output_path = Path(output_path)
     df.to_excel(output_path, index=False)
     return output_path
 
 
-def export_to_csv(df: pd.DataFrame, output_path: str | Path) -> Path:
+LIST_FORMATS = ("json", "delimited")
+
+# (pattern, replacement) applied in order to list elements that are JSON strings.
+_JSON_STRING_ESCAPES = [
+    (r"\\", r"\\\\"),
+    (r'"', r'\\"'),
+    (r"\n", r"\\n"),
+    (r"\r", r"\\r"),
+    (r"\t", r"\\t"),
+    # Other control characters are dropped, as `strip_illegal_excel_chars` does.
+    (r"[\x00-\x08\x0b\x0c\x0e-\x1f]", ""),
+]
+
+
+def _list_arrays(array: pa.Array | pa.ChunkedArray) -> list[pa.Array]:
+    return array.chunks if isinstance(array, pa.ChunkedArray) else [array]
+
+
+def _encode_elements(values: pa.Array, list_format: str, delimiter: str) -> pa.Array:
+    """Text for each list element; missing elements become `null` (or empty)."""
+    if pa.types.is_list(values.type) or pa.types.is_large_list(values.type):
+        # Nested lists (e.g. [lat, lon] pairs) are always written as JSON arrays.
+        return _encode_list_array(values, "json", delimiter)
+    if pa.types.is_dictionary(values.type):
+        values = values.dictionary_decode()
+    if pa.types.is_string(values.type) or pa.types.is_large_string(values.type):
+        if list_format == "json":
+            for pattern, replacement in _JSON_STRING_ESCAPES:
+                values = pc.replace_substring_regex(values, pattern, replacement)
+            values = pc.binary_join_element_wise('"', values, '"', "")
+    else:
+        values = pc.cast(values, pa.string())
+    return pc.fill_null(values, "null" if list_format == "json" else "")
+
+
+def _encode_list_array(array: pa.Array, list_format: str, delimiter: str) -> pa.Array:
+    elements = _encode_elements(array.values, list_format, delimiter)
+    array_type = pa.LargeListArray if pa.types.is_large_list(array.type) else pa.ListArray
+    lists = array_type.from_arrays(array.offsets, elements, mask=array.is_null())
+    if list_format == "json":
+        return pc.binary_join_element_wise("[", pc.binary_join(lists, ", "), "]", "")
+    return pc.binary_join(lists, delimiter)
+
+
+def encode_list_column(
+    array: pa.Array | pa.ChunkedArray,
+    *,
+    list_format: str = "json",
+    delimiter: str = "; ",
+) -> pa.ChunkedArray:
+    """Encode an Arrow list column as one string per row, without per-cell Python work.
+
+    `list_format="json"` gives JSON arrays (`["C_12", "G_01"]`); `"delimited"` joins the
+    elements with `delimiter` (`C_12; G_01`). Missing lists stay null. Both read back
+    with `publish.utils.decode_list` (pass `delimiter=` for the delimited format).
+    """
+    if list_format not in LIST_FORMATS:
+        raise ValueError(
+            f"encode_list_column: unknown list format {list_format!r}; "
+            f"expected one of {', '.join(LIST_FORMATS)}"
+        )
+    return pa.chunked_array(
+        [_encode_list_array(chunk, list_format, delimiter) for chunk in _list_arrays(array)],
+        type=pa.string(),
+    )
+
+
+def _csv_table(table: pa.Table, list_format: str, delimiter: str) -> pa.Table:
+    """Replace list columns with their encoded text and booleans with `True`/`False`."""
+    for i, field in enumerate(table.schema):
+        column = table.column(i)
+        if pa.types.is_list(field.type) or pa.types.is_large_list(field.type):
+            column = encode_list_column(column, list_format=list_format, delimiter=delimiter)
+        elif pa.types.is_boolean(field.type):
+            # Keep the pandas spelling used by earlier CSV outputs.
+            column = pc.if_else(column, "True", "False")
+        else:
+            continue
+        table = table.set_column(i, field.name, column)
+    return table
+
+
+def _csv_bytes(table: pa.Table, include_header: bool) -> bytes:
+    sink = pa.BufferOutputStream()
+    pa_csv.write_csv(table, sink, write_options=pa_csv.WriteOptions(include_header=include_header))
+    return sink.getvalue().to_pybytes()
+
+
+def export_to_csv(
+    df: pd.DataFrame | pa.Table,
+    output_path: str | Path,
+    *,
+    list_format: str = "json",
+    list_delimiter: str = "; ",
+    threads: Optional[int] = None,
+    chunk_rows: int = 50_000,
+) -> Path:
+    """Write CSV from Arrow, encoding row slices on `threads` threads.
+
+    List columns are encoded with `encode_list_column`. Slices are serialized in
+    parallel and appended to the file in row order.
+    """
     output_path = Path(output_path)
-    df.to_csv(output_path, index=False)
+    table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+    table = _csv_table(table, list_format, list_delimiter)
+
+    threads = threads or os.cpu_count() or 1
+    starts = list(range(0, table.num_rows, chunk_rows)) or [0]
+    with ThreadPoolExecutor(max_workers=threads) as pool, open(output_path, "wb") as f:
+        # Submit a bounded window of slices at a time so memory stays proportional to
+        # `threads * chunk_rows` rather than to the whole output.
+        for window in range(0, len(starts), threads * 2):
+            slices = [table.slice(start, chunk_rows) for start in starts[window : window + threads * 2]]
+            headers = [window == 0 and i == 0 for i in range(len(slices))]
+            for data in pool.map(_csv_bytes, slices, headers):
+                f.write(data)
     return output_path
@@ -0,0 +1,159 @@
+"""Sorted `pair_id` index of a parquet output, for reading individual pairs.
+
+`write_pair_index` records, for every row of a parquet file or hive-partitioned
+dataset, its key, file, row group and offset within the row group, sorted by key.
+`PairIndex` binary-searches that index and reads only the row groups that hold the
+requested pairs.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+INDEX_SUFFIX = ".pair_index.parquet"
+
+
+def pair_index_path(parquet_path: str | Path) -> Path:
+    """Sidecar path of the index: `final_features.parquet` -> `final_features.pair_index.parquet`."""
+    parquet_path = Path(parquet_path)
+    return parquet_path.with_name(parquet_path.name.removesuffix(".parquet") + INDEX_SUFFIX)
+
+
+def _data_files(parquet_path: Path) -> list[Path]:
+    if parquet_path.is_file():
+        return [parquet_path]
+    return sorted(parquet_path.rglob("*.parquet"))
+
+
+def _file_index(path: Path, relative: str, key: str) -> pa.Table:
+    parquet_file = pq.ParquetFile(path)
+    sizes = [
+        parquet_file.metadata.row_group(i).num_rows
+        for i in range(parquet_file.metadata.num_row_groups)
+    ]
+    keys = parquet_file.read(columns=[key])[key]
+    return pa.table(
+        {
+            key: keys.cast(pa.string()),
+            "file": pa.array([relative] * len(keys), type=pa.string()).dictionary_encode(),
+            "row_group": pa.array(np.repeat(np.arange(len(sizes), dtype=np.int32), sizes)),
+            "row": pa.array(np.concatenate([np.arange(n, dtype=np.int64) for n in sizes] or [[]])),
+        }
+    )
+
+
+def write_pair_index(
+    parquet_path: str | Path,
+    index_path: Optional[str | Path] = None,
+    *,
+    key: str = "pair_id",
+) -> Path:
+    """Write the sorted `key` -> (file, row group, row) index of a parquet output.
+
+    Only the `key` column and the row-group metadata of each data file are read. `file`
+    is relative to `parquet_path` (empty for a single-file output).
+    """
+    parquet_path = Path(parquet_path)
+    index_path = Path(index_path) if index_path else pair_index_path(parquet_path)
+    parts = []
+    for path in _data_files(parquet_path):
+        relative = "" if path == parquet_path else path.relative_to(parquet_path).as_posix()
+        parts.append(_file_index(path, relative, key))
+    index = pa.concat_tables(parts, promote_options="permissive")
+    index = index.filter(pc.is_valid(index[key])).sort_by(key)
+    pq.write_table(
+        index,
+        index_path,
+        sorting_columns=pq.SortingColumn.from_ordering(index.schema, [(key, "ascending")]),
+    )
+    return index_path
+
+
+def _partition_values(relative: str) -> dict[str, str]:
+    """Hive partition values encoded in a data file's relative path (`year=2015/...`)."""
+    return dict(
+        part.split("=", 1) for part in Path(relative).parent.parts if "=" in part
+    )
+
+
+class PairIndex:
+    """Random access to the rows of a parquet output by `pair_id`.
+
+    The index is loaded once; each lookup is a binary search per requested key and
+    reads only the row groups holding the matches.
+    """
+
+    def __init__(
+        self,
+        parquet_path: str | Path,
+        index_path: Optional[str | Path] = None,
+        *,
+        key: str = "pair_id",
+    ):
+        self.parquet_path = Path(parquet_path)
+        self.key = key
+        index = pq.read_table(index_path or pair_index_path(self.parquet_path))
+        self._keys = index[key].to_numpy(zero_copy_only=False)
+        self._files = index["file"].cast(pa.string()).to_numpy(zero_copy_only=False)
+        self._row_groups = index["row_group"].to_numpy()
+        self._rows = index["row"].to_numpy()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def locate(self, pair_ids: Iterable[str]) -> pd.DataFrame:
+        """File, row group and row of each requested key present in the output."""
+        wanted = np.asarray(list(pair_ids), dtype=object)
+        lo = np.searchsorted(self._keys, wanted, side="left")
+        hi = np.searchsorted(self._keys, wanted, side="right")
+        positions = np.concatenate(
+            [np.arange(a, b) for a, b in zip(lo, hi)] or [np.empty(0, dtype=np.int64)]
+        ).astype(np.int64)
+        return pd.DataFrame(
+            {
+                self.key: self._keys[positions],
+                "file": self._files[positions],
+                "row_group": self._row_groups[positions],
+                "row": self._rows[positions],
+            }
+        )
+
+    def read(self, pair_ids: Iterable[str], columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Rows of the requested pairs, in request order; unknown keys are skipped."""
+        locations = self.locate(pair_ids)
+        parts = []
+        for (relative, row_group), rows in locations.groupby(["file", "row_group"], sort=False):
+            path = self.parquet_path / relative if relative else self.parquet_path
+            partition_values = _partition_values(relative)
+            file_columns = None if columns is None else [c for c in columns if c not in partition_values]
+            table = pq.ParquetFile(path).read_row_group(int(row_group), columns=file_columns)
+            table = table.take(pa.array(rows["row"].to_numpy()))
+            for name, value in partition_values.items():
+                if columns is None or name in columns:
+                    table = table.append_column(name, pa.array([value] * table.num_rows))
+            parts.append(table.append_column("_order", pa.array(rows.index.to_numpy())))
+        if not parts:
+            schema = pq.read_schema(next(iter(_data_files(self.parquet_path))))
+            names = schema.names if columns is None else list(columns)
+            return pd.DataFrame(columns=names)
+        table = pa.concat_tables(parts, promote_options="permissive")
+        table = table.take(pc.sort_indices(table["_order"])).drop_columns(["_order"])
+        if columns is not None:
+            table = table.select(list(columns))
+        return table.to_pandas()
+
+
+def read_pairs(
+    parquet_path: str | Path,
+    pair_ids: Iterable[str],
+    *,
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """Read the rows of `pair_ids` from an output with a pair index sidecar."""
+    return PairIndex(parquet_path).read(pair_ids, columns=columns)
@@ -0,0 +1,134 @@
+"""Summary statistics of an export table, written as a JSON sidecar.
+
+The statistics are computed with Arrow compute kernels on the table that is being
+written, so producing them needs no second read of the output files.
+"""
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+from typing import Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+TOP_K = 10
+
+# Columns broken down by value at the top level of the summary.
+GROUP_COLUMNS = ("pair_source",)
+
+
+def _json_value(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _top_values(column: pa.ChunkedArray, k: int) -> list[dict]:
+    counts = pc.value_counts(column.drop_null())
+    if not len(counts):
+        return []
+    order = pc.array_sort_indices(counts.field("counts"), order="descending")[:k]
+    top = counts.take(order)
+    return [
+        {"value": _json_value(value), "count": count}
+        for value, count in zip(top.field("values").to_pylist(), top.field("counts").to_pylist())
+    ]
+
+
+def _numeric_summary(column: pa.ChunkedArray, quantiles: Sequence[float]) -> dict:
+    min_max = pc.min_max(column)
+    summary = {
+        "min": _json_value(min_max["min"].as_py()),
+        "max": _json_value(min_max["max"].as_py()),
+        "mean": _json_value(pc.mean(column).as_py()),
+        "std": _json_value(pc.stddev(column).as_py()),
+    }
+    # t-digest sketch: approximate quantiles from a single pass.
+    values = pc.tdigest(column, q=list(quantiles)).to_pylist() if summary["min"] is not None else []
+    summary["quantiles"] = {str(q): _json_value(v) for q, v in zip(quantiles, values)}
+    return summary
+
+
+def _list_summary(column: pa.ChunkedArray) -> dict:
+    lengths = pc.list_value_length(column)
+    valid = len(column) - column.null_count
+    empty = pc.sum(pc.equal(lengths, 0)).as_py() or 0
+    return {
+        "mean_length": _json_value(pc.mean(lengths).as_py()),
+        "max_length": pc.max(lengths).as_py(),
+        "empty_fraction": empty / valid if valid else None,
+    }
+
+
+def summarize_column(
+    column: pa.ChunkedArray,
+    *,
+    quantiles: Sequence[float] = QUANTILES,
+    top_k: int = TOP_K,
+) -> dict:
+    """Count, null fraction and type-specific statistics of one column."""
+    column_type = column.type
+    if pa.types.is_dictionary(column_type):
+        column = column.cast(column_type.value_type)
+        column_type = column.type
+    rows = len(column)
+    summary = {
+        "type": str(column_type),
+        "count": rows - column.null_count,
+        "null_fraction": column.null_count / rows if rows else None,
+    }
+    if pa.types.is_boolean(column_type):
+        trues = pc.sum(column).as_py() or 0
+        summary["true_fraction"] = trues / summary["count"] if summary["count"] else None
+    elif pa.types.is_integer(column_type) or pa.types.is_floating(column_type):
+        summary.update(_numeric_summary(column, quantiles))
+    elif pa.types.is_temporal(column_type):
+        min_max = pc.min_max(column)
+        summary["min"] = _json_value(min_max["min"].as_py())
+        summary["max"] = _json_value(min_max["max"].as_py())
+    elif pa.types.is_list(column_type) or pa.types.is_large_list(column_type):
+        summary.update(_list_summary(column))
+    elif pa.types.is_string(column_type) or pa.types.is_large_string(column_type):
+        distinct = pc.count_distinct(column).as_py()
+        summary["distinct"] = distinct
+        # Identifier-like columns (every value distinct) have no informative top values.
+        if distinct < summary["count"]:
+            summary["top"] = _top_values(column, top_k)
+    return summary
+
+
+def summarize_table(
+    table: pa.Table,
+    *,
+    quantiles: Sequence[float] = QUANTILES,
+    top_k: int = TOP_K,
+    extra: Optional[dict] = None,
+) -> dict:
+    """Row count, per-group counts (`GROUP_COLUMNS`) and `summarize_column` of each column.
+
+    `extra` entries (e.g. control match rates) are added at the top level.
+    """
+    summary: dict = {"rows": table.num_rows}
+    for name in GROUP_COLUMNS:
+        if name in table.column_names:
+            summary[f"{name}_counts"] = {
+                str(item["value"]): item["count"]
+                for item in _top_values(table[name].cast(pa.string()), table.num_rows)
+            }
+    summary.update(extra or {})
+    summary["columns"] = {
+        name: summarize_column(table[name], quantiles=quantiles, top_k=top_k)
+        for name in table.column_names
+    }
+    return summary
+
+
+def write_summary(summary: dict, path: str | Path) -> Path:
+    path = Path(path)
+    path.write_text(json.dumps(summary, indent=2, default=str) + "\n", encoding="utf-8")
+    return path
@@ -1,9 +1,17 @@
-"""Prior author experience features."""
+"""Prior author and inventor experience features.
+
+`previous_experience` flags whether a pair's authors appeared in any earlier pair. The
+windowed counts report how many pairs each author (and inventor) had in the 1, 3 and 5
+years before the pair. They are looked up with `np.searchsorted` in one array of the
+events of every entity, sorted by entity and then date, so each window is two binary
+searches per (pair, entity) instead of a scan of the history.
+"""
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 
-from publish.utils import require_columns
+from publish.utils import explode_list_column, masked_result, require_columns
 
 
 def _first_last_authors(authors, positions=None):
@@ -16,49 +24,200 @@ def _first_last_authors(authors, positions=None):
     return [authors[0], authors[-1]]
 
 
-def _experience_by_order(df: pd.DataFrame, author_ids_col: str, positions_col: str | None):
-    order_cols = [c for c in ["work_publication_date", "patent_date", "patent_filing_date"] if c in df.columns]
-    if not order_cols:
-        return None, None
+FIRST_LAST_AUTHORS_COLUMN = "work_first_last_author_ids"
+
+ORDER_COLUMNS = ("work_publication_date", "patent_date", "patent_filing_date")
+
+# Prior-activity windows, in years before the pair's date.
+ACTIVITY_WINDOWS = (1, 3, 5)
+
+# Entity kind -> (id list column, date columns that date its pairs, first present wins).
+ACTIVITY_ENTITIES = {
+    "author": ("work_author_ids", ("work_publication_date",)),
+    "inventor": ("patent_inventor_ids", ("patent_filing_date", "patent_date")),
+}
+
+ACTIVITY_COLUMNS = tuple(
+    f"{kind}_prior_pairs_{years}y" for kind in ACTIVITY_ENTITIES for years in ACTIVITY_WINDOWS
+)
 
-    ordered = df.sort_values(order_cols).index
-    seen_all = set()
-    seen_fl = set()
-    prev = {}
-    prev_fl = {}
+# Columns of the ordering index: everything `add_author_experience` reads.
+HISTORY_COLUMNS = (
+    "work_author_ids",
+    "work_author_positions",
+    "work_author_positions_list",
+    "patent_inventor_ids",
+    *ORDER_COLUMNS,
+)
 
-    for idx in ordered:
-        authors = df.at[idx, author_ids_col] if author_ids_col in df.columns else []
-        positions = df.at[idx, positions_col] if positions_col and positions_col in df.columns else None
-        authors = authors if isinstance(authors, list) else []
 
-        prev[idx] = any(a in seen_all for a in authors) if authors else pd.NA
-        seen_all.update(authors)
+def _positions_column(df: pd.DataFrame) -> str | None:
+    for column in ("work_author_positions", "work_author_positions_list"):
+        if column in df.columns:
+            return column
+    return None
 
-        fl = _first_last_authors(authors, positions)
-        prev_fl[idx] = any(a in seen_fl for a in fl) if fl else pd.NA
-        seen_fl.update(fl)
 
-    return pd.Series(prev), pd.Series(prev_fl)
+def first_last_author_ids(df: pd.DataFrame) -> pd.Series:
+    """First/last authors of each paper; the pair-local part of the experience features."""
+    authors = df["work_author_ids"]
+    positions_col = _positions_column(df)
+    positions = df[positions_col] if positions_col else pd.Series(None, index=df.index)
+    values = [_first_last_authors(a, p) for a, p in zip(authors.to_numpy(), positions.to_numpy())]
+    cells = np.empty(len(values), dtype=object)
+    cells[:] = values
+    return pd.Series(cells, index=df.index)
 
 
-def add_author_experience(df: pd.DataFrame) -> pd.DataFrame:
-    require_columns(df, ["work_author_ids"], context="author_experience")
+def _seen_before(rank: np.ndarray, authors: pd.Series) -> pd.Series:
+    """Whether any author of a row appears in a row of lower `rank`; pd.NA without authors."""
+    cells = authors.map(lambda xs: xs if isinstance(xs, list) else [])
+    _, values, parents = explode_list_column(cells)
+    n_rows = len(authors)
+    has_authors = np.bincount(parents, minlength=n_rows) > 0
+    if not len(values):
+        return masked_result(np.zeros(n_rows, dtype=bool), has_authors, authors.index)
 
-    positions_col = None
-    if "work_author_positions" in df.columns:
-        positions_col = "work_author_positions"
-    elif "work_author_positions_list" in df.columns:
-        positions_col = "work_author_positions_list"
+    codes, _ = pd.factorize(values, use_na_sentinel=False)
+    element_rank = rank[parents]
+    first_rank = np.full(codes.max() + 1, n_rows, dtype=np.int64)
+    np.minimum.at(first_rank, codes, element_rank)
+    seen = np.bincount(parents, weights=first_rank[codes] < element_rank, minlength=n_rows) > 0
+    return masked_result(seen, has_authors, authors.index)
 
-    prev, prev_fl = _experience_by_order(df, "work_author_ids", positions_col)
+
+def _experience_by_order(df: pd.DataFrame, author_ids_col: str):
+    """Previous-experience flags from the compact index: order columns and author lists.
+
+    A row's author has prior experience if the author appears in a row that comes earlier
+    in the chronological order, which is the author's first (lowest-rank) appearance.
+    """
+    order_cols = [c for c in ORDER_COLUMNS if c in df.columns]
+    if not order_cols:
+        return None, None
+
+    ordered = df[order_cols].reset_index(drop=True).sort_values(order_cols).index.to_numpy()
+    rank = np.empty(len(df), dtype=np.int64)
+    rank[ordered] = np.arange(len(df))
+
+    if FIRST_LAST_AUTHORS_COLUMN in df.columns:
+        first_last = df[FIRST_LAST_AUTHORS_COLUMN]
+    else:
+        first_last = first_last_author_ids(df)
+    return _seen_before(rank, df[author_ids_col]), _seen_before(rank, first_last)
+
+
+def _days(dates: pd.Series) -> np.ndarray:
+    return dates.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+
+
+def _counts(values: np.ndarray, mask: np.ndarray, index: pd.Index) -> pd.Series:
+    """`values` where `mask`, pd.NA elsewhere, as nullable Int64 whatever rows are missing."""
+    return pd.Series(pd.arrays.IntegerArray(values, ~mask), index=index)
+
+
+def prior_pair_counts(
+    entities: pd.Series, dates: pd.Series, windows: tuple[int, ...] = ACTIVITY_WINDOWS
+) -> dict[int, pd.Series]:
+    """Per window `w` (years): the most pairs any entity of a row has dated in
+    `[date - w years, date)` (Int64); pd.NA without entities or date.
+
+    Every distinct (row, entity) is an event at the row's date. The events are sorted
+    by the key `entity * span + day`, so an entity's window is one contiguous key range
+    and its count is the difference of two `searchsorted` positions.
+    """
+    cells = entities.map(lambda xs: xs if isinstance(xs, list) else [])
+    _, values, parents = explode_list_column(cells)
+    n_rows = len(entities)
+    dates = pd.to_datetime(dates, errors="coerce")
+    has_date = dates.notna().to_numpy()
+    valid = (np.bincount(parents, minlength=n_rows) > 0) & has_date
+    if not valid.any():
+        zeros = np.zeros(n_rows, dtype=np.int64)
+        return {years: _counts(zeros, valid, entities.index) for years in windows}
+
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    n_codes = max(len(uniques), 1)
+    events = np.unique(parents * n_codes + codes)
+    rows, codes = events // n_codes, events % n_codes
+    kept = has_date[rows]
+    rows, codes = rows[kept], codes[kept]
+
+    # Rows without a date have no events; any valid date keeps the arithmetic defined.
+    dates = dates.where(dates.notna(), dates[has_date].iloc[0])
+    days = _days(dates)
+    origin = days[rows].min()
+    span = days[rows].max() - origin + 1
+    keys = codes * span + (days[rows] - origin)
+    sorted_keys = np.sort(keys)
+    before = np.searchsorted(sorted_keys, keys, side="left")
+
+    counts = {}
+    for years in windows:
+        start = _days(dates - pd.DateOffset(years=years))
+        start_keys = codes * span + np.maximum(start[rows] - origin, 0)
+        in_window = before - np.searchsorted(sorted_keys, start_keys, side="left")
+        most = np.zeros(n_rows, dtype=np.int64)
+        np.maximum.at(most, rows, in_window)
+        counts[years] = _counts(most, valid, entities.index)
+    return counts
+
+
+def _prior_activity(df: pd.DataFrame) -> dict[str, pd.Series]:
+    """`ACTIVITY_COLUMNS` of `df`; all pd.NA for an entity kind without ids or dates."""
+    columns = {}
+    for kind, (ids_col, date_cols) in ACTIVITY_ENTITIES.items():
+        date_col = next((c for c in date_cols if c in df.columns), None)
+        if ids_col in df.columns and date_col is not None:
+            counts = prior_pair_counts(df[ids_col], df[date_col])
+        else:
+            missing = pd.Series(pd.NA, index=df.index, dtype="Int64")
+            counts = {years: missing for years in ACTIVITY_WINDOWS}
+        for years, values in counts.items():
+            columns[f"{kind}_prior_pairs_{years}y"] = values
+    return columns
+
+
+def add_author_experience(
+    df: pd.DataFrame,
+    *,
+    history: pd.DataFrame | None = None,
+    history_rows: np.ndarray | None = None,
+) -> pd.DataFrame:
+    """Add the previous-experience flags, ordering the pairs of `df` chronologically,
+    and the windowed prior-pair counts (`ACTIVITY_COLUMNS`).
+
+    With `history` (the `HISTORY_COLUMNS` of a larger input that `df` was sampled
+    from), the flags are computed over every pair of `history` and the rows at
+    `history_rows`, which are `df`'s rows in order, are reported.
+    """
+    source = df if history is None else history
+    require_columns(source, ["work_author_ids"], context="author_experience")
+
+    prev, prev_fl = _experience_by_order(source, "work_author_ids")
     if prev is None:
         raise ValueError(
             "author_experience: missing required columns: "
             "need at least one ordering column among "
             "work_publication_date, patent_date, patent_filing_date"
         )
+    activity = _prior_activity(source)
+    if history is not None:
+        if len(history_rows) != len(df):
+            raise ValueError(
+                f"author_experience: {len(history_rows)} history rows for {len(df)} pairs"
+            )
+        prev, prev_fl = (
+            pd.Series(flags.to_numpy(dtype=object)[history_rows], index=df.index).infer_objects()
+            for flags in (prev, prev_fl)
+        )
+        activity = {
+            column: pd.Series(values.array[history_rows], index=df.index)
+            for column, values in activity.items()
+        }
 
     df["previous_experience"] = prev
     df["previous_experience_first_last"] = prev_fl
+    for column, values in activity.items():
+        df[column] = values
     return df
@@ -0,0 +1,153 @@
+"""Corpus-level citation linkage features: bibliographic coupling and co-citation.
+
+`add_citation_overlap` compares a pair's own two reference lists; these features relate
+a pair to every other pair of the input, so they run as a global stage. Both are sparse
+products over the (interned) work ids, computed with NumPy on CSR-style
+`(indptr, indices)` arrays. Co-citation is evaluated in blocks of reference ids, each
+holding about `BLOCK_ENTRIES` (reference, cited work) combinations, so memory is
+bounded by the block size instead of the total number of combinations.
+"""
+from __future__ import annotations
+
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from publish.features.citation_overlap import flat_id_codes
+from publish.utils import require_columns
+
+BLOCK_ENTRIES = 1 << 22
+
+
+def _csr(rows: np.ndarray, codes: np.ndarray, n_rows: int, n_ids: int) -> tuple[np.ndarray, np.ndarray]:
+    """Sorted distinct `codes` of each row as `(indptr, indices)`."""
+    keys = np.unique(rows * n_ids + codes)
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // n_ids, minlength=n_rows), out=indptr[1:])
+    return indptr, keys % n_ids
+
+
+def _row_ids(indptr: np.ndarray) -> np.ndarray:
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+
+def _entity_codes(ids: pd.Series) -> np.ndarray:
+    """Factorized entity ids; missing ids become distinct codes, so they match nothing."""
+    codes, uniques = pd.factorize(ids)
+    missing = codes < 0
+    codes[missing] = len(uniques) + np.arange(missing.sum())
+    return codes.astype(np.int64)
+
+
+def corpus_coupling_counts(
+    references: tuple[np.ndarray, np.ndarray],
+    cited: tuple[np.ndarray, np.ndarray],
+    patents: np.ndarray,
+    n_ids: int,
+) -> np.ndarray:
+    """Per row, how many of the paper's references some other patent of the corpus cites.
+
+    `references` and `cited` are the CSR id lists of the rows and `patents` their patent
+    codes. Work `w` is cited by `bincount(distinct (patent, w))` patents; a reference
+    counts when that is more than its own patent's citation of it.
+    """
+    refs_ptr, refs_idx = references
+    cited_ptr, cited_idx = cited
+    patent_works = np.unique(patents[_row_ids(cited_ptr)] * n_ids + cited_idx)
+    citing_patents = np.bincount(patent_works % n_ids, minlength=n_ids)
+    ref_rows = _row_ids(refs_ptr)
+    own = np.isin(patents[ref_rows] * n_ids + refs_idx, patent_works)
+    coupled = citing_patents[refs_idx] - own > 0
+    return np.bincount(ref_rows, weights=coupled, minlength=len(refs_ptr) - 1)
+
+
+def _blocks(sizes: np.ndarray, budget: int) -> Iterator[slice]:
+    """Consecutive ranges whose `sizes` add up to about `budget` (at least one item each)."""
+    bucket = (np.cumsum(sizes) - sizes) // max(budget, 1)
+    bounds = [0, *(np.flatnonzero(np.diff(bucket)) + 1), len(sizes)]
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        if stop > start:
+            yield slice(start, stop)
+
+
+def co_citation_counts(
+    references: tuple[np.ndarray, np.ndarray],
+    cited: tuple[np.ndarray, np.ndarray],
+    n_ids: int,
+    *,
+    block_entries: int = BLOCK_ENTRIES,
+) -> np.ndarray:
+    """Per row `i`, `sum over rows j != i of |refs_i & refs_j| * |cited_i & cited_j|`.
+
+    Equivalently: the co-citation matrix `C = A.T @ B` (works x works, `A` the paper
+    references and `B` the patent citations of every row) counts how often a reference
+    `u` and a cited work `v` occur in the same pair, and row `i` gets the sum of `C[u, v]`
+    over its own `(u, v)` combinations, less its own contribution of one each.
+
+    The combinations are split by ranges of the reference `u`, each holding about
+    `block_entries` of them (one `u` with more forms a block of its own). Every
+    `(row, u, v)` and every entry of `C[u, :]` falls in exactly one range, so each
+    block's part of `C` is built, looked up and dropped on its own.
+    """
+    refs_ptr, refs_idx = references
+    cited_ptr, cited_idx = cited
+    n_rows = len(refs_ptr) - 1
+    n_cited = np.diff(cited_ptr)
+
+    totals = np.zeros(n_rows, dtype=np.int64)
+    if not len(refs_idx):
+        return totals
+
+    # Reference entries ordered by `u`, so a range of `u` is a contiguous slice.
+    order = np.argsort(refs_idx, kind="stable")
+    ref_rows = _row_ids(refs_ptr)[order]
+    ref_ids = refs_idx[order]
+    entry_sizes = n_cited[ref_rows]
+    # Blocks are made of whole `u` groups, so no `C[u, v]` is split between two blocks.
+    group_starts = np.flatnonzero(np.r_[True, ref_ids[1:] != ref_ids[:-1]])
+    group_bounds = np.r_[group_starts, len(ref_ids)]
+    group_sizes = np.add.reduceat(entry_sizes, group_starts)
+
+    for groups in _blocks(group_sizes, block_entries):
+        block = slice(group_bounds[groups.start], group_bounds[groups.stop])
+        rows, u, sizes = ref_rows[block], ref_ids[block], entry_sizes[block]
+        entry_rows = np.repeat(rows, sizes)
+        offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        v = cited_idx[cited_ptr[entry_rows] + offsets]
+        _, inverse, counts = np.unique(
+            np.repeat(u, sizes) * n_ids + v, return_inverse=True, return_counts=True
+        )
+        totals += np.bincount(entry_rows, weights=counts[inverse] - 1, minlength=n_rows).astype(
+            np.int64
+        )
+    return totals
+
+
+def add_citation_linkage(df: pd.DataFrame) -> pd.DataFrame:
+    require_columns(
+        df,
+        ["patent_cited_works", "work_referenced_works", "patent_id_us"],
+        context="citation_linkage",
+    )
+    n_rows = len(df)
+    (cited_is_list, cited_rows, cited_codes), (refs_is_list, refs_rows, refs_codes), n_ids = (
+        flat_id_codes(df["patent_cited_works"], df["work_referenced_works"])
+    )
+    n_ids = max(n_ids, 1)
+    references = _csr(refs_rows, refs_codes, n_rows, n_ids)
+    cited = _csr(cited_rows, cited_codes, n_rows, n_ids)
+    has_refs = refs_is_list & (np.diff(references[0]) > 0)
+    has_cited = cited_is_list & (np.diff(cited[0]) > 0)
+
+    coupling = corpus_coupling_counts(
+        references, cited, _entity_codes(df["patent_id_us"]), n_ids
+    )
+    co_citation = co_citation_counts(references, cited, n_ids)
+    df["corpus_coupling_count"] = pd.Series(
+        np.where(has_refs, coupling, np.nan), index=df.index
+    )
+    df["co_citation_count"] = pd.Series(
+        np.where(has_refs & has_cited, co_citation, np.nan), index=df.index
+    )
+    return df
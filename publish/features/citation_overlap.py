@@ -1,23 +1,99 @@
 """Citation overlap feature."""
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
-from publish.scores import citation_overlap_score
-from publish.utils import require_columns
+from publish.prep.id_dictionary import is_interned, normalize_ids
+from publish.utils import explode_list_column, is_arrow_list, require_columns
 
 
-def _compute_overlap(row):
-    return citation_overlap_score(
-        row.get("patent_cited_works"), row.get("work_referenced_works")
+def _is_id(value) -> bool:
+    """Non-empty and not missing: None, NaN and pd.NA elements are dropped, as interning does."""
+    return not (pd.api.types.is_scalar(value) and pd.isna(value)) and bool(value)
+
+
+def _flat_ids(series: pd.Series) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """`(is_list, parents, ids)` with ids normalized like `citation_overlap_score`.
+
+    Empty and missing ids are dropped. Interned columns give their integer codes;
+    other columns give lowercased strings.
+    """
+    if is_arrow_list(series):
+        lists = pa.chunked_array(pa.array(series.array)).combine_chunks()
+        is_list = lists.is_valid().to_numpy(zero_copy_only=False)
+        values = pc.list_flatten(lists)
+        parents = pc.list_parent_indices(lists)
+        if not is_interned(series):
+            values = normalize_ids(values)
+        keep = values.is_valid()
+        parents = pc.filter(parents, keep).to_numpy().astype(np.int64, copy=False)
+        values = pc.filter(values, keep).to_numpy(zero_copy_only=False)
+        return is_list, parents, values
+
+    cells = series.map(lambda v: v if isinstance(v, list) else pd.NA)
+    is_list, values, parents = explode_list_column(cells)
+    keep = np.fromiter(map(_is_id, values), dtype=bool, count=len(values))
+    values = np.array([v.lower() if isinstance(v, str) else v for v in values[keep]], dtype=object)
+    return is_list, parents[keep], values
+
+
+def flat_id_codes(
+    first: pd.Series, second: pd.Series
+) -> tuple[tuple[np.ndarray, np.ndarray, np.ndarray], tuple[np.ndarray, np.ndarray, np.ndarray], int]:
+    """`_flat_ids` of two id list columns with int64 codes shared by both, and the number of codes.
+
+    Interned columns keep their dictionary codes; string ids are factorized together.
+    """
+    first_is_list, first_rows, first_ids = _flat_ids(first)
+    second_is_list, second_rows, second_ids = _flat_ids(second)
+    if first_ids.dtype.kind in "iu" and second_ids.dtype.kind in "iu":
+        first_codes, second_codes = first_ids.astype(np.int64), second_ids.astype(np.int64)
+    else:
+        codes, _ = pd.factorize(np.concatenate([first_ids.astype(object), second_ids.astype(object)]))
+        first_codes, second_codes = codes[: len(first_ids)], codes[len(first_ids) :]
+    n_ids = int(max(first_codes.max(initial=-1), second_codes.max(initial=-1))) + 1
+    return (
+        (first_is_list, first_rows, first_codes),
+        (second_is_list, second_rows, second_codes),
+        n_ids,
     )
 
 
+def citation_overlap_scores(patent_cited: pd.Series, paper_referenced: pd.Series) -> pd.Series:
+    """Vectorized `citation_overlap_score` over two id list columns.
+
+    Each row's distinct ids become `row * n_ids + id_code` keys, so per-row set sizes and
+    intersections reduce to `np.unique`, `np.isin` and `np.bincount`.
+    """
+    n_rows = len(patent_cited)
+    (pat_is_list, pat_rows, pat_codes), (pap_is_list, pap_rows, pap_codes), n_ids = flat_id_codes(
+        patent_cited, paper_referenced
+    )
+
+    pat_keys = np.unique(pat_rows * n_ids + pat_codes)
+    pap_keys = np.unique(pap_rows * n_ids + pap_codes)
+    n_pat = np.bincount(pat_keys // max(n_ids, 1), minlength=n_rows)
+    n_pap = np.bincount(pap_keys // max(n_ids, 1), minlength=n_rows)
+    shared = np.bincount(
+        pat_keys[np.isin(pat_keys, pap_keys)] // max(n_ids, 1), minlength=n_rows
+    )
+
+    valid = pat_is_list & pap_is_list & (n_pat > 0) & (n_pap > 0)
+    scores = np.full(n_rows, np.nan)
+    scores[valid] = shared[valid] / n_pat[valid]
+    return pd.Series(scores, index=patent_cited.index)
+
+
 def add_citation_overlap(df: pd.DataFrame) -> pd.DataFrame:
     require_columns(
         df,
         ["patent_cited_works", "work_referenced_works"],
         context="citation_overlap",
     )
-    df["citation_overlap_score"] = df.apply(_compute_overlap, axis=1)
+    df["citation_overlap_score"] = citation_overlap_scores(
+        df["patent_cited_works"], df["work_referenced_works"]
+    )
     return df
@@ -7,6 +7,7 @@ from typing import Iterable, Optional
 import numpy as np
 import pandas as pd
 
+from publish.scores import thread_map
 from publish.utils import require_columns
 
 
@@ -59,10 +60,9 @@ def add_geo_distance(df: pd.DataFrame) -> pd.DataFrame:
         ["patent_assignee_latlon_list", "work_latlon_list"],
         context="geo_distance",
     )
-    df["avg_haversine_km"] = df.apply(
-        lambda row: avg_haversine_km(
-            row.get("patent_assignee_latlon_list"), row.get("work_latlon_list")
-        ),
-        axis=1,
+    df["avg_haversine_km"] = pd.Series(
+        thread_map(avg_haversine_km, df["patent_assignee_latlon_list"], df["work_latlon_list"]),
+        index=df.index,
+        dtype=float,
     )
     return df
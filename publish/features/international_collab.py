@@ -1,65 +1,72 @@
 """International collaboration feature."""
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 
-from publish.utils import require_columns
+from publish.utils import (
+    count_distinct_per_row,
+    explode_list_column,
+    is_identical,
+    masked_result,
+    to_python_objects,
+)
 
 
-def _has_multiple_countries(countries):
-    if not isinstance(countries, list):
-        return pd.NA
-    unique = {c for c in countries if c}
-    return len(unique) > 1 if unique else pd.NA
+def _truthy(values: np.ndarray) -> np.ndarray:
+    """Elementwise `bool(value)`, evaluated once per distinct value.
 
+    Missing values follow `if value:`: None (and pd.NA) are falsy while NaN is truthy.
+    """
+    codes, uniques = pd.factorize(values)
+    truthy_unique = np.fromiter(map(bool, uniques), dtype=bool, count=len(uniques))
+    out = np.empty(len(values), dtype=bool)
+    present = codes >= 0
+    out[present] = truthy_unique[codes[present]]
+    missing = values[~present]
+    out[~present] = ~(is_identical(missing, None) | is_identical(missing, pd.NA))
+    return out
 
-def add_international_collab(df: pd.DataFrame) -> pd.DataFrame:
-    if "collab_countries" in df.columns:
-        df["international_collab"] = df["collab_countries"].apply(_has_multiple_countries)
-        return df
 
-    if {"work_institution_country_codes", "patent_assignee_country"} <= set(df.columns):
-        require_columns(
-            df,
-            ["work_institution_country_codes", "patent_assignee_country"],
-            context="international_collab",
-        )
+def _country_count(values: np.ndarray, parents: np.ndarray, n_rows: int) -> np.ndarray:
+    keep = _truthy(values)
+    codes, _ = pd.factorize(values[keep], use_na_sentinel=False)
+    return count_distinct_per_row(parents[keep], codes, n_rows)
 
-        def _compute(row):
-            work_countries = row.get("work_institution_country_codes")
-            patent_country = row.get("patent_assignee_country")
-            work_countries = work_countries if isinstance(work_countries, list) else []
-            countries = {c for c in work_countries if c}
-            if patent_country:
-                countries.add(patent_country)
-            return len(countries) > 1 if countries else pd.NA
 
-        df["international_collab"] = df.apply(_compute, axis=1)
-        return df
+def _collab_from_country_lists(series: pd.Series) -> pd.Series:
+    is_list, values, parents = explode_list_column(series)
+    counts = _country_count(values, parents, len(series))
+    return masked_result(counts > 1, is_list & (counts > 0), series.index)
+
 
-    if {"institution_country_codes", "patent_assignee_country"} <= set(df.columns):
-        require_columns(
-            df,
-            ["institution_country_codes", "patent_assignee_country"],
-            context="international_collab",
-        )
+def _collab_from_work_and_patent(work_countries: pd.Series, patent_country: pd.Series) -> pd.Series:
+    # Non-list work countries count as no countries; the patent country is added when set.
+    _, values, parents = explode_list_column(work_countries)
+    # Arrow-backed strings would give pd.NA where the default dtype gives NaN (truthy).
+    patent_values = to_python_objects(patent_country).to_numpy(dtype=object)
+    counts = _country_count(
+        np.concatenate([values, patent_values]),
+        np.concatenate([parents, np.arange(len(patent_values))]),
+        len(work_countries),
+    )
+    return masked_result(counts > 1, counts > 0, work_countries.index)
 
-        def _compute_alt(row):
-            work_countries = row.get("institution_country_codes")
-            patent_country = row.get("patent_assignee_country")
-            work_countries = work_countries if isinstance(work_countries, list) else []
-            countries = {c for c in work_countries if c}
-            if patent_country:
-                countries.add(patent_country)
-            return len(countries) > 1 if countries else pd.NA
 
-        df["international_collab"] = df.apply(_compute_alt, axis=1)
+def add_international_collab(df: pd.DataFrame) -> pd.DataFrame:
+    if "collab_countries" in df.columns:
+        df["international_collab"] = _collab_from_country_lists(df["collab_countries"])
         return df
 
+    for work_column in ["work_institution_country_codes", "institution_country_codes"]:
+        if {work_column, "patent_assignee_country"} <= set(df.columns):
+            df["international_collab"] = _collab_from_work_and_patent(
+                df[work_column], df["patent_assignee_country"]
+            )
+            return df
+
     raise ValueError(
         "international_collab: missing required columns: "
         "collab_countries OR (work_institution_country_codes+patent_assignee_country) "
         "OR (institution_country_codes+patent_assignee_country)"
     )
-
-    return df
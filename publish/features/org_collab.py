@@ -1,51 +1,58 @@
 """Organization and collaboration type features."""
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 
-from publish.utils import require_columns
+from publish.utils import (
+    count_distinct_per_row,
+    explode_list_column,
+    from_entity_store,
+    is_identical,
+    masked_result,
+    require_columns,
+)
 
 
 _COMPANY_CODES = {"2", "2.0", 2, 2.0, "3", "3.0", 3, 3.0}
 
 
-def _unique_count(value):
-    if isinstance(value, list):
-        return len({v for v in value if v is not None})
-    return pd.NA
+def multiple_distinct(series: pd.Series) -> pd.Series:
+    """True when a list holds more than one distinct non-None value; pd.NA for non-lists."""
+    is_list, values, parents = explode_list_column(series)
+    keep = ~is_identical(values, None)
+    codes, _ = pd.factorize(values[keep], use_na_sentinel=False)
+    counts = count_distinct_per_row(parents[keep], codes, len(series))
+    return masked_result(counts > 1, is_list, series.index)
 
 
-def _assignee_type(value):
-    if not isinstance(value, list):
-        return pd.NA
-    if all(v in _COMPANY_CODES for v in value):
-        return "company"
-    return "non-company"
-
+def assignee_type(series: pd.Series) -> pd.Series:
+    """Label a list as "company" when every type code is a company code (or it is empty)."""
+    is_list, values, parents = explode_list_column(series)
+    codes, uniques = pd.factorize(values)
+    is_company_code = np.fromiter(
+        (u in _COMPANY_CODES for u in uniques), dtype=bool, count=len(uniques)
+    )
+    non_company = np.ones(len(values), dtype=bool)
+    non_company[codes >= 0] = ~is_company_code[codes[codes >= 0]]
+    has_non_company = np.bincount(parents[non_company], minlength=len(series)) > 0
+    labels = np.where(has_non_company, "non-company", "company")
+    return masked_result(labels, is_list, series.index)
 
-def _normalize_institution_types(types_list):
-    if not isinstance(types_list, list):
-        return pd.NA
-    normalized = []
-    for t in types_list:
-        if t == "company":
-            normalized.append("company")
-        elif t == "education":
-            normalized.append("education")
-        else:
-            normalized.append("other")
-    return normalized
 
+def author_type(series: pd.Series) -> pd.Series:
+    """Label a list "company"/"education" when every institution has that type, else "other"."""
+    is_list, values, parents = explode_list_column(series)
+    codes, uniques = pd.factorize(values)
+    n_rows = len(series)
+    lengths = np.bincount(parents, minlength=n_rows)
 
-def _author_type(types_list):
-    normalized = _normalize_institution_types(types_list)
-    if normalized is pd.NA:
-        return pd.NA
-    if all(t == "company" for t in normalized):
-        return "company"
-    if all(t == "education" for t in normalized):
-        return "education"
-    return "other"
+    labels = np.full(n_rows, "other", dtype=object)
+    for label in ("education", "company"):
+        code = np.flatnonzero(uniques == label)
+        count = np.bincount(parents[np.isin(codes, code)], minlength=n_rows)
+        labels[count == lengths] = label
+    return masked_result(labels, is_list, series.index)
 
 
 def add_org_collab_features(df: pd.DataFrame) -> pd.DataFrame:
@@ -60,13 +67,15 @@ def add_org_collab_features(df: pd.DataFrame) -> pd.DataFrame:
         context="org_collab",
     )
 
-    df["multiple_assignee"] = df["patent_assignee_names"].apply(
-        lambda x: _unique_count(x) > 1 if isinstance(x, list) else pd.NA
-    )
-    df["multiple_author_institution"] = df["work_institution_names"].apply(
-        lambda x: _unique_count(x) > 1 if isinstance(x, list) else pd.NA
-    )
-    df["assignee_type"] = df["patent_assignee_types"].apply(_assignee_type)
-    df["author_type"] = df["work_institution_types"].apply(_author_type)
+    # Each list column is flattened once and scored on integer codes of its distinct values.
+    features = {
+        "multiple_assignee": (multiple_distinct, "patent_assignee_names"),
+        "multiple_author_institution": (multiple_distinct, "work_institution_names"),
+        "assignee_type": (assignee_type, "patent_assignee_types"),
+        "author_type": (author_type, "work_institution_types"),
+    }
+    for column, (compute, source) in features.items():
+        if not from_entity_store(df, column):
+            df[column] = compute(df[source])
 
     return df
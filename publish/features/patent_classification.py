@@ -2,14 +2,14 @@
 from __future__ import annotations
 
 import ast
-from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
 import numpy as np
 import pandas as pd
 
-from publish.utils import require_columns
+from publish.scores import synchronized_cache, thread_map
+from publish.utils import from_entity_store, require_columns
 
 
 def _to_underscore(class_code: str) -> str:
@@ -17,8 +17,8 @@ def _to_underscore(class_code: str) -> str:
     return f"{class_code[0]}_{class_code[1:]}"
 
 
-@lru_cache(maxsize=8)
-def _ipc_code_to_sector_map(ipc_technology_xlsx_path: str) -> dict[str, str]:
+@synchronized_cache(maxsize=8)
+def ipc_code_to_sector_map(ipc_technology_xlsx_path: str) -> dict[str, str]:
     """Build IPC class -> sector mapping from an external WIPO IPC technology file."""
     path = Path(ipc_technology_xlsx_path)
     if not path.exists():
@@ -84,7 +84,8 @@ def _normalize_ipc_codes(xs) -> list[str]:
     return out
 
 
-def _map_ipc_sectors(xs, mapping: dict[str, str]) -> list[Optional[str]]:
+def map_ipc_sectors(xs, mapping: dict[str, str]) -> list[Optional[str]]:
+    """Sector of each normalized IPC code in `xs`; None for codes without one."""
     codes = _normalize_ipc_codes(xs)
     return [mapping.get(code) for code in codes]
 
@@ -95,6 +96,9 @@ def add_patent_classification(
     # `wipo_fields` and `ipc_codes` are expected to be prepared upstream from USPTO data.
     require_columns(df, ["wipo_fields", "ipc_codes"], context="patent_classification")
 
-    mapping = _ipc_code_to_sector_map(str(ipc_technology_xlsx_path))
-    df["ipc_sectors"] = df["ipc_codes"].apply(lambda xs: _map_ipc_sectors(xs, mapping))
+    mapping = ipc_code_to_sector_map(str(ipc_technology_xlsx_path))
+    if not from_entity_store(df, "ipc_sectors"):
+        sectors = np.empty(len(df), dtype=object)
+        sectors[:] = thread_map(lambda xs: map_ipc_sectors(xs, mapping), df["ipc_codes"])
+        df["ipc_sectors"] = pd.Series(sectors, index=df.index)
     return df
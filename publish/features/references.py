@@ -3,7 +3,7 @@ from __future__ import annotations
 
 import pandas as pd
 
-from publish.utils import mean_or_nan, require_columns, safe_len
+from publish.utils import from_entity_store, list_lengths, list_means, require_columns
 
 
 def add_reference_features(df: pd.DataFrame) -> pd.DataFrame:
@@ -20,15 +20,16 @@ def add_reference_features(df: pd.DataFrame) -> pd.DataFrame:
         context="references",
     )
 
-    df["num_work_references"] = df["work_referenced_works"].apply(safe_len)
-    df["patent_num_references"] = df["patent_doi_references"].apply(safe_len)
-    df["work_reference_age_days_mean"] = df["work_reference_age_days"].apply(mean_or_nan)
-    df["patent_reference_age_days_mean"] = df["patent_reference_age_days"].apply(mean_or_nan)
-    df["work_reference_cited_by_counts_mean"] = df["work_reference_cited_by_counts"].apply(
-        mean_or_nan
-    )
-    df["patent_reference_cited_by_counts_mean"] = df[
-        "patent_reference_cited_by_counts"
-    ].apply(mean_or_nan)
+    features = {
+        "num_work_references": (list_lengths, "work_referenced_works"),
+        "patent_num_references": (list_lengths, "patent_doi_references"),
+        "work_reference_age_days_mean": (list_means, "work_reference_age_days"),
+        "patent_reference_age_days_mean": (list_means, "patent_reference_age_days"),
+        "work_reference_cited_by_counts_mean": (list_means, "work_reference_cited_by_counts"),
+        "patent_reference_cited_by_counts_mean": (list_means, "patent_reference_cited_by_counts"),
+    }
+    for column, (compute, source) in features.items():
+        if not from_entity_store(df, column):
+            df[column] = compute(df[source])
 
     return df
@@ -3,14 +3,16 @@ from __future__ import annotations
 
 import pandas as pd
 
-from publish.utils import require_columns, safe_len
+from publish.utils import from_entity_store, list_lengths, require_columns
 
 
 def add_team_size_features(df: pd.DataFrame) -> pd.DataFrame:
     require_columns(df, ["work_author_ids", "patent_inventor_ids"], context="team_size")
 
-    df["author_team_size"] = df["work_author_ids"].apply(safe_len)
-    df["inventor_team_size"] = df["patent_inventor_ids"].apply(safe_len)
+    if not from_entity_store(df, "author_team_size"):
+        df["author_team_size"] = list_lengths(df["work_author_ids"])
+    if not from_entity_store(df, "inventor_team_size"):
+        df["inventor_team_size"] = list_lengths(df["patent_inventor_ids"])
     df["team_size_difference"] = df["author_team_size"] - df["inventor_team_size"]
 
     return df
@@ -1,45 +1,77 @@
 """Text similarity features."""
 from __future__ import annotations
 
+import threading
+
 import numpy as np
 import pandas as pd
 
-from publish.scores import semantic_similarity_score_sbert, semantic_similarity_score_word_overlap
+from publish.scores import (
+    encode_texts,
+    semantic_similarity_score_word_overlap,
+    thread_map,
+    word_overlap_from_lemmas,
+)
+from publish.utils import from_entity_store
 
 
-def _score_word_overlap(row, col_a, col_b):
-    a = row.get(col_a)
-    b = row.get(col_b)
+def _score_word_overlap(a, b):
     if pd.isna(a) or pd.isna(b):
         return np.nan
     return semantic_similarity_score_word_overlap(str(a), str(b))
 
 
-_SBERT_ENABLED = True
-_SBERT_WARNED = False
+def word_overlap_scores(df: pd.DataFrame, col_a: str, col_b: str) -> pd.Series:
+    """Lemma overlap of `col_a` and `col_b` per row (from the entity store's lemmas if attached)."""
+    lemmas_a, lemmas_b = f"{col_a}_lemmas", f"{col_b}_lemmas"
+    if from_entity_store(df, lemmas_a) and from_entity_store(df, lemmas_b):
+        # Lemmas attached from the entity feature store; missing texts are NA.
+        scores = [
+            np.nan if a is pd.NA or b is pd.NA else word_overlap_from_lemmas(a, b)
+            for a, b in zip(df[lemmas_a], df[lemmas_b])
+        ]
+        return pd.Series(scores, index=df.index, dtype=float)
+    scores = thread_map(_score_word_overlap, df[col_a], df[col_b])
+    return pd.Series(scores, index=df.index, dtype=float)
 
 
-def _score_semantic(row, col_a, col_b):
-    global _SBERT_ENABLED, _SBERT_WARNED
+# Set (once, with a single warning) when the embedding dependencies are missing.
+_SBERT_DISABLED = threading.Event()
+_SBERT_LOCK = threading.Lock()
 
-    if not _SBERT_ENABLED:
-        return np.nan
 
-    a = row.get(col_a)
-    b = row.get(col_b)
-    if pd.isna(a) or pd.isna(b):
-        return np.nan
+def _embeddable(value) -> bool:
+    return isinstance(value, str) and bool(value.strip())
+
+
+def _semantic_scores(df: pd.DataFrame, col_a: str, col_b: str) -> pd.Series:
+    """Row-wise cosine similarity, encoding each distinct text once in batches."""
+    scores = pd.Series(np.nan, index=df.index, dtype=float)
+    if _SBERT_DISABLED.is_set():
+        return scores
+
+    a = df[col_a].map(lambda v: str(v) if not pd.isna(v) else None)
+    b = df[col_b].map(lambda v: str(v) if not pd.isna(v) else None)
+    valid = a.map(_embeddable) & b.map(_embeddable)
+    if not valid.any():
+        return scores
+
+    texts = pd.unique(pd.concat([a[valid], b[valid]]).to_numpy())
     try:
-        score = semantic_similarity_score_sbert(str(a), str(b))
+        embeddings = encode_texts(list(texts))
     except ImportError as exc:
         # Allow the pipeline to run without SBERT dependencies installed.
-        _SBERT_ENABLED = False
-        if not _SBERT_WARNED:
-            print(f"SBERT similarity disabled (missing dependency): {exc}")
-            _SBERT_WARNED = True
-        return np.nan
+        with _SBERT_LOCK:
+            if not _SBERT_DISABLED.is_set():
+                print(f"SBERT similarity disabled (missing dependency): {exc}")
+                _SBERT_DISABLED.set()
+        return scores
 
-    return np.nan if score is None else score
+    position = pd.Index(texts)
+    emb_a = embeddings[position.get_indexer(a[valid])]
+    emb_b = embeddings[position.get_indexer(b[valid])]
+    scores[valid] = np.einsum("ij,ij->i", emb_a, emb_b).astype(float)
+    return scores
 
 
 def add_text_similarity_features(df: pd.DataFrame) -> pd.DataFrame:
@@ -54,15 +86,13 @@ def add_text_similarity_features(df: pd.DataFrame) -> pd.DataFrame:
 
     # Word overlap
     if has_title:
-        df["title_word_overlap_score"] = df.apply(
-            lambda row: _score_word_overlap(row, "work_title", "patent_title"), axis=1
-        )
+        df["title_word_overlap_score"] = word_overlap_scores(df, "work_title", "patent_title")
     else:
         df["title_word_overlap_score"] = np.nan
 
     if has_abstract:
-        df["abstract_word_overlap_score"] = df.apply(
-            lambda row: _score_word_overlap(row, "work_abstract", "patent_abstract"), axis=1
+        df["abstract_word_overlap_score"] = word_overlap_scores(
+            df, "work_abstract", "patent_abstract"
         )
     else:
         df["abstract_word_overlap_score"] = np.nan
@@ -73,15 +103,13 @@ def add_text_similarity_features(df: pd.DataFrame) -> pd.DataFrame:
 
     # SBERT similarity
     if has_title:
-        df["title_semantic_similarity"] = df.apply(
-            lambda row: _score_semantic(row, "work_title", "patent_title"), axis=1
-        )
+        df["title_semantic_similarity"] = _semantic_scores(df, "work_title", "patent_title")
     else:
         df["title_semantic_similarity"] = np.nan
 
     if has_abstract:
-        df["abstract_semantic_similarity"] = df.apply(
-            lambda row: _score_semantic(row, "work_abstract", "patent_abstract"), axis=1
+        df["abstract_semantic_similarity"] = _semantic_scores(
+            df, "work_abstract", "patent_abstract"
         )
     else:
         df["abstract_semantic_similarity"] = np.nan
@@ -0,0 +1,300 @@
+"""Fast lemmatizer that reproduces `publish.scores.lemmatize` without a spaCy pipeline.
+
+The spaCy pipeline in `publish.scores._spacy_nlp` has no tagger. Without POS tags
+its rule lemmatizer returns each token's lowercased text, so the output is determined
+by tokenization, the punctuation flag and the stopword list. This module extracts the
+tables behind those three from spaCy once: the English tokenizer's prefix/suffix/
+infix/URL patterns, its special cases, and the stopwords. They are stored as plain
+JSON in a local cache, so a warm start needs no spaCy import. The tables are then
+applied with compiled regexes and spaCy's affix-splitting algorithm.
+
+Run `python -m publish.lemmatizer --input pairs.parquet` to check agreement with the
+spaCy-based `lemmatize` on the input texts and compare their speed.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import time
+import unicodedata
+from functools import lru_cache
+from importlib import metadata
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+from publish.scores import synchronized_cache
+
+
+def _cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "publish"
+
+
+def tables_cache_path() -> Path:
+    """Where `load_tables` caches the extracted tables for the installed spaCy version."""
+    return _cache_dir() / f"en_tokenizer_tables-spacy{metadata.version('spacy')}.json"
+
+
+def _extract_tables() -> dict:
+    """Read the English tokenizer tables and stopwords from spaCy."""
+    from spacy.attrs import ORTH
+    from spacy.lang.en import English
+    from spacy.lang.en.stop_words import STOP_WORDS
+
+    tokenizer = English().tokenizer
+    return {
+        "prefix": tokenizer.prefix_search.__self__.pattern,
+        "suffix": tokenizer.suffix_search.__self__.pattern,
+        "infix": tokenizer.infix_finditer.__self__.pattern,
+        "url": tokenizer.url_match.__self__.pattern if tokenizer.url_match else None,
+        "token_match": tokenizer.token_match.__self__.pattern if tokenizer.token_match else None,
+        "special_cases": {
+            text: [attrs[ORTH] for attrs in tokens] for text, tokens in tokenizer.rules.items()
+        },
+        "stopwords": sorted({w.lower() for w in STOP_WORDS}),
+    }
+
+
+def load_tables(cache_path: Optional[str | Path] = None) -> dict:
+    """Tokenizer tables, from the local cache or extracted (and cached) on first use."""
+    path = Path(cache_path) if cache_path else tables_cache_path()
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    tables = _extract_tables()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(tables), encoding="utf-8")
+    tmp.replace(path)
+    return tables
+
+
+def _is_punct(text: str) -> bool:
+    # spacy.lang.lex_attrs.is_punct
+    return all(unicodedata.category(char).startswith("P") for char in text)
+
+
+class FastLemmatizer:
+    """Tokenize, lowercase and drop punctuation and stopwords, like `lemmatize`."""
+
+    def __init__(self, tables: dict):
+        self._prefix = re.compile(tables["prefix"]).search
+        self._suffix = re.compile(tables["suffix"]).search
+        self._infix = re.compile(tables["infix"]).finditer
+        self._url = re.compile(tables["url"]).match if tables["url"] else None
+        self._token_match = (
+            re.compile(tables["token_match"]).match if tables["token_match"] else None
+        )
+        self._specials: dict[str, list[str]] = tables["special_cases"]
+        self._stopwords = frozenset(tables["stopwords"])
+        self._special_spans = self._build_special_spans()
+        # Chunks of letters only that are not special cases need no affix handling.
+        self._plain = re.compile(r"[^\W\d_]+").fullmatch
+        # A whitespace-separated chunk always splits the same way; the affix regexes
+        # are the expensive part, so each distinct chunk is split only once.
+        self._chunk_lemmas = lru_cache(maxsize=500_000)(self._lemmatize_chunk)
+
+    def _build_special_spans(self) -> dict[tuple[str, ...], list[str]]:
+        # spacy.tokenizer.Tokenizer.add_special_case: special cases that contain affixes
+        # are also matched against the token sequence their text splits into without
+        # special cases (e.g. "i", "m", "." from "im." becomes "i", "m.").
+        spans = {}
+        for string, tokens in self._specials.items():
+            if self._prefix(string) or self._suffix(string) or next(self._infix(string), None):
+                pieces = tuple(self._split(string, {}))
+                if len(pieces) > 1:
+                    spans[pieces] = tokens
+        return spans
+
+    def _merge_special_spans(self, tokens: list[str]) -> list[str]:
+        # spacy.tokenizer.Tokenizer._retokenize_special_spans: longest matches first,
+        # then leftmost, without overlaps.
+        matches = []
+        for start in range(len(tokens)):
+            for end in range(start + 2, len(tokens) + 1):
+                if tuple(tokens[start:end]) in self._special_spans:
+                    matches.append((start, end))
+        if not matches:
+            return tokens
+        taken: set[int] = set()
+        chosen = []
+        for start, end in sorted(matches, key=lambda m: (m[0] - m[1], m[0])):
+            if not taken.intersection(range(start, end)):
+                taken.update(range(start, end))
+                chosen.append((start, end))
+        merged: list[str] = []
+        position = 0
+        for start, end in sorted(chosen):
+            merged.extend(tokens[position:start])
+            merged.extend(self._special_spans[tuple(tokens[start:end])])
+            position = end
+        merged.extend(tokens[position:])
+        return merged
+
+    def _split_affixes(
+        self, string: str, specials: dict[str, list[str]]
+    ) -> tuple[list[str], str, list[str]]:
+        # spacy.tokenizer.Tokenizer._split_affixes
+        prefixes: list[str] = []
+        suffixes: list[str] = []
+        last_size = 0
+        while string and len(string) != last_size:
+            if self._token_match and self._token_match(string):
+                break
+            if string in specials:
+                break
+            last_size = len(string)
+
+            match = self._prefix(string)
+            pre_len = match.end() - match.start() if match else 0
+            if pre_len:
+                prefix, minus_pre = string[:pre_len], string[pre_len:]
+                if minus_pre and minus_pre in specials:
+                    prefixes.append(prefix)
+                    string = minus_pre
+                    break
+
+            match = self._suffix(string[pre_len:])
+            suf_len = match.end() - match.start() if match else 0
+            if suf_len:
+                suffix, minus_suf = string[-suf_len:], string[:-suf_len]
+                if minus_suf and minus_suf in specials:
+                    suffixes.append(suffix)
+                    string = minus_suf
+                    break
+
+            if pre_len and suf_len and pre_len + suf_len <= len(string):
+                string = string[pre_len:-suf_len]
+                prefixes.append(prefix)
+                suffixes.append(suffix)
+            elif pre_len:
+                string = minus_pre
+                prefixes.append(prefix)
+            elif suf_len:
+                string = minus_suf
+                suffixes.append(suffix)
+            if string in specials:
+                break
+        return prefixes, string, suffixes
+
+    def _attach(self, string: str, tokens: list[str], specials: dict[str, list[str]]) -> None:
+        # spacy.tokenizer.Tokenizer._attach_tokens, for the part left after the affixes
+        if string in specials:
+            tokens.extend(specials[string])
+        elif (self._token_match and self._token_match(string)) or (
+            self._url and self._url(string)
+        ):
+            tokens.append(string)
+        else:
+            start = 0
+            for match in self._infix(string):
+                infix_start, infix_end = match.start(), match.end()
+                if infix_start == 0:
+                    continue
+                if infix_start != start:
+                    tokens.append(string[start:infix_start])
+                if infix_start != infix_end:
+                    tokens.append(string[infix_start:infix_end])
+                start = infix_end
+            if string[start:]:
+                tokens.append(string[start:])
+
+    def _split(self, chunk: str, specials: dict[str, list[str]]) -> list[str]:
+        prefixes, string, suffixes = self._split_affixes(chunk, specials)
+        tokens = prefixes
+        if string:
+            self._attach(string, tokens, specials)
+        tokens.extend(reversed(suffixes))
+        return tokens
+
+    def _tokenize_chunk(self, chunk: str) -> list[str]:
+        if chunk in self._specials:
+            return list(self._specials[chunk])
+        if self._plain(chunk):
+            return [chunk]
+        tokens = self._split(chunk, self._specials)
+        if len(tokens) > 1:
+            tokens = self._merge_special_spans(tokens)
+        return tokens
+
+    def _lemmatize_chunk(self, chunk: str) -> tuple[str, ...]:
+        lemmas = []
+        for token in self._tokenize_chunk(chunk):
+            lemma = token.strip().lower()
+            if not lemma or lemma in self._stopwords or _is_punct(token):
+                continue
+            lemmas.append(lemma)
+        return tuple(lemmas)
+
+    def tokenize(self, text: str) -> list[str]:
+        return [token for chunk in text.split() for token in self._tokenize_chunk(chunk)]
+
+    def lemmatize(self, text: str) -> tuple[str, ...]:
+        return tuple(lemma for chunk in text.split() for lemma in self._chunk_lemmas(chunk))
+
+    def clear_cache(self) -> None:
+        self._chunk_lemmas.cache_clear()
+
+
+@synchronized_cache(maxsize=1)
+def fast_lemmatizer() -> FastLemmatizer:
+    return FastLemmatizer(load_tables())
+
+
+def compare_with_spacy(texts: Sequence[str]) -> tuple[int, list[tuple[str, tuple, tuple]], float, float]:
+    """Run both lemmatizers over `texts`.
+
+    Returns `(n_agree, mismatches, spacy_seconds, fast_seconds)`, where each mismatch
+    is `(text, spacy_lemmas, fast_lemmas)`.
+    """
+    from publish.scores import spacy_lemmatize
+
+    start = time.perf_counter()
+    expected = [spacy_lemmatize(t) for t in texts]
+    spacy_seconds = time.perf_counter() - start
+
+    lemmatizer = fast_lemmatizer()
+    start = time.perf_counter()
+    actual = [lemmatizer.lemmatize(t) for t in texts]
+    fast_seconds = time.perf_counter() - start
+
+    mismatches = [(t, e, a) for t, e, a in zip(texts, expected, actual) if e != a]
+    return len(texts) - len(mismatches), mismatches, spacy_seconds, fast_seconds
+
+
+def _input_texts(path: str, columns: Iterable[str]) -> list[str]:
+    import pandas as pd
+
+    df = pd.read_parquet(path, columns=list(columns))
+    texts = pd.unique(df.stack().dropna().astype(str).str.strip().to_numpy())
+    return [t for t in texts if t]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Validate and time the fast lemmatizer against the spaCy-based lemmatize"
+    )
+    parser.add_argument("--input", required=True, help="Parquet file with the texts to check")
+    parser.add_argument(
+        "--columns",
+        default="work_title,patent_title,work_abstract,patent_abstract",
+        help="Comma-separated text columns",
+    )
+    args = parser.parse_args()
+
+    texts = _input_texts(args.input, [c.strip() for c in args.columns.split(",") if c.strip()])
+    fast_lemmatizer()  # load the tables outside the timed section
+    n_agree, mismatches, spacy_seconds, fast_seconds = compare_with_spacy(texts)
+    print(
+        f"lemmatizer: texts={len(texts)} agree={n_agree} ({n_agree / max(len(texts), 1):.2%}) "
+        f"spacy={spacy_seconds:.2f}s fast={fast_seconds:.2f}s "
+        f"speedup={spacy_seconds / fast_seconds if fast_seconds else float('inf'):.1f}x"
+    )
+    for text, expected, actual in mismatches[:10]:
+        print(f"  mismatch: {text[:80]!r}\n    spacy={expected}\n    fast={actual}")
+
+
+if __name__ == "__main__":
+    main()
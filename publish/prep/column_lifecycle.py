@@ -0,0 +1,59 @@
+"""Release intermediate and raw input columns once their last consumer has run."""
+from __future__ import annotations
+
+from typing import Sequence
+
+import pandas as pd
+
+from publish.export.export import FINAL_COLUMNS, RENAME_MAP
+from publish.prep.preflight import STAGE_OPTIONAL_INPUTS, STAGE_REQUIREMENTS
+
+# Columns each feature stage reads (including intermediates it creates and then combines):
+# every column of its preflight requirements, then its optional inputs.
+STAGE_INPUTS: dict[str, tuple[str, ...]] = {
+    stage: tuple(
+        dict.fromkeys(
+            [
+                *(
+                    column
+                    for requirement in requirements
+                    for alternative in requirement
+                    for column in alternative
+                ),
+                *STAGE_OPTIONAL_INPUTS.get(stage, ()),
+            ]
+        )
+    )
+    for stage, requirements in STAGE_REQUIREMENTS.items()
+}
+
+# Needed by `prepare_export`, directly or under their pre-rename names.
+EXPORT_COLUMNS = frozenset(FINAL_COLUMNS) | frozenset(RENAME_MAP) | frozenset(RENAME_MAP.values())
+
+
+def release_plan(stage_names: Sequence[str]) -> dict[str, list[str]]:
+    """Map each stage to the columns that can be dropped right after it runs."""
+    last_consumer: dict[str, str] = {}
+    for stage in stage_names:
+        for column in STAGE_INPUTS.get(stage, ()):
+            last_consumer[column] = stage
+
+    plan: dict[str, list[str]] = {stage: [] for stage in stage_names}
+    for column, stage in last_consumer.items():
+        if column not in EXPORT_COLUMNS:
+            plan[stage].append(column)
+    return plan
+
+
+def unconsumed_columns(df: pd.DataFrame, stage_names: Sequence[str]) -> list[str]:
+    """Columns that no stage reads and the export does not keep."""
+    consumed = {c for stage in stage_names for c in STAGE_INPUTS.get(stage, ())}
+    return [c for c in df.columns if c not in consumed and c not in EXPORT_COLUMNS]
+
+
+def release_columns(df: pd.DataFrame, columns: Sequence[str]) -> pd.DataFrame:
+    """Drop `columns` in place so the caller's frame frees them too."""
+    present = [c for c in columns if c in df.columns]
+    if present:
+        df.drop(columns=present, inplace=True)
+    return df
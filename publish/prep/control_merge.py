@@ -1,102 +1,202 @@
 """Helpers to merge compact outputs with Pierre control datasets."""
 from __future__ import annotations
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from pandas._libs.parsers import STR_NA_VALUES
 
 from publish.utils import require_columns
 
 
-def _read_csv(path: Path) -> pd.DataFrame:
+def _read_csv(path: Path) -> pa.Table:
+    """Read a CSV with Arrow's multithreaded reader, typing columns like `pd.read_csv`."""
     if not path.exists():
         raise FileNotFoundError(f"Missing control file: {path}")
-    return pd.read_csv(path)
+    # Arrow parses ISO dates/timestamps; pandas keeps them as text, so read those as strings.
+    with pacsv.open_csv(path) as reader:
+        column_types = {
+            field.name: pa.string()
+            for field in reader.schema
+            if pa.types.is_temporal(field.type)
+        }
+    # pandas' default NA strings, which include "None" and "<NA>" unlike Arrow's.
+    convert_options = pacsv.ConvertOptions(
+        null_values=sorted(STR_NA_VALUES),
+        strings_can_be_null=True,
+        column_types=column_types,
+    )
+    try:
+        return pacsv.read_csv(path, convert_options=convert_options)
+    except pa.ArrowInvalid:
+        # Type inference from the first block did not hold for the whole file.
+        return pa.Table.from_pandas(pd.read_csv(path), preserve_index=False)
 
 
-def _prepare_merged_control(df: pd.DataFrame, *, context: str) -> pd.DataFrame:
-    require_columns(df, ["paperid", "patent"], context=context)
-    out = df.copy()
-    out["pair_id"] = out["paperid"].astype(str) + "|" + out["patent"].astype(str)
-    out = out.drop(columns=["paperid", "patent"], errors="ignore")
-    return out
+def _as_str(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """`Series.astype(str)` for a key column, e.g. missing values become "nan"."""
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        return pc.fill_null(column, "nan")
+    return pa.chunked_array([pa.array(column.to_pandas().astype(str).to_numpy(dtype=object))])
 
 
-def _prepare_true_merged_control(df: pd.DataFrame, *, context: str) -> pd.DataFrame:
-    require_columns(df, ["work_id", "patent_id_us"], context=context)
-    out = df.copy()
-    out["pair_id"] = (
-        out["work_id"].astype(str).str.replace("https://openalex.org/", "", regex=False)
-        + "|"
-        + out["patent_id_us"].astype(str)
+def _prepare_merged_control(table: pa.Table, *, context: str) -> pa.Table:
+    require_columns(table, ["paperid", "patent"], context=context)
+    pair_id = pc.binary_join_element_wise(
+        _as_str(table["paperid"]), _as_str(table["patent"]), "|"
     )
-    out = out.drop(columns=["work_id", "patent_id_us", "patent_id"], errors="ignore")
-    return out
+    table = table.append_column("pair_id", pair_id)
+    return table.drop_columns(["paperid", "patent"])
+
+
+def _prepare_true_merged_control(table: pa.Table, *, context: str) -> pa.Table:
+    require_columns(table, ["work_id", "patent_id_us"], context=context)
+    work_id = pc.replace_substring(_as_str(table["work_id"]), "https://openalex.org/", "")
+    pair_id = pc.binary_join_element_wise(work_id, _as_str(table["patent_id_us"]), "|")
+    table = table.append_column("pair_id", pair_id)
+    dropped = [c for c in ["work_id", "patent_id_us", "patent_id"] if c in table.column_names]
+    return table.drop_columns(dropped)
 
 
-def _combine_controls(merged_df: pd.DataFrame, true_merged_df: pd.DataFrame) -> pd.DataFrame:
-    combined = pd.concat([merged_df, true_merged_df], ignore_index=True)
+def _combine_controls(merged: pa.Table, true_merged: pa.Table) -> pd.DataFrame:
+    # Concatenating tables only references both tables' buffers; the single conversion
+    # releases each Arrow column as soon as it has been converted.
+    combined = pa.concat_tables([merged, true_merged], promote_options="permissive")
+    del merged, true_merged
+    combined = combined.to_pandas(self_destruct=True, split_blocks=True)
     combined = combined.drop_duplicates(subset=["pair_id"], keep="last")
     return combined
 
 
-def load_and_prepare_control_frames(control_root: str | Path) -> dict[str, pd.DataFrame]:
-    """Load and normalize available Pierre control datasets."""
-    control_root = Path(control_root)
-    pierre_dir = control_root / "pierre_data"
-    noselfcite_dir = control_root / "pierre_data_noselfcite"
+REQUIRED_CONTROL_PAIRS = {
+    "control_combined_y0": ("merged_PPP.csv", "true_merged_PPP.csv"),
+    "control_combined_y5": ("merged_PPP_y5.csv", "true_merged_PPP_y5.csv"),
+}
 
-    frames: dict[str, pd.DataFrame] = {}
+OPTIONAL_CONTROL_PAIRS = {
+    "control_noselfcite_combined_y0": (
+        "merged_PPP_Y0_no_selfcite.csv",
+        "true_merged_PPP_Y0_no_selfcite.csv",
+    ),
+    "control_noselfcite_combined_y5": (
+        "merged_PPP_Y5_no_selfcite.csv",
+        "true_merged_PPP_Y5_no_selfcite.csv",
+    ),
+}
 
-    required_pairs = {
-        "control_combined_y0": ("merged_PPP.csv", "true_merged_PPP.csv"),
-        "control_combined_y5": ("merged_PPP_y5.csv", "true_merged_PPP_y5.csv"),
-    }
-    for key, (merged_name, true_merged_name) in required_pairs.items():
-        merged_df = _prepare_merged_control(
-            _read_csv(pierre_dir / merged_name),
-            context=f"{key}:{merged_name}",
-        )
-        true_merged_df = _prepare_true_merged_control(
-            _read_csv(pierre_dir / true_merged_name),
-            context=f"{key}:{true_merged_name}",
-        )
-        frames[key] = _combine_controls(merged_df, true_merged_df)
 
-    optional_pairs = {
-        "control_noselfcite_combined_y0": (
-            "merged_PPP_Y0_no_selfcite.csv",
-            "true_merged_PPP_Y0_no_selfcite.csv",
-        ),
-        "control_noselfcite_combined_y5": (
-            "merged_PPP_Y5_no_selfcite.csv",
-            "true_merged_PPP_Y5_no_selfcite.csv",
-        ),
+def _control_file_pairs(control_root: Path) -> dict[str, tuple[Path, Path]]:
+    pierre_dir = control_root / "pierre_data"
+    noselfcite_dir = control_root / "pierre_data_noselfcite"
+
+    pairs = {
+        key: (pierre_dir / merged_name, pierre_dir / true_merged_name)
+        for key, (merged_name, true_merged_name) in REQUIRED_CONTROL_PAIRS.items()
     }
-    for key, (merged_name, true_merged_name) in optional_pairs.items():
+    for key, (merged_name, true_merged_name) in OPTIONAL_CONTROL_PAIRS.items():
         merged_path = noselfcite_dir / merged_name
         true_merged_path = noselfcite_dir / true_merged_name
         if not merged_path.exists() or not true_merged_path.exists():
             print(f"Skipping optional control dataset {key}; missing files in {noselfcite_dir}")
             continue
+        pairs[key] = (merged_path, true_merged_path)
+    return pairs
 
-        merged_df = _prepare_merged_control(
-            _read_csv(merged_path),
-            context=f"{key}:{merged_name}",
-        )
-        true_merged_df = _prepare_true_merged_control(
-            _read_csv(true_merged_path),
-            context=f"{key}:{true_merged_name}",
-        )
-        frames[key] = _combine_controls(merged_df, true_merged_df)
 
-    return frames
+def _check_required_control_files(control_root: Path) -> None:
+    for merged_name, true_merged_name in REQUIRED_CONTROL_PAIRS.values():
+        for name in (merged_name, true_merged_name):
+            path = control_root / "pierre_data" / name
+            if not path.exists():
+                raise FileNotFoundError(f"Missing control file: {path}")
+
+
+def _load_control_pair(key: str, merged_path: Path, true_merged_path: Path) -> pd.DataFrame:
+    return _combine_controls(
+        _prepare_merged_control(_read_csv(merged_path), context=f"{key}:{merged_path.name}"),
+        _prepare_true_merged_control(
+            _read_csv(true_merged_path), context=f"{key}:{true_merged_path.name}"
+        ),
+    )
+
+
+def load_and_prepare_control_frames(
+    control_root: str | Path, *, max_workers: Optional[int] = None
+) -> dict[str, pd.DataFrame]:
+    """Load and normalize available Pierre control datasets.
+
+    The control datasets are read concurrently in a thread pool (Arrow's CSV reader
+    releases the GIL and parses each file with multiple threads).
+    """
+    _check_required_control_files(Path(control_root))
+    pairs = _control_file_pairs(Path(control_root))
+    with ThreadPoolExecutor(max_workers=max_workers or len(pairs) or 1) as pool:
+        futures = {key: pool.submit(_load_control_pair, key, *paths) for key, paths in pairs.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+
+def load_control_frames_in_background(control_root: str | Path) -> Future:
+    """Start `load_and_prepare_control_frames` on a background thread.
+
+    Controls are only needed at merge time, so loading them can overlap with feature
+    computation; call `.result()` on the returned future to get the frames. Missing
+    required files are reported right away; `raise_if_failed` surfaces a read error
+    before the features are computed if the load has already failed by then.
+    """
+    _check_required_control_files(Path(control_root))
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="control-loader")
+    future = executor.submit(load_and_prepare_control_frames, control_root)
+    executor.shutdown(wait=False)
+    return future
+
+
+def raise_if_failed(future: Optional[Future]) -> None:
+    """Re-raise the error of a finished background load; no-op while it is running."""
+    if future is not None and future.done() and future.exception() is not None:
+        raise future.exception()
+
+
+def _control_match(
+    key: str,
+    controls: pd.DataFrame,
+    control_columns: list[str],
+    match_stats: Optional[dict[str, dict]],
+) -> None:
+    """Print (and store in `match_stats`) the row count, control columns and match rate."""
+    present_control_columns = [c for c in control_columns if c in controls.columns]
+    match_rate = (
+        controls[present_control_columns].notna().any(axis=1).mean()
+        if present_control_columns
+        else 0.0
+    )
+    print(
+        f"{key}: rows={len(controls)} controls={len(present_control_columns)} "
+        f"match_rate={match_rate:.2%}"
+    )
+    if match_stats is not None:
+        match_stats[key] = {
+            "rows": len(controls),
+            "controls": len(present_control_columns),
+            "match_rate": float(match_rate),
+        }
 
 
 def merge_compact_with_controls(
-    compact_df: pd.DataFrame, control_frames: dict[str, pd.DataFrame]
+    compact_df: pd.DataFrame,
+    control_frames: dict[str, pd.DataFrame],
+    *,
+    match_stats: Optional[dict[str, dict]] = None,
 ) -> dict[str, pd.DataFrame]:
-    """Left-join compact output with each prepared control frame by pair_id."""
+    """Left-join compact output with each prepared control frame by pair_id.
+
+    If `match_stats` is given, the printed row count, control column count and match
+    rate of each merge are also stored in it under the control key.
+    """
     require_columns(compact_df, ["pair_id"], context="merge_compact_with_controls:compact_df")
 
     merged_outputs: dict[str, pd.DataFrame] = {}
@@ -122,16 +222,42 @@ def merge_compact_with_controls(
             control_columns = [
                 f"{c}_control" if c in overlap else c for c in control_columns
             ]
-        present_control_columns = [c for c in control_columns if c in merged.columns]
-        match_rate = (
-            merged[present_control_columns].notna().any(axis=1).mean()
-            if present_control_columns
-            else 0.0
-        )
-        print(
-            f"{key}: rows={len(merged)} controls={len(present_control_columns)} "
-            f"match_rate={match_rate:.2%}"
-        )
+        _control_match(key, merged, control_columns, match_stats)
         merged_outputs[key] = merged
 
     return merged_outputs
+
+
+def align_controls(
+    compact_df: pd.DataFrame,
+    control_frames: dict[str, pd.DataFrame],
+    *,
+    match_stats: Optional[dict[str, dict]] = None,
+) -> dict[str, pd.DataFrame]:
+    """The control columns `merge_compact_with_controls` would add, without the compact ones.
+
+    Each frame has `pair_id` and the control columns (named as in the merged output),
+    one row per row of `compact_df`, in the same order. Compact columns that the merged
+    output renames with a `_compact` suffix are listed in `attrs["control_overlap"]`.
+    """
+    require_columns(compact_df, ["pair_id"], context="align_controls:compact_df")
+
+    aligned_outputs: dict[str, pd.DataFrame] = {}
+    for key, control_df in control_frames.items():
+        require_columns(control_df, ["pair_id"], context=f"align_controls:{key}")
+        overlap = [c for c in control_df.columns if c != "pair_id" and c in compact_df.columns]
+        control_df = control_df.rename(columns={c: f"{c}_control" for c in overlap})
+
+        aligned = compact_df[["pair_id"]].merge(control_df, on="pair_id", how="left")
+        if len(aligned) != len(compact_df):
+            raise ValueError(
+                f"align_controls:{key} changed row count "
+                f"from {len(compact_df)} to {len(aligned)}"
+            )
+        aligned.attrs["control_overlap"] = overlap
+
+        control_columns = [c for c in aligned.columns if c != "pair_id"]
+        _control_match(key, aligned, control_columns, match_stats)
+        aligned_outputs[key] = aligned
+
+    return aligned_outputs
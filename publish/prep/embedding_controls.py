@@ -0,0 +1,243 @@
+"""Generate nearest-neighbour control pairs from paper and patent embeddings.
+
+For each real pair, the most similar patents that the paper is *not* paired with are
+retrieved from the same (`ipc_sectors`, `patent_priority_year`) block. The resulting
+frame has one row per control pair, in the same shape as the pipeline input, so it
+can go through `build_features` like any other input.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from publish.features.patent_classification import ipc_code_to_sector_map, map_ipc_sectors
+from publish.scores import encode_texts, l2_normalize
+from publish.utils import require_columns, to_python_objects
+
+CONTROL_PAIR_SOURCE = "embedding_control"
+
+# Non-`patent_*` inputs that describe the patent rather than the paper.
+PATENT_SIDE_COLUMNS = ("ipc_codes", "ipc_sectors", "wipo_fields")
+
+# Inputs that describe the real pair itself; they do not carry over to a control pair.
+PAIR_LEVEL_COLUMNS = ("pair_id", "pair_source", "collab_countries")
+
+Encoder = Callable[[Sequence[str]], np.ndarray]
+
+
+def _is_patent_column(column: str) -> bool:
+    return column.startswith("patent_") or column in PATENT_SIDE_COLUMNS
+
+
+def _entity_text(df: pd.DataFrame, columns: Sequence[str]) -> pd.Series:
+    text = pd.Series("", index=df.index, dtype=object)
+    for column in columns:
+        if column not in df.columns:
+            continue
+        part = df[column].map(lambda v: str(v).strip() if isinstance(v, str) else "")
+        text = (text + " " + part).str.strip()
+    return text
+
+
+def patent_key(df: pd.DataFrame) -> pd.Series:
+    """Patent identifier of each pair: `patent_id_us`, else "US-" + `patent_id`."""
+    if "patent_id_us" in df.columns:
+        return df["patent_id_us"].astype(str)
+    return "US-" + df["patent_id"].astype(str)
+
+
+def _block_keys(df: pd.DataFrame, ipc_technology_xlsx_path: Optional[str | Path]) -> pd.Series:
+    """`<sorted sectors>#<priority year>`; None where either part is unknown."""
+    if "ipc_sectors" in df.columns:
+        sectors = to_python_objects(df["ipc_sectors"])
+    else:
+        if ipc_technology_xlsx_path is None:
+            raise ValueError(
+                "embedding_controls: missing required columns: ipc_sectors "
+                "(or pass ipc_technology_xlsx_path to derive it from ipc_codes)"
+            )
+        require_columns(df, ["ipc_codes"], context="embedding_controls")
+        mapping = ipc_code_to_sector_map(str(ipc_technology_xlsx_path))
+        sectors = to_python_objects(df["ipc_codes"]).apply(lambda xs: map_ipc_sectors(xs, mapping))
+
+    if "patent_priority_year" in df.columns:
+        years = df["patent_priority_year"].astype("Int64")
+    else:
+        require_columns(df, ["patent_filing_date"], context="embedding_controls")
+        years = pd.to_datetime(df["patent_filing_date"], errors="coerce").dt.year.astype("Int64")
+
+    sector_keys = sectors.map(
+        lambda xs: "|".join(sorted({s for s in xs if s})) if isinstance(xs, list) else ""
+    )
+    keys = sector_keys + "#" + years.astype(str)
+    return keys.where((sector_keys != "") & years.notna(), None)
+
+
+def top_k_similar(
+    queries: np.ndarray,
+    candidates: np.ndarray,
+    *,
+    top_k: int,
+    exclude_query: Optional[np.ndarray] = None,
+    exclude_candidate: Optional[np.ndarray] = None,
+    block_size: int = 4096,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Blocked top-k inner-product search.
+
+    Scores are computed one (`block_size` x `block_size`) tile at a time and merged into
+    a running top-k, so peak memory stays bounded regardless of the input sizes.
+    `(exclude_query[i], exclude_candidate[i])` pairs are never returned.
+
+    Returns `(indices, scores)`, each of shape `(len(queries), top_k)` and sorted by
+    descending score; unfilled slots have index -1 and score -inf.
+    """
+    n_queries = len(queries)
+    n_candidates = len(candidates)
+    best_idx = np.full((n_queries, top_k), -1, dtype=np.int64)
+    best_scores = np.full((n_queries, top_k), -np.inf, dtype=np.float32)
+    if n_queries == 0 or n_candidates == 0 or top_k <= 0:
+        return best_idx, best_scores
+
+    if exclude_query is None or exclude_candidate is None:
+        exclude_query = np.empty(0, dtype=np.int64)
+        exclude_candidate = np.empty(0, dtype=np.int64)
+
+    for q_start in range(0, n_queries, block_size):
+        q_stop = min(q_start + block_size, n_queries)
+        in_q = (exclude_query >= q_start) & (exclude_query < q_stop)
+        block_ex_q = exclude_query[in_q]
+        block_ex_c = exclude_candidate[in_q]
+
+        for c_start in range(0, n_candidates, block_size):
+            c_stop = min(c_start + block_size, n_candidates)
+            scores = queries[q_start:q_stop] @ candidates[c_start:c_stop].T
+
+            in_c = (block_ex_c >= c_start) & (block_ex_c < c_stop)
+            scores[block_ex_q[in_c] - q_start, block_ex_c[in_c] - c_start] = -np.inf
+
+            merged_scores = np.concatenate([best_scores[q_start:q_stop], scores], axis=1)
+            merged_idx = np.concatenate(
+                [
+                    best_idx[q_start:q_stop],
+                    np.broadcast_to(np.arange(c_start, c_stop), scores.shape),
+                ],
+                axis=1,
+            )
+            k = min(top_k, merged_scores.shape[1])
+            keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores[q_start:q_stop, :k] = np.take_along_axis(merged_scores, keep, axis=1)
+            best_idx[q_start:q_stop, :k] = np.take_along_axis(merged_idx, keep, axis=1)
+
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    best_idx = np.take_along_axis(best_idx, order, axis=1)
+    best_idx[~np.isfinite(best_scores)] = -1
+    return best_idx, best_scores
+
+
+def generate_embedding_controls(
+    df: pd.DataFrame,
+    *,
+    top_k: int = 5,
+    ipc_technology_xlsx_path: Optional[str | Path] = None,
+    encoder: Optional[Encoder] = None,
+    block_size: int = 4096,
+) -> pd.DataFrame:
+    """Build top-k nearest-neighbour control pairs for every real pair in `df`.
+
+    `df` is the prepared pipeline input (one row per real pair). Papers are embedded
+    from `work_title`/`work_abstract` and patents from `patent_title`/`patent_abstract`
+    using `encoder` (the configured backend via `publish.scores.encode_texts` by default).
+    """
+    require_columns(df, ["paper_id"], context="embedding_controls")
+    if "patent_id_us" not in df.columns and "patent_id" not in df.columns:
+        raise ValueError("embedding_controls: missing required columns: patent_id or patent_id_us")
+    encoder = encoder or encode_texts
+
+    paper_keys = df["paper_id"].astype(str)
+    patent_keys = patent_key(df)
+    blocks = _block_keys(df, ipc_technology_xlsx_path)
+
+    paper_text = _entity_text(df, ["work_title", "work_abstract"])
+    patent_text = _entity_text(df, ["patent_title", "patent_abstract"])
+
+    # One representative row per entity supplies its side of every control pair.
+    paper_rows = pd.Series(df.index, index=paper_keys).groupby(level=0).first()
+    patent_rows = pd.Series(df.index, index=patent_keys).groupby(level=0).first()
+    paper_text = paper_text.loc[paper_rows.to_numpy()].set_axis(paper_rows.index)
+    patent_text = patent_text.loc[patent_rows.to_numpy()].set_axis(patent_rows.index)
+    paper_text = paper_text[paper_text != ""]
+    patent_text = patent_text[patent_text != ""]
+
+    empty = df.iloc[0:0].drop(columns=list(PAIR_LEVEL_COLUMNS), errors="ignore")
+    if paper_text.empty or patent_text.empty:
+        return empty
+
+    embeddings = l2_normalize(encoder(list(paper_text) + list(patent_text)))
+    paper_emb = dict(zip(paper_text.index, embeddings[: len(paper_text)]))
+    patent_emb = dict(zip(patent_text.index, embeddings[len(paper_text) :]))
+
+    real = pd.DataFrame({"paper": paper_keys, "patent": patent_keys, "block": blocks})
+    real = real.dropna(subset=["block"])
+    real = real[real["paper"].isin(paper_emb.keys()) & real["patent"].isin(patent_emb.keys())]
+
+    results = []
+    for block, group in real.groupby("block", sort=True):
+        # A patent's block depends only on patent-side columns, so every real pair
+        # involving this block's patents is a row of `group`.
+        papers = pd.Index(group["paper"].drop_duplicates())
+        patents = pd.Index(group["patent"].drop_duplicates())
+
+        idx, scores = top_k_similar(
+            np.stack([paper_emb[p] for p in papers]),
+            np.stack([patent_emb[p] for p in patents]),
+            top_k=top_k,
+            exclude_query=papers.get_indexer(group["paper"]),
+            exclude_candidate=patents.get_indexer(group["patent"]),
+            block_size=block_size,
+        )
+        q_pos, rank = np.nonzero(idx >= 0)
+        if not len(q_pos):
+            continue
+        results.append(
+            pd.DataFrame(
+                {
+                    "paper": np.asarray(papers, dtype=object)[q_pos],
+                    "patent": np.asarray(patents, dtype=object)[idx[q_pos, rank]],
+                    "control_rank": rank + 1,
+                    "control_similarity": scores[q_pos, rank].astype(float),
+                    "control_block": block,
+                }
+            )
+        )
+
+    if not results:
+        return empty
+
+    matches = pd.concat(results, ignore_index=True)
+    matches = matches.drop_duplicates(subset=["paper", "patent"], keep="first")
+
+    columns = [c for c in df.columns if c not in PAIR_LEVEL_COLUMNS]
+    paper_columns = [c for c in columns if not _is_patent_column(c)]
+    patent_columns = [c for c in columns if _is_patent_column(c)]
+
+    controls = pd.concat(
+        [
+            df.loc[paper_rows.loc[matches["paper"]].to_numpy(), paper_columns].reset_index(drop=True),
+            df.loc[patent_rows.loc[matches["patent"]].to_numpy(), patent_columns].reset_index(drop=True),
+        ],
+        axis=1,
+    )[columns]
+    controls["pair_source"] = CONTROL_PAIR_SOURCE
+    controls["pair_id"] = matches["paper"].to_numpy() + "|" + matches["patent"].to_numpy()
+    for column in ["control_rank", "control_similarity", "control_block"]:
+        controls[column] = matches[column].to_numpy()
+
+    print(
+        f"embedding_controls: real_pairs={len(df)} blocks={real['block'].nunique()} "
+        f"control_pairs={len(controls)}"
+    )
+    return controls
@@ -0,0 +1,334 @@
+"""Persistent cross-run store of paper- and patent-level features.
+
+Features that depend on only one side of a pair (team sizes, organization types,
+reference statistics, IPC sectors, lemmatized titles and abstracts) are stored in
+parquet segments under `<store_dir>/paper/` and `<store_dir>/patent/`, keyed by the
+entity id and a content hash of the source columns they are computed from. Each run
+looks its entities up, computes only the new or changed ones and appends them as a
+new segment, so concurrent writers never touch each other's files.
+
+A long-lived process (the scoring server) passes an `EntityStore` instead of the
+directory: the segments are read once, lookups are served from memory, and new
+entities are written in batches instead of one segment per call.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from publish.features.org_collab import assignee_type, author_type, multiple_distinct
+from publish.features.patent_classification import ipc_code_to_sector_map, map_ipc_sectors
+from publish.prep.embedding_controls import patent_key
+from publish.prep.id_dictionary import IdDictionary
+from publish.scores import lemmatize
+from publish.utils import list_lengths, list_means, to_python_objects
+
+# Bump when a feature definition changes so that stored values are recomputed.
+ENTITY_STORE_VERSION = 1
+
+HASH_COLUMN = "content_hash"
+
+ENTITY_KEYS = {"paper": "paper_id", "patent": "patent_id_us"}
+
+
+def lemma_sets(series: pd.Series) -> pd.Series:
+    """Distinct lowercased lemmas per text, as used by the word overlap score.
+
+    Missing and empty texts give pd.NA (no score), like `_score_word_overlap`.
+    """
+
+    def _lemmas(value):
+        if pd.isna(value) or not str(value):
+            return pd.NA
+        return sorted({t.lower() for t in lemmatize(str(value)) if t})
+
+    cells = np.empty(len(series), dtype=object)
+    cells[:] = [_lemmas(v) for v in to_python_objects(series)]
+    return pd.Series(cells, index=series.index, name=series.name)
+
+
+_STRING_LIST = pa.list_(pa.string())
+
+# feature -> (source column, stored Arrow type, compute from the source column)
+ENTITY_FEATURES: dict[str, dict[str, tuple[str, pa.DataType, Callable]]] = {
+    "paper": {
+        "author_team_size": ("work_author_ids", pa.int64(), list_lengths),
+        "multiple_author_institution": ("work_institution_names", pa.bool_(), multiple_distinct),
+        "author_type": ("work_institution_types", pa.string(), author_type),
+        "num_work_references": ("work_referenced_works", pa.int64(), list_lengths),
+        "work_reference_age_days_mean": ("work_reference_age_days", pa.float64(), list_means),
+        "work_reference_cited_by_counts_mean": (
+            "work_reference_cited_by_counts",
+            pa.float64(),
+            list_means,
+        ),
+        "work_title_lemmas": ("work_title", _STRING_LIST, lemma_sets),
+        "work_abstract_lemmas": ("work_abstract", _STRING_LIST, lemma_sets),
+    },
+    "patent": {
+        "inventor_team_size": ("patent_inventor_ids", pa.int64(), list_lengths),
+        "multiple_assignee": ("patent_assignee_names", pa.bool_(), multiple_distinct),
+        "assignee_type": ("patent_assignee_types", pa.string(), assignee_type),
+        "patent_num_references": ("patent_doi_references", pa.int64(), list_lengths),
+        "patent_reference_age_days_mean": ("patent_reference_age_days", pa.float64(), list_means),
+        "patent_reference_cited_by_counts_mean": (
+            "patent_reference_cited_by_counts",
+            pa.float64(),
+            list_means,
+        ),
+        # Computed with the IPC mapping file; see `_ipc_sector_feature`.
+        "ipc_sectors": ("ipc_codes", _STRING_LIST, None),
+        "patent_title_lemmas": ("patent_title", _STRING_LIST, lemma_sets),
+        "patent_abstract_lemmas": ("patent_abstract", _STRING_LIST, lemma_sets),
+    },
+}
+
+
+def _ipc_sector_feature(ipc_technology_xlsx: str | Path) -> Callable[[pd.Series], pd.Series]:
+    mapping = ipc_code_to_sector_map(str(ipc_technology_xlsx))
+    return lambda codes: to_python_objects(codes).apply(lambda xs: map_ipc_sectors(xs, mapping))
+
+
+@lru_cache(maxsize=8)
+def _cached_digest(path: str, mtime_ns: int, size: int) -> str:
+    return hashlib.blake2b(Path(path).read_bytes(), digest_size=16).hexdigest()
+
+
+def _file_digest(path: str | Path) -> str:
+    """Content digest of `path`, recomputed only when its modification time or size change."""
+    stat = Path(path).stat()
+    return _cached_digest(str(Path(path).resolve()), stat.st_mtime_ns, stat.st_size)
+
+
+def _entity_keys(df: pd.DataFrame, entity: str) -> pd.Series:
+    if entity == "patent":
+        return patent_key(df)
+    return df[ENTITY_KEYS[entity]].astype(str)
+
+
+def _content_hashes(
+    df: pd.DataFrame, columns: list[str], salt: str, id_dictionary: Optional[IdDictionary]
+) -> pd.Series:
+    """Per-row digest of the source `columns` (their names and Python values) and `salt`.
+
+    Interned id columns are hashed as their id strings, which unlike the codes are the
+    same in every run.
+    """
+    if id_dictionary is not None:
+        values = [to_python_objects(id_dictionary.decode(df[c])) for c in columns]
+    else:
+        values = [to_python_objects(df[c]) for c in columns]
+    prefix = repr((salt, tuple(columns)))
+    hashes = [
+        hashlib.blake2b((prefix + repr(row)).encode(), digest_size=16).hexdigest()
+        for row in zip(*values)
+    ]
+    return pd.Series(hashes, index=df.index, dtype=object)
+
+
+def _read_entities(
+    entity_dir: Path, key: str, keys: Optional[pd.Index], schema: pa.Schema
+) -> pd.DataFrame:
+    """Stored rows for `keys` (every stored row if None), one per (key, content hash)."""
+    files = sorted(str(p) for p in entity_dir.glob("*.parquet"))
+    if not files or (keys is not None and not len(keys)):
+        return pd.DataFrame(columns=schema.names)
+    dataset = ds.dataset(files, format="parquet", schema=schema)
+    if keys is None:
+        table = dataset.to_table()
+    else:
+        table = dataset.to_table(filter=ds.field(key).isin(pa.array(keys.to_numpy(), pa.string())))
+    return _table_frame(table).drop_duplicates(subset=[key, HASH_COLUMN], keep="last")
+
+
+def _table_frame(table: pa.Table) -> pd.DataFrame:
+    """Float columns as numpy, every other column as objects with NA for nulls."""
+    columns = {}
+    for name in table.column_names:
+        column = table[name]
+        if pa.types.is_floating(column.type):
+            columns[name] = column.to_numpy()
+        else:
+            cells = np.empty(len(column), dtype=object)
+            cells[:] = [pd.NA if v is None else v for v in column.to_pylist()]
+            columns[name] = pd.Series(cells, dtype=object)
+    return pd.DataFrame(columns)
+
+
+def _write_segment(entity_dir: Path, table: pa.Table) -> Path:
+    entity_dir.mkdir(parents=True, exist_ok=True)
+    path = entity_dir / f"part-{pd.Timestamp.now('UTC'):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+    tmp = path.with_suffix(".tmp")
+    pq.write_table(table, tmp)
+    tmp.replace(path)
+    return path
+
+
+def _entity_schema(entity: str, names) -> pa.Schema:
+    features = ENTITY_FEATURES[entity]
+    return pa.schema(
+        [(ENTITY_KEYS[entity], pa.string()), (HASH_COLUMN, pa.string())]
+        + [(name, features[name][1]) for name in names]
+    )
+
+
+class EntityStore:
+    """A store directory held in memory, for processes that attach features many times.
+
+    Every segment is read once, when the store is opened; lookups then never touch the
+    files. New entities are added to memory and written as one segment per entity
+    kind and feature set once `flush_rows` of them are pending, and by `flush`, which
+    the owner calls before exiting.
+    """
+
+    def __init__(self, store_dir: str | Path, *, flush_rows: int = 10_000):
+        self.store_dir = Path(store_dir)
+        self.flush_rows = flush_rows
+        self._lock = threading.Lock()
+        self._rows: dict[str, dict[tuple[str, str], dict]] = {}
+        self._pending: dict[tuple[str, pa.Schema], list[pa.Table]] = {}
+        self._pending_rows = 0
+        for entity, features in ENTITY_FEATURES.items():
+            key = ENTITY_KEYS[entity]
+            stored = _read_entities(
+                self.store_dir / entity, key, None, _entity_schema(entity, features)
+            )
+            self._rows[entity] = self._index(stored, key)
+        print(
+            "entity_store: loaded "
+            + " ".join(f"{entity}={len(rows)}" for entity, rows in self._rows.items())
+        )
+
+    @staticmethod
+    def _index(frame: pd.DataFrame, key: str) -> dict[tuple[str, str], dict]:
+        names = [c for c in frame.columns if c not in (key, HASH_COLUMN)]
+        values = [frame[name].to_numpy() for name in names]
+        return {
+            (k, h): dict(zip(names, row))
+            for k, h, *row in zip(frame[key].to_numpy(), frame[HASH_COLUMN].to_numpy(), *values)
+        }
+
+    def lookup(self, entity: str, ids: pd.MultiIndex, names: list[str]) -> pd.DataFrame:
+        """Stored `names` of the `(key, content hash)` `ids` that are in the store."""
+        with self._lock:
+            rows = self._rows[entity]
+            found = [i for i in ids if i in rows]
+            values = [[rows[i].get(name, pd.NA) for name in names] for i in found]
+        index = pd.MultiIndex.from_tuples(found, names=ids.names) if found else ids[:0]
+        return pd.DataFrame(values, index=index, columns=names, dtype=object)
+
+    def add(self, entity: str, frame: pd.DataFrame, schema: pa.Schema) -> None:
+        """Add computed rows (key, content hash and feature columns) to memory and the queue."""
+        table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+        with self._lock:
+            self._rows[entity].update(self._index(_table_frame(table), ENTITY_KEYS[entity]))
+            self._pending.setdefault((entity, schema), []).append(table)
+            self._pending_rows += len(frame)
+            if self._pending_rows >= self.flush_rows:
+                self._flush()
+
+    def flush(self) -> None:
+        """Write every pending row to the store directory."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        for (entity, _), tables in self._pending.items():
+            _write_segment(self.store_dir / entity, pa.concat_tables(tables))
+        self._pending.clear()
+        self._pending_rows = 0
+
+
+def attach_entity_features(
+    df: pd.DataFrame,
+    store_dir: str | Path | EntityStore,
+    *,
+    ipc_technology_xlsx: Optional[str | Path] = None,
+    id_dictionary: Optional[IdDictionary] = None,
+) -> pd.DataFrame:
+    """Add the stored entity-level feature columns to `df`, computing missing entities.
+
+    Only features whose source column is present in `df` are attached. Their names are
+    recorded in `df.attrs["entity_features"]`; the stages that produce these columns
+    reuse them instead of recomputing them (see `publish.utils.from_entity_store`).
+    With an `EntityStore`, entities are looked up in and added to its memory.
+    """
+    store = store_dir if isinstance(store_dir, EntityStore) else None
+    store_dir = store.store_dir if store is not None else Path(store_dir)
+    for entity, features in ENTITY_FEATURES.items():
+        key = ENTITY_KEYS[entity]
+        if entity == "paper" and key not in df.columns:
+            continue
+        if entity == "patent" and "patent_id_us" not in df.columns and "patent_id" not in df.columns:
+            continue
+
+        computes = {}
+        salt = f"v{ENTITY_STORE_VERSION}"
+        for name, (source, _, compute) in features.items():
+            if source not in df.columns:
+                continue
+            if name == "ipc_sectors":
+                if ipc_technology_xlsx is None:
+                    continue
+                compute = _ipc_sector_feature(ipc_technology_xlsx)
+                salt += f"|ipc:{_file_digest(ipc_technology_xlsx)}"
+            computes[name] = (source, compute)
+        if not computes:
+            continue
+
+        sources = sorted({source for source, _ in computes.values()})
+        keys = _entity_keys(df, entity)
+        hashes = _content_hashes(df, sources, salt, id_dictionary)
+        ids = pd.MultiIndex.from_arrays([keys, hashes])
+        first = ~ids.duplicated()
+        unique_ids = ids[first]
+
+        schema = _entity_schema(entity, computes)
+        entity_dir = store_dir / entity
+        if store is not None:
+            stored = store.lookup(entity, unique_ids.set_names([key, HASH_COLUMN]), list(computes))
+        else:
+            stored = _read_entities(entity_dir, key, pd.Index(keys.unique()), schema)
+            stored = stored.set_index([key, HASH_COLUMN])
+            stored = stored[stored.index.isin(unique_ids)]
+
+        missing = ~unique_ids.isin(stored.index)
+        computed = pd.DataFrame(index=unique_ids[missing], columns=list(computes))
+        if missing.any():
+            rows = df.iloc[np.flatnonzero(first)[missing]]
+            for name, (source, compute) in computes.items():
+                computed[name] = compute(rows[source]).to_numpy()
+            computed.index.names = [key, HASH_COLUMN]
+            if store is not None:
+                store.add(entity, computed.reset_index(), schema)
+            else:
+                _write_segment(
+                    entity_dir,
+                    pa.Table.from_pandas(computed.reset_index(), schema=schema, preserve_index=False),
+                )
+
+        table = pd.concat([stored[list(computes)], computed[list(computes)]])
+        positions = table.index.get_indexer(ids)
+        for name in computes:
+            values = table[name].to_numpy()[positions]
+            if pa.types.is_floating(features[name][1]):
+                df[name] = pd.Series(values, index=df.index, dtype=float)
+            else:
+                df[name] = pd.Series(values, index=df.index, dtype=object).infer_objects()
+        df.attrs["entity_features"] = sorted({*df.attrs.get("entity_features", ()), *computes})
+
+        print(
+            f"entity_store: {entity} entities={len(unique_ids)} "
+            f"reused={int((~missing).sum())} computed={int(missing.sum())}"
+        )
+    return df
@@ -0,0 +1,143 @@
+"""Intern identifier list columns as int32 codes of one shared dictionary.
+
+Author, inventor and reference id lists hold millions of long OpenAlex URL and DOI
+strings. `prepare_inputs` replaces each of them with an Arrow `list<int32>` column of
+codes into an `IdDictionary`: ids are normalized (lowercased, as the citation overlap
+compares them) and each distinct id is stored once. Set and overlap logic then works on
+integer arrays. The dictionary is written next to the outputs so codes can be decoded.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from publish.utils import arrow_list_array, decode_list, is_arrow_list, to_python_objects
+
+ID_LIST_COLUMNS = (
+    "work_author_ids",
+    "patent_inventor_ids",
+    "work_referenced_works",
+    "patent_cited_works",
+    "patent_doi_references",
+)
+
+CODE_TYPE = pa.int32()
+
+
+def normalize_ids(values: pa.Array) -> pa.Array:
+    """Lowercased string ids; empty ids become null, as `citation_overlap_score` skips them."""
+    values = pc.utf8_lower(pc.cast(values, pa.string()))
+    return pc.if_else(pc.equal(values, ""), pa.scalar(None, pa.string()), values)
+
+
+def is_interned(series: pd.Series) -> bool:
+    """True for a column already converted to codes (`pd.ArrowDtype(list<int32>)`)."""
+    if not isinstance(series.dtype, pd.ArrowDtype):
+        return False
+    arrow_type = series.dtype.pyarrow_dtype
+    return pa.types.is_list(arrow_type) and arrow_type.value_type == CODE_TYPE
+
+
+def _rebuild_list(lists: pa.Array, values: pa.Array) -> pa.Array:
+    array_type = pa.LargeListArray if pa.types.is_large_list(lists.type) else pa.ListArray
+    return array_type.from_arrays(lists.offsets, values, mask=lists.is_null())
+
+
+class IdDictionary:
+    """Append-only mapping from normalized id strings to int32 codes.
+
+    Codes are assigned in order of first appearance. A `frozen` dictionary (as loaded
+    by worker processes) never grows, so every process agrees on the codes.
+    """
+
+    def __init__(self, ids: Optional[pa.Array] = None, *, frozen: bool = False):
+        self._ids = ids if ids is not None else pa.array([], type=pa.string())
+        self.frozen = frozen
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def ids(self) -> pa.Array:
+        return self._ids
+
+    def codes(self, values: pa.Array) -> pa.Array:
+        """Codes of `values` (normalized first); null values stay null."""
+        values = normalize_ids(values)
+        codes = pc.index_in(values, value_set=self._ids)
+        unseen = pc.and_(values.is_valid(), codes.is_null())
+        if pc.any(unseen).as_py():
+            if self.frozen:
+                raise ValueError(
+                    f"id_dictionary: {pc.sum(unseen).as_py()} ids are not in the shared dictionary"
+                )
+            new_ids = pc.unique(pc.filter(values, unseen))
+            self._ids = pa.concat_arrays([self._ids, new_ids])
+            codes = pc.index_in(values, value_set=self._ids)
+        return codes.cast(CODE_TYPE)
+
+    def intern(self, series: pd.Series) -> pd.Series:
+        """`series` of id lists as `list<int32>` codes; unchanged if it cannot be read as lists."""
+        if is_interned(series):
+            return series
+        lists = arrow_list_array(series)
+        if lists is None:
+            return series
+        if pa.types.is_null(lists.type):
+            codes = pa.nulls(len(lists), pa.list_(CODE_TYPE))
+        else:
+            codes = _rebuild_list(lists, self.codes(lists.values))
+        return pd.Series(
+            pd.arrays.ArrowExtensionArray(codes), index=series.index, name=series.name
+        )
+
+    def decode(self, series: pd.Series) -> pd.Series:
+        """Interned `series` back as Arrow-backed lists of (normalized) id strings."""
+        if not is_interned(series):
+            return series
+        lists = pa.chunked_array(pa.array(series.array)).combine_chunks()
+        ids = _rebuild_list(lists, self._ids.take(lists.values))
+        return pd.Series(pd.arrays.ArrowExtensionArray(ids), index=series.index, name=series.name)
+
+    def write(self, path: str | Path) -> Path:
+        path = Path(path)
+        table = pa.table(
+            {"id_code": pa.array(range(len(self._ids)), type=CODE_TYPE), "id": self._ids}
+        )
+        pq.write_table(table, path)
+        return path
+
+    @classmethod
+    def read(cls, path: str | Path, *, frozen: bool = True) -> "IdDictionary":
+        table = pq.read_table(path).sort_by("id_code")
+        return cls(table["id"].combine_chunks(), frozen=frozen)
+
+
+def intern_id_columns(
+    df: pd.DataFrame,
+    id_dictionary: IdDictionary,
+    columns: Sequence[str] = ID_LIST_COLUMNS,
+) -> pd.DataFrame:
+    """Replace the identifier list `columns` of `df` (decoded lists) with their codes."""
+    for column in columns:
+        if column in df.columns:
+            df[column] = id_dictionary.intern(df[column])
+    return df
+
+
+def intern_id_table(table: pa.Table, id_dictionary: IdDictionary) -> pa.Table:
+    """`intern_id_columns` for an Arrow table (native or stringified list columns)."""
+    for column in ID_LIST_COLUMNS:
+        if column not in table.column_names:
+            continue
+        series = pd.Series(pd.arrays.ArrowExtensionArray(table[column]))
+        if not is_arrow_list(series):
+            series = to_python_objects(series).map(decode_list)
+        codes = pa.chunked_array(pa.array(id_dictionary.intern(series).array))
+        table = table.set_column(table.schema.get_field_index(column), column, codes)
+    return table
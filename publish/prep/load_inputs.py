@@ -1,11 +1,19 @@
 """Load and normalize inputs for the publish pipeline."""
 from __future__ import annotations
 
+import glob
+import re
 from pathlib import Path
 from typing import Optional, Sequence
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
 
+from publish.prep.id_dictionary import IdDictionary, intern_id_columns
+from publish.prep.sampling import Sample, load_sample
 from publish.utils import ensure_datetime, normalize_list_columns
 
 DEFAULT_LIST_COLUMNS = [
@@ -46,20 +54,157 @@ REQUIRED_COLUMNS = [
 ]
 
 
-def load_parquet(path: str | Path) -> pd.DataFrame:
-    return pd.read_parquet(path)
+# (column, op, value) predicates, as accepted by pyarrow.parquet.filters_to_expression.
+Filters = Sequence[tuple[str, str, object]]
+
+_FILTER_RE = re.compile(r"^\s*([A-Za-z_][\w]*)\s*(==|!=|>=|<=|=|>|<)\s*(.*?)\s*$")
+
+
+def parse_filter(text: str) -> tuple[str, str, str]:
+    """Parse `column<op>value` (ops: = == != < <= > >=) into a filter tuple."""
+    match = _FILTER_RE.match(text)
+    if not match:
+        raise ValueError(f"Invalid input filter {text!r}; expected e.g. pair_source=our_data")
+    column, op, value = match.groups()
+    return column, "==" if op == "=" else op, value
+
+
+def _input_source(path: str | Path | Sequence[str]) -> str | list[str]:
+    """A file, a directory (optionally hive-partitioned) or a glob of parquet files."""
+    if isinstance(path, (list, tuple)):
+        return [str(p) for p in path]
+    path = str(path)
+    if glob.has_magic(path):
+        files = sorted(glob.glob(path, recursive=True))
+        if not files:
+            raise FileNotFoundError(f"load_parquet: no files match {path}")
+        return files
+    return path
+
+
+def open_input_dataset(path: str | Path | Sequence[str]) -> ds.Dataset:
+    return ds.dataset(_input_source(path), format="parquet", partitioning="hive")
+
+
+def filter_expression(dataset: ds.Dataset, filters: Optional[Filters]) -> Optional[ds.Expression]:
+    """Build a scan filter, casting string values to the dataset's column types."""
+    if not filters:
+        return None
+    typed = []
+    for column, op, value in filters:
+        if column not in dataset.schema.names:
+            raise ValueError(f"load_parquet: filter column not in input: {column}")
+        if isinstance(value, str):
+            field_type = dataset.schema.field(column).type
+            value = pa.scalar(value).cast(field_type).as_py()
+        typed.append((column, op, value))
+    return pq.filters_to_expression(typed)
+
+
+def input_partitions(
+    path: str | Path, filters: Optional[Filters] = None
+) -> list[tuple[str | list[str], Optional[ds.Expression]]]:
+    """Split an input into independent `(source, partition_filter)` units of work.
+
+    Hive partitions (e.g. `pair_source=our_data/`) become one unit each; the files of
+    an unpartitioned multi-file input become one unit per file. Units whose partition
+    values are excluded by `filters` are skipped without reading them.
+    """
+    dataset = open_input_dataset(path)
+    units: dict[str, tuple[str | list[str], Optional[ds.Expression]]] = {}
+    for fragment in dataset.get_fragments(filter=filter_expression(dataset, filters)):
+        partition = fragment.partition_expression
+        if partition.equals(ds.scalar(True)):
+            units[fragment.path] = (fragment.path, None)
+        else:
+            units.setdefault(str(partition), (_input_source(path), partition))
+    return list(units.values())
+
+
+def load_table(
+    path: str | Path | Sequence[str],
+    *,
+    filters: Optional[Filters] = None,
+    partition: Optional[ds.Expression] = None,
+    memory_map: bool = False,
+    columns: Optional[Sequence[str]] = None,
+    sample: Optional[Sample] = None,
+) -> pa.Table:
+    """Scan a parquet file, directory or glob into an Arrow table, pushing `filters` down.
+
+    With `memory_map`, a single file is memory-mapped instead of read into memory.
+    `columns` restricts the scan to the columns that are present. With `sample`, only
+    the sampled pairs of the filtered input are returned (see `publish.prep.sampling`).
+    """
+    if memory_map and partition is None and Path(str(path)).is_file():
+        dataset = ds.dataset(
+            str(path),
+            format=ds.ParquetFileFormat(),
+            filesystem=pafs.LocalFileSystem(use_mmap=True),
+        )
+    else:
+        dataset = open_input_dataset(path)
+    expression = filter_expression(dataset, filters)
+    if partition is not None:
+        expression = partition if expression is None else expression & partition
+    if columns is not None:
+        columns = [c for c in columns if c in dataset.schema.names]
+    if sample is not None:
+        return load_sample(dataset, sample, expression=expression, columns=columns)
+    return dataset.to_table(columns=columns, filter=expression)
+
+
+def load_parquet(
+    path: str | Path | Sequence[str],
+    *,
+    filters: Optional[Filters] = None,
+    partition: Optional[ds.Expression] = None,
+    arrow_backed: bool = False,
+    sample: Optional[Sample] = None,
+) -> pd.DataFrame:
+    """Load a parquet file, directory or glob, pushing `filters` into the scan.
+
+    With `arrow_backed`, a single file is memory-mapped and every column is wrapped as
+    `pd.ArrowDtype` without converting it, so list columns stay in Arrow buffers
+    instead of becoming one Python list per row. `sample` selects a deterministic
+    subset of the pairs, as in `load_table`.
+    """
+    if (
+        not arrow_backed
+        and filters is None
+        and partition is None
+        and sample is None
+        and Path(str(path)).is_file()
+    ):
+        return pd.read_parquet(path)
+
+    table = load_table(
+        path, filters=filters, partition=partition, memory_map=arrow_backed, sample=sample
+    )
+    if arrow_backed:
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return table.to_pandas()
 
 
 def prepare_inputs(
     df: pd.DataFrame,
     list_columns: Optional[Sequence[str]] = None,
     date_columns: Optional[Sequence[str]] = None,
+    *,
+    id_dictionary: Optional[IdDictionary] = None,
 ) -> pd.DataFrame:
+    """Decode list columns and parse dates; validate the identifier columns.
+
+    With `id_dictionary`, identifier list columns are interned as int32 codes of that
+    dictionary (see `publish.prep.id_dictionary`).
+    """
     list_columns = list_columns or DEFAULT_LIST_COLUMNS
     date_columns = date_columns or DEFAULT_DATE_COLUMNS
 
     df = normalize_list_columns(df, list_columns)
     df = ensure_datetime(df, date_columns)
+    if id_dictionary is not None:
+        df = intern_id_columns(df, id_dictionary)
 
     missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
     if missing:
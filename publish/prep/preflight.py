@@ -0,0 +1,310 @@
+"""Check inputs, external files and dependencies before any row is processed.
+
+Only the parquet schema and the first block of each control CSV are read, so a run
+with a missing column, mapping file or dependency fails in seconds instead of after
+the expensive stages (lemmatization, embeddings) have run.
+"""
+from __future__ import annotations
+
+import importlib.util
+from pathlib import Path
+from typing import Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from publish.features.author_experience import FIRST_LAST_AUTHORS_COLUMN
+from publish.features.patent_classification import ipc_code_to_sector_map
+from publish.features.topics import TOPIC_COLUMNS
+from publish.prep.control_merge import OPTIONAL_CONTROL_PAIRS, REQUIRED_CONTROL_PAIRS
+from publish.prep.load_inputs import (
+    DEFAULT_DATE_COLUMNS,
+    DEFAULT_LIST_COLUMNS,
+    Filters,
+    open_input_dataset,
+)
+
+# A requirement is met when all columns of at least one of its alternatives are present.
+Requirement = tuple[tuple[str, ...], ...]
+
+
+def _each(*columns: str) -> list[Requirement]:
+    return [((column,),) for column in columns]
+
+
+_PATENT_ID: Requirement = (("patent_id_us",), ("patent_id",))
+
+# Columns each feature stage requires, mirroring the checks at the top of each stage.
+# Together they cover `FINAL_COLUMNS`: every export column is either one of these
+# inputs or produced by the stage that requires them. With `STAGE_OPTIONAL_INPUTS`,
+# this is also the table `column_lifecycle.STAGE_INPUTS` is derived from.
+STAGE_REQUIREMENTS: dict[str, list[Requirement]] = {
+    "identifiers": [*_each("paper_id", "work_doi", "pair_source"), _PATENT_ID],
+    "team_size": _each("work_author_ids", "patent_inventor_ids"),
+    "org_collab": _each(
+        "patent_assignee_names",
+        "work_institution_names",
+        "patent_assignee_types",
+        "work_institution_types",
+    ),
+    "journal_metric": _each("journal_impact"),
+    "text_similarity": [(("work_title", "patent_title"), ("work_abstract", "patent_abstract"))],
+    "citation_overlap": _each("patent_cited_works", "work_referenced_works"),
+    "citation_linkage": [*_each("patent_cited_works", "work_referenced_works"), _PATENT_ID],
+    "author_experience": [
+        *_each("work_author_ids"),
+        (("work_publication_date",), ("patent_date",), ("patent_filing_date",)),
+    ],
+    "topics": _each(*TOPIC_COLUMNS),
+    "patent_classification": _each("wipo_fields", "ipc_codes"),
+    "international_collab": [
+        (
+            ("collab_countries",),
+            ("work_institution_country_codes", "patent_assignee_country"),
+            ("institution_country_codes", "patent_assignee_country"),
+        )
+    ],
+    "geo_distance": _each("patent_assignee_latlon_list", "work_latlon_list"),
+    "dates": _each("work_publication_date", "patent_filing_date"),
+    "references": _each(
+        "work_referenced_works",
+        "patent_doi_references",
+        "work_reference_age_days",
+        "patent_reference_age_days",
+        "work_reference_cited_by_counts",
+        "patent_reference_cited_by_counts",
+    ),
+    "patent_claims": _each("patent_num_claims", "patent_first_claim_length"),
+}
+
+# Columns a stage also reads when present: optional inputs, and intermediates it
+# creates and then combines.
+STAGE_OPTIONAL_INPUTS: dict[str, tuple[str, ...]] = {
+    "text_similarity": (
+        "work_title_lemmas",
+        "patent_title_lemmas",
+        "work_abstract_lemmas",
+        "patent_abstract_lemmas",
+        "title_word_overlap_score",
+        "abstract_word_overlap_score",
+        "title_semantic_similarity",
+        "abstract_semantic_similarity",
+    ),
+    "author_experience": (
+        "work_author_positions",
+        "work_author_positions_list",
+        FIRST_LAST_AUTHORS_COLUMN,
+        "patent_inventor_ids",
+    ),
+}
+
+EMBEDDING_CONTROL_REQUIREMENTS: list[Requirement] = [
+    *_each("paper_id"),
+    _PATENT_ID,
+    (("ipc_sectors",), ("ipc_codes",)),
+    (("patent_priority_year",), ("patent_filing_date",)),
+]
+
+# Key columns of each control CSV, by file name prefix.
+CONTROL_KEY_COLUMNS = {
+    "merged_": ("paperid", "patent"),
+    "true_merged_": ("work_id", "patent_id_us"),
+}
+
+# Modules each embedding backend imports when it is first used.
+EMBEDDING_BACKEND_MODULES = {
+    "sbert": ("torch", "sentence_transformers"),
+    "onnx": ("onnxruntime", "tokenizers"),
+    "hashing": (),
+}
+
+
+def _describe(requirement: Requirement) -> str:
+    return " or ".join("+".join(alternative) for alternative in requirement)
+
+
+def _check_requirements(
+    columns: set[str], requirements: Sequence[Requirement], context: str, problems: list[str]
+) -> None:
+    missing = [
+        _describe(requirement)
+        for requirement in requirements
+        if not any(set(alternative) <= columns for alternative in requirement)
+    ]
+    if missing:
+        problems.append(f"{context}: missing required columns: {', '.join(missing)}")
+
+
+def _check_column_types(schema: pa.Schema, problems: list[str]) -> None:
+    for name in DEFAULT_LIST_COLUMNS:
+        if name not in schema.names:
+            continue
+        t = schema.field(name).type
+        if not (
+            pa.types.is_list(t)
+            or pa.types.is_large_list(t)
+            or pa.types.is_string(t)
+            or pa.types.is_large_string(t)
+            or pa.types.is_null(t)
+        ):
+            problems.append(f"input: column {name} must be a list or a stringified list, got {t}")
+    for name in DEFAULT_DATE_COLUMNS:
+        if name not in schema.names:
+            continue
+        t = schema.field(name).type
+        if not (
+            pa.types.is_temporal(t)
+            or pa.types.is_string(t)
+            or pa.types.is_large_string(t)
+            or pa.types.is_null(t)
+        ):
+            problems.append(f"input: column {name} must be datetime-like, got {t}")
+
+
+def _check_control_files(control_root: Path, problems: list[str], warnings: list[str]) -> None:
+    pairs = [
+        (control_root / "pierre_data", names, True) for names in REQUIRED_CONTROL_PAIRS.values()
+    ]
+    pairs += [
+        (control_root / "pierre_data_noselfcite", names, False)
+        for names in OPTIONAL_CONTROL_PAIRS.values()
+    ]
+    for directory, names, required in pairs:
+        paths = [directory / name for name in names]
+        absent = [p for p in paths if not p.exists()]
+        if absent:
+            if required:
+                problems.extend(f"control files: missing control file: {p}" for p in absent)
+            else:
+                listed = ", ".join(p.name for p in absent)
+                warnings.append(f"optional control files missing in {directory}: {listed}")
+            continue
+        for path in paths:
+            prefix = "true_merged_" if path.name.startswith("true_merged_") else "merged_"
+            try:
+                with pacsv.open_csv(path) as reader:
+                    header = set(reader.schema.names)
+            except (OSError, pa.ArrowInvalid) as exc:
+                problems.append(f"control files: cannot read {path}: {exc}")
+                continue
+            _check_requirements(
+                header, _each(*CONTROL_KEY_COLUMNS[prefix]), f"control files: {path.name}", problems
+            )
+
+
+def _module_available(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+def _check_embedding_backend(
+    backend: str,
+    options: dict,
+    *,
+    required: bool,
+    problems: list[str],
+    warnings: list[str],
+) -> None:
+    missing = [m for m in EMBEDDING_BACKEND_MODULES.get(backend, ()) if not _module_available(m)]
+    if missing:
+        message = f"embedding backend {backend}: missing dependencies: {', '.join(missing)}"
+        if required:
+            problems.append(message + " (needed for embedding controls)")
+        else:
+            warnings.append(message + "; semantic similarity columns will be NaN")
+
+    if backend == "onnx":
+        from publish.scores import OnnxEmbeddingBackend
+
+        model_dir = Path(options.get("model_dir") or "")
+        tokenizer_path = model_dir / "tokenizer.json"
+        if not tokenizer_path.exists():
+            problems.append(f"onnx embedding backend: tokenizer not found: {tokenizer_path}")
+        try:
+            OnnxEmbeddingBackend.find_model(model_dir)
+        except FileNotFoundError as exc:
+            problems.append(str(exc))
+
+
+def _check_lemmatizer(lemmatizer: str, problems: list[str]) -> None:
+    if lemmatizer == "fast":
+        from publish.lemmatizer import tables_cache_path
+
+        if _module_available("spacy") and tables_cache_path().exists():
+            return
+    missing = [m for m in ("spacy", "spacy_lookups_data") if not _module_available(m)]
+    if lemmatizer == "fast":
+        # The tables are extracted from spaCy once; the lookups data is not needed.
+        missing = [m for m in missing if m != "spacy_lookups_data"]
+    if missing:
+        problems.append(f"lemmatizer {lemmatizer}: missing dependencies: {', '.join(missing)}")
+
+
+def preflight_check(
+    input_path: str | Path,
+    *,
+    ipc_technology_xlsx: str | Path,
+    stages: Optional[Sequence[str]] = None,
+    input_filters: Optional[Filters] = None,
+    control_root: Optional[str | Path] = None,
+    embedding_controls_k: Optional[int] = None,
+    embedding_backend: str = "sbert",
+    embedding_options: Optional[dict] = None,
+    lemmatizer: str = "spacy",
+    entity_store: Optional[str | Path] = None,
+) -> None:
+    """Validate a run's configuration up front; raise ValueError listing every problem.
+
+    Checks the input schema against each stage's required columns (including their
+    alternatives), the column types of list and date inputs, the IPC mapping file, the
+    control files, and the lemmatizer and embedding backend dependencies. Problems the
+    pipeline tolerates (missing optional control files or semantic-similarity
+    dependencies) are printed as warnings.
+    """
+    stages = list(STAGE_REQUIREMENTS) if stages is None else list(stages)
+    problems: list[str] = []
+    warnings: list[str] = []
+
+    try:
+        schema = open_input_dataset(input_path).schema
+    except (OSError, pa.ArrowInvalid) as exc:
+        raise ValueError(f"preflight: cannot read input schema from {input_path}: {exc}") from exc
+    columns = set(schema.names)
+
+    for stage in stages:
+        _check_requirements(columns, STAGE_REQUIREMENTS.get(stage, ()), stage, problems)
+    if embedding_controls_k:
+        _check_requirements(columns, EMBEDDING_CONTROL_REQUIREMENTS, "embedding_controls", problems)
+    for column, _, _ in input_filters or ():
+        if column not in columns:
+            problems.append(f"load_parquet: filter column not in input: {column}")
+    _check_column_types(schema, problems)
+
+    try:
+        ipc_code_to_sector_map(str(ipc_technology_xlsx))
+    except (OSError, ValueError, ImportError) as exc:
+        problems.append(f"ipc mapping file: {exc}")
+
+    if control_root is not None:
+        _check_control_files(Path(control_root), problems, warnings)
+
+    if "text_similarity" in stages or entity_store is not None:
+        _check_lemmatizer(lemmatizer, problems)
+    if "text_similarity" in stages or embedding_controls_k:
+        _check_embedding_backend(
+            embedding_backend,
+            dict(embedding_options or {}),
+            required=bool(embedding_controls_k),
+            problems=problems,
+            warnings=warnings,
+        )
+    if entity_store is not None and Path(entity_store).exists() and not Path(entity_store).is_dir():
+        problems.append(f"entity store: not a directory: {entity_store}")
+
+    for warning in warnings:
+        print(f"preflight: warning: {warning}")
+    if problems:
+        raise ValueError(
+            f"preflight: {len(problems)} problem(s) found before processing any rows:\n"
+            + "\n".join(f"  - {problem}" for problem in problems)
+        )
+    print(f"preflight: ok columns={len(columns)} stages={len(stages)}")
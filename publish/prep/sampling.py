@@ -0,0 +1,132 @@
+"""Deterministic pair samples selected by a hash of the pair key.
+
+A row is in the sample when the hash of its `pair_id` (see `publish.prep.shards`)
+falls below a threshold, so the same input gives the same sample on every run and a
+larger sample contains every smaller one. The scan first reads only the key columns
+of each row group; row groups without a sampled row are never read in full.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from publish.prep.shards import pair_hashes
+
+KEY_COLUMNS = ("paper_id", "patent_id_us", "patent_id")
+
+
+@dataclass(frozen=True)
+class Sample:
+    """A `fraction` of the pairs, or the `rows` pairs with the smallest hashes."""
+
+    fraction: Optional[float] = None
+    rows: Optional[int] = None
+
+    def __post_init__(self):
+        if (self.fraction is None) == (self.rows is None):
+            raise ValueError("Sample: give exactly one of fraction or rows")
+        if self.fraction is not None and not 0 < self.fraction <= 1:
+            raise ValueError(f"Sample: fraction must be in (0, 1], got {self.fraction}")
+        if self.rows is not None and self.rows < 1:
+            raise ValueError(f"Sample: rows must be positive, got {self.rows}")
+
+
+def sample_mask(hashes: np.ndarray, sample: Sample) -> np.ndarray:
+    """Rows whose pair hash is in the sample.
+
+    With `rows`, every row sharing a selected hash (a duplicated pair) is selected too.
+    """
+    if sample.fraction is not None:
+        limit = int(sample.fraction * 2**64)
+        if limit >= 2**64:
+            return np.ones(len(hashes), dtype=bool)
+        return hashes < np.uint64(limit)
+    if sample.rows >= len(hashes):
+        return np.ones(len(hashes), dtype=bool)
+    threshold = np.partition(hashes, sample.rows - 1)[sample.rows - 1]
+    return hashes <= threshold
+
+
+def _key_columns(schema: pa.Schema) -> list[str]:
+    return [c for c in KEY_COLUMNS if c in schema.names]
+
+
+def sample_table_mask(table: pa.Table, sample: Sample) -> np.ndarray:
+    """`sample_mask` of a table that has the pair key columns."""
+    return sample_mask(pair_hashes(table), sample)
+
+
+def _row_group_hashes(
+    fragment: ds.ParquetFileFragment,
+    schema: pa.Schema,
+    key_columns: list[str],
+    expression: Optional[ds.Expression],
+) -> list[tuple[int, np.ndarray]]:
+    """`(row group id, pair hashes of its rows passing `expression`)` for one file."""
+    if expression is None:
+        # One read of the key columns, split at the row-group boundaries.
+        fragment.ensure_complete_metadata()
+        ids = [row_group.id for row_group in fragment.row_groups]
+        sizes = [row_group.num_rows for row_group in fragment.row_groups]
+        hashes = pair_hashes(fragment.to_table(schema=schema, columns=key_columns))
+        return list(zip(ids, np.split(hashes, np.cumsum(sizes)[:-1])))
+    return [
+        (
+            row_group.row_groups[0].id,
+            pair_hashes(row_group.to_table(schema=schema, columns=key_columns, filter=expression)),
+        )
+        for row_group in fragment.split_by_row_group(expression, schema=schema)
+    ]
+
+
+def load_sample(
+    dataset: ds.Dataset,
+    sample: Sample,
+    *,
+    expression: Optional[ds.Expression] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> pa.Table:
+    """Scan the sampled rows of `dataset` (after filtering by `expression`), in input order.
+
+    The key columns are read first to find the sampled rows; then only the row groups
+    that contain one are read with all `columns`.
+    """
+    key_columns = _key_columns(dataset.schema)
+    fragments = list(dataset.get_fragments(filter=expression))
+    row_groups = [
+        _row_group_hashes(fragment, dataset.schema, key_columns, expression)
+        for fragment in fragments
+    ]
+    hashes = [h for groups in row_groups for _, h in groups]
+    mask = sample_mask(np.concatenate(hashes or [np.empty(0, dtype=np.uint64)]), sample)
+
+    parts = []
+    start = 0
+    read_groups = 0
+    for fragment, groups in zip(fragments, row_groups):
+        selected_ids, selected = [], []
+        for row_group_id, group_hashes in groups:
+            group_mask = mask[start : start + len(group_hashes)]
+            start += len(group_hashes)
+            if group_mask.any():
+                selected_ids.append(row_group_id)
+                selected.append(group_mask)
+        if not selected_ids:
+            continue
+        read_groups += len(selected_ids)
+        table = fragment.subset(row_group_ids=selected_ids).to_table(
+            schema=dataset.schema, columns=columns, filter=expression
+        )
+        parts.append(table.filter(pa.array(np.concatenate(selected))))
+    print(
+        f"load_sample: rows={int(mask.sum())}/{len(mask)} "
+        f"row_groups={read_groups}/{sum(map(len, row_groups))}"
+    )
+    if not parts:
+        empty = dataset.schema.empty_table()
+        return empty if columns is None else empty.select(list(columns))
+    return pa.concat_tables(parts)
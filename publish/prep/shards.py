@@ -0,0 +1,76 @@
+"""Hash-partition the input by pair into Arrow IPC shards for worker processes.
+
+Shards and worker results are written as uncompressed Arrow IPC files, in shared memory
+(`/dev/shm`) when it is available. Readers memory-map them, so loading a shard or
+gathering results does not copy the column buffers.
+"""
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Position of each row in the unsharded input, used to restore the input order.
+ROW_COLUMN = "_input_row"
+
+
+def shard_directory() -> tempfile.TemporaryDirectory:
+    """A temporary directory for shards, in shared memory when available."""
+    shm = Path("/dev/shm")
+    return tempfile.TemporaryDirectory(
+        prefix="publish-shards-", dir=str(shm) if shm.is_dir() else None
+    )
+
+
+def _as_key(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    return pc.fill_null(pc.cast(column, pa.string()), "")
+
+
+def pair_keys(table: pa.Table) -> pa.ChunkedArray:
+    """The `pair_id` each row will get (`paper_id|patent_id_us`), computed in Arrow."""
+    if "patent_id_us" in table.column_names:
+        patent = _as_key(table["patent_id_us"])
+    else:
+        patent = pc.binary_join_element_wise("US-", _as_key(table["patent_id"]), "")
+    return pc.binary_join_element_wise(_as_key(table["paper_id"]), patent, "|")
+
+
+def pair_hashes(table: pa.Table) -> np.ndarray:
+    """Stable 64-bit hash of each row's pair key; the same on every run and machine."""
+    keys = pair_keys(table).to_numpy(zero_copy_only=False)
+    return pd.util.hash_array(keys.astype(object))
+
+
+def shard_assignments(table: pa.Table, shards: int) -> np.ndarray:
+    """Shard number of each row: a stable hash of its pair key modulo `shards`."""
+    return (pair_hashes(table) % np.uint64(shards)).astype(np.int64)
+
+
+def write_ipc(table: pa.Table, path: str | Path) -> Path:
+    path = Path(path)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return path
+
+
+def read_ipc(path: str | Path) -> pa.Table:
+    """Memory-map an IPC file; the table's buffers point into the mapping."""
+    with pa.memory_map(str(path), "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def write_shards(table: pa.Table, shards: int, directory: str | Path) -> list[Path]:
+    """Split `table` into `shards` IPC files by pair key, tagging rows with `ROW_COLUMN`."""
+    assignments = shard_assignments(table, shards)
+    table = table.append_column(ROW_COLUMN, pa.array(np.arange(table.num_rows, dtype=np.int64)))
+    paths = []
+    for shard in range(shards):
+        rows = np.flatnonzero(assignments == shard)
+        if len(rows):
+            path = Path(directory) / f"shard-{shard:04d}.arrow"
+            paths.append(write_ipc(table.take(pa.array(rows)), path))
+    return paths
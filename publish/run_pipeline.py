@@ -2,12 +2,34 @@
 from __future__ import annotations
 
 import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Callable, Sequence
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
-from publish.export.export import export_to_csv, export_to_excel, prepare_export
-from publish.features.author_experience import add_author_experience
+from publish.export.export import (
+    LIST_FORMATS,
+    export_to_csv,
+    export_to_excel,
+    export_to_parquet,
+    prepare_export,
+)
+from publish.export.control_sidecar import sidecar_order, sidecar_path, write_control_sidecar
+from publish.export.pair_index import write_pair_index
+from publish.export.summary import summarize_table, write_summary
+from publish.features.author_experience import (
+    FIRST_LAST_AUTHORS_COLUMN,
+    HISTORY_COLUMNS,
+    add_author_experience,
+    first_last_author_ids,
+)
+from publish.features.citation_linkage import add_citation_linkage
 from publish.features.citation_overlap import add_citation_overlap
 from publish.features.dates import add_date_features
 from publish.features.geo_distance import add_geo_distance
@@ -22,38 +44,454 @@ from publish.features.team_size import add_team_size_features
 from publish.features.text_similarity import add_text_similarity_features
 from publish.features.topics import add_topics
 from publish.prep.cleanup import cleanup_reference_ages
+from publish.prep.column_lifecycle import (
+    STAGE_INPUTS,
+    release_columns,
+    release_plan,
+    unconsumed_columns,
+)
 from publish.prep.control_merge import (
-    load_and_prepare_control_frames,
+    align_controls,
+    load_control_frames_in_background,
     merge_compact_with_controls,
+    raise_if_failed,
+)
+from publish.prep.embedding_controls import generate_embedding_controls
+from publish.prep.entity_store import EntityStore, attach_entity_features
+from publish.prep.id_dictionary import (
+    CODE_TYPE,
+    ID_LIST_COLUMNS,
+    IdDictionary,
+    intern_id_columns,
+    intern_id_table,
+)
+from publish.prep.load_inputs import (
+    DEFAULT_DATE_COLUMNS,
+    DEFAULT_LIST_COLUMNS,
+    Filters,
+    input_partitions,
+    load_parquet,
+    load_table,
+    parse_filter,
+    prepare_inputs,
+)
+from publish.prep.preflight import preflight_check
+from publish.prep.sampling import KEY_COLUMNS, Sample, sample_table_mask
+from publish.prep.shards import ROW_COLUMN, read_ipc, shard_directory, write_ipc, write_shards
+from publish.scores import (
+    DEFAULT_EMBEDDING_BACKEND,
+    EMBEDDING_BACKENDS,
+    LEMMATIZERS,
+    configure_embedding_backend,
+    configure_embedding_workers,
+    configure_lemmatizer,
+    configure_scoring_threads,
+)
+from publish.utils import ensure_datetime, normalize_list_columns, python_object_columns
+from publish.warm_up import start_warm_up
+
+
+def feature_stages(ipc_technology_xlsx: str | Path) -> list[tuple[str, Callable]]:
+    """`(name, stage function)` of every feature stage, in the order they run."""
+    return [
+        ("identifiers", add_identifiers),
+        ("team_size", add_team_size_features),
+        ("org_collab", add_org_collab_features),
+        ("journal_metric", add_journal_metric),
+        ("text_similarity", add_text_similarity_features),
+        ("citation_overlap", add_citation_overlap),
+        ("citation_linkage", add_citation_linkage),
+        ("author_experience", add_author_experience),
+        ("topics", add_topics),
+        (
+            "patent_classification",
+            partial(add_patent_classification, ipc_technology_xlsx_path=ipc_technology_xlsx),
+        ),
+        ("international_collab", add_international_collab),
+        ("geo_distance", add_geo_distance),
+        ("dates", add_date_features),
+        ("references", add_reference_features),
+        ("patent_claims", add_patent_claims),
+    ]
+
+
+# Stages that need every pair at once (corpus-wide citation linkage, chronological
+# author history). When the input is processed partition by partition, they run once
+# on the combined pair-local output.
+GLOBAL_STAGES = ("citation_linkage", "author_experience")
+
+# How control merges are written: full merged bundles, control-column sidecars of
+# `final_features.parquet` (see `publish.export.control_sidecar`), or both.
+CONTROL_OUTPUTS = ("merged", "sidecar", "both")
+
+# Stages that read Arrow-backed (`pd.ArrowDtype`) columns directly. Before any other
+# stage runs, its Arrow-backed inputs are converted to Python objects.
+ARROW_STAGES = (
+    "team_size",
+    "org_collab",
+    "journal_metric",
+    "citation_overlap",
+    "citation_linkage",
+    "topics",
+    "international_collab",
+    "dates",
+    "references",
+    "patent_claims",
 )
-from publish.prep.load_inputs import load_parquet, prepare_inputs
-
-
-def build_features(df: pd.DataFrame, *, ipc_technology_xlsx: str | Path) -> pd.DataFrame:
-    df = add_identifiers(df)
-    df = add_team_size_features(df)
-    df = add_org_collab_features(df)
-    df = add_journal_metric(df)
-    df = add_text_similarity_features(df)
-    df = add_citation_overlap(df)
-    df = add_author_experience(df)
-    df = add_topics(df)
-    df = add_patent_classification(df, ipc_technology_xlsx_path=ipc_technology_xlsx)
-    df = add_international_collab(df)
-    df = add_geo_distance(df)
-    df = add_date_features(df)
-    df = add_reference_features(df)
-    df = add_patent_claims(df)
+
+
+def build_features(
+    df: pd.DataFrame,
+    *,
+    ipc_technology_xlsx: str | Path,
+    keep_intermediate_columns: bool = False,
+    stages: Sequence[str] | None = None,
+    later_stages: Sequence[str] = (),
+    entity_store: str | Path | EntityStore | None = None,
+    id_dictionary: IdDictionary | None = None,
+    author_history: tuple[pd.DataFrame, np.ndarray] | None = None,
+) -> pd.DataFrame:
+    """Run the feature stages in order (all of them unless `stages` selects a subset).
+
+    Unless `keep_intermediate_columns` is set, each input or intermediate column is
+    dropped as soon as its last consuming stage has run (export columns are kept).
+    Inputs of `later_stages`, which the caller runs afterwards, are kept.
+
+    Arrow-backed input columns stay in Arrow until a stage outside `ARROW_STAGES`
+    reads them; whatever is still Arrow-backed at the end is converted for export.
+
+    With `entity_store`, paper- and patent-level features are looked up in (and new
+    entities added to) that directory or open `EntityStore` first; see
+    `publish.prep.entity_store`. Pass the `id_dictionary` the identifier columns were
+    interned with, so entities are keyed by their ids rather than by run-specific codes.
+
+    `author_history` is the `(history, rows)` ordering index of the full input `df`
+    was sampled from (see `load_author_history`); `author_experience` then orders
+    the sampled pairs among all of the input's pairs.
+    """
+    all_stages = dict(feature_stages(ipc_technology_xlsx))
+    if author_history is not None:
+        history, rows = author_history
+        all_stages["author_experience"] = partial(
+            add_author_experience, history=history, history_rows=rows
+        )
+    stage_names = list(all_stages) if stages is None else list(stages)
+    if entity_store is not None:
+        df = attach_entity_features(
+            df,
+            entity_store,
+            ipc_technology_xlsx=ipc_technology_xlsx,
+            id_dictionary=id_dictionary,
+        )
+    plan = release_plan(stage_names + list(later_stages))
+    if not keep_intermediate_columns:
+        release_columns(df, unconsumed_columns(df, stage_names + list(later_stages)))
+
+    for name in stage_names:
+        if name not in ARROW_STAGES:
+            python_object_columns(df, STAGE_INPUTS.get(name, ()))
+        df = all_stages[name](df)
+        if not keep_intermediate_columns:
+            release_columns(df, plan[name])
+    if not later_stages:
+        python_object_columns(df, df.columns)
     return df
 
 
-def _write_export_bundle(df: pd.DataFrame, output_dir: Path, basename: str) -> dict:
+def load_author_history(
+    input_path: str | Path, filters: Filters | None, sample: Sample
+) -> tuple[pd.DataFrame, np.ndarray]:
+    """The author-experience ordering index of the whole (filtered) input, and the
+    positions of `sample`'s pairs in it.
+
+    Only the pair key and `HISTORY_COLUMNS` are read.
+    """
+    table = load_table(input_path, filters=filters, columns=[*KEY_COLUMNS, *HISTORY_COLUMNS])
+    rows = np.flatnonzero(sample_table_mask(table, sample))
+    history = table.select([c for c in HISTORY_COLUMNS if c in table.column_names]).to_pandas()
+    history = normalize_list_columns(history, DEFAULT_LIST_COLUMNS)
+    history = ensure_datetime(history, DEFAULT_DATE_COLUMNS)
+    # Interned like the sampled pairs' ids, so both compare ids the same way.
+    history = intern_id_columns(history, IdDictionary(), ["work_author_ids", "patent_inventor_ids"])
+    python_object_columns(history, history.columns)
+    return history, rows
+
+
+def _build_partition_features(
+    source: str | list[str],
+    partition,
+    *,
+    filters: Filters | None,
+    ipc_technology_xlsx: str | Path,
+    keep_intermediate_columns: bool,
+    embedding_backend: str,
+    embedding_options: dict,
+    arrow_inputs: bool,
+    entity_store: str | Path | None,
+    lemmatizer: str,
+    scoring_threads: int,
+    id_dictionary_path: str | Path,
+) -> pd.DataFrame:
+    """Worker: load one input partition and run the pair-local stages on it."""
+    configure_embedding_backend(embedding_backend, **embedding_options)
+    configure_lemmatizer(lemmatizer)
+    configure_scoring_threads(scoring_threads)
+    warm_up = start_warm_up(ipc_technology_xlsx)
+    id_dictionary = IdDictionary.read(id_dictionary_path)
+    df = load_parquet(source, filters=filters, partition=partition, arrow_backed=arrow_inputs)
+    df = prepare_inputs(df, id_dictionary=id_dictionary)
+    df = cleanup_reference_ages(df)
+    warm_up.wait()
+    local_stages = [n for n, _ in feature_stages(ipc_technology_xlsx) if n not in GLOBAL_STAGES]
+    return build_features(
+        df,
+        ipc_technology_xlsx=ipc_technology_xlsx,
+        keep_intermediate_columns=keep_intermediate_columns,
+        stages=local_stages,
+        later_stages=GLOBAL_STAGES,
+        entity_store=entity_store,
+        id_dictionary=id_dictionary,
+    )
+
+
+def _scan_id_dictionary(
+    input_path: str | Path, filters: Filters | None, id_dictionary: IdDictionary
+) -> None:
+    """Add every id of the (filtered) input to `id_dictionary`, reading only the id columns."""
+    table = load_table(input_path, filters=filters, columns=ID_LIST_COLUMNS)
+    intern_id_table(table, id_dictionary)
+
+
+def build_features_partitioned(
+    input_path: str | Path,
+    *,
+    ipc_technology_xlsx: str | Path,
+    workers: int,
+    filters: Filters | None = None,
+    keep_intermediate_columns: bool = False,
+    embedding_backend: str = DEFAULT_EMBEDDING_BACKEND,
+    embedding_options: dict | None = None,
+    arrow_inputs: bool = False,
+    entity_store: str | Path | None = None,
+    lemmatizer: str = "spacy",
+    scoring_threads: int = 1,
+    id_dictionary: IdDictionary | None = None,
+) -> pd.DataFrame:
+    """Featurize each input partition in a worker pool, then run the global stages.
+
+    The identifier dictionary (`id_dictionary`, or a new one) is filled from the whole
+    input first, so that every worker interns ids to the same codes.
+    """
+    units = input_partitions(input_path, filters)
+    if not units:
+        raise ValueError(f"build_features_partitioned: no input partitions match in {input_path}")
+
+    id_dictionary = IdDictionary() if id_dictionary is None else id_dictionary
+    _scan_id_dictionary(input_path, filters, id_dictionary)
+    with shard_directory() as tmp:
+        parts = _featurize_partitions(
+            units,
+            workers=workers,
+            filters=filters,
+            ipc_technology_xlsx=ipc_technology_xlsx,
+            keep_intermediate_columns=keep_intermediate_columns,
+            embedding_backend=embedding_backend,
+            embedding_options=dict(embedding_options or {}),
+            arrow_inputs=arrow_inputs,
+            entity_store=entity_store,
+            lemmatizer=lemmatizer,
+            scoring_threads=scoring_threads,
+            id_dictionary_path=id_dictionary.write(Path(tmp) / "id_dictionary.parquet"),
+        )
+    print(f"build_features_partitioned: partitions={len(units)} rows={sum(len(p) for p in parts)}")
+
+    df = pd.concat(parts, ignore_index=True)
+    del parts
+    return build_features(
+        df,
+        ipc_technology_xlsx=ipc_technology_xlsx,
+        keep_intermediate_columns=keep_intermediate_columns,
+        stages=GLOBAL_STAGES,
+    )
+
+
+def _featurize_partitions(units, *, workers: int, **options) -> list[pd.DataFrame]:
+    worker = partial(_build_partition_features, **options)
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(units)),
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as pool:
+        return list(pool.map(worker, *zip(*units)))
+
+
+def _build_shard_features(
+    shard_path: str | Path,
+    *,
+    ipc_technology_xlsx: str | Path,
+    keep_intermediate_columns: bool,
+    embedding_backend: str,
+    embedding_options: dict,
+    arrow_inputs: bool,
+    entity_store: str | Path | None,
+    lemmatizer: str,
+    scoring_threads: int,
+    id_dictionary_path: str | Path,
+) -> Path:
+    """Worker: run the pair-local stages on one IPC shard and write the result beside it.
+
+    The result also carries the shard's part of the author-experience index (first/last
+    authors), so the parent only runs the global ordering step.
+    """
+    configure_embedding_backend(embedding_backend, **embedding_options)
+    configure_lemmatizer(lemmatizer)
+    configure_scoring_threads(scoring_threads)
+    warm_up = start_warm_up(ipc_technology_xlsx)
+    id_dictionary = IdDictionary.read(id_dictionary_path)
+    table = read_ipc(shard_path)
+    # Identifier columns arrive interned by the parent; they stay Arrow-backed codes.
+    df = table.to_pandas(types_mapper=pd.ArrowDtype if arrow_inputs else _interned_dtype)
+    del table
+    rows = df.pop(ROW_COLUMN).to_numpy()
+    df = prepare_inputs(df, id_dictionary=id_dictionary)
+    df = cleanup_reference_ages(df)
+    warm_up.wait()
+    local_stages = [n for n, _ in feature_stages(ipc_technology_xlsx) if n not in GLOBAL_STAGES]
+    df = build_features(
+        df,
+        ipc_technology_xlsx=ipc_technology_xlsx,
+        keep_intermediate_columns=keep_intermediate_columns,
+        stages=local_stages,
+        later_stages=GLOBAL_STAGES,
+        entity_store=entity_store,
+        id_dictionary=id_dictionary,
+    )
+    if "work_author_ids" in df.columns:
+        python_object_columns(
+            df, ["work_author_ids", "work_author_positions", "work_author_positions_list"]
+        )
+        df[FIRST_LAST_AUTHORS_COLUMN] = first_last_author_ids(df)
+    df[ROW_COLUMN] = rows
+    result_path = Path(shard_path).with_suffix(".features.arrow")
+    return write_ipc(pa.Table.from_pandas(df, preserve_index=False), result_path)
+
+
+def _arrow_list_dtype(arrow_type: pa.DataType) -> pd.ArrowDtype | None:
+    if not (pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type)):
+        return None
+    # `list<null>` (e.g. `ipc_sectors` when no code maps to a sector) gets invalid
+    # offsets when re-wrapped from an ArrowDtype column after `take`; keep it as objects.
+    if pa.types.is_null(arrow_type.value_type):
+        return None
+    return pd.ArrowDtype(arrow_type)
+
+
+def _interned_dtype(arrow_type: pa.DataType) -> pd.ArrowDtype | None:
+    if arrow_type == pa.list_(CODE_TYPE):
+        return pd.ArrowDtype(arrow_type)
+    return None
+
+
+def build_features_sharded(
+    input_path: str | Path,
+    *,
+    ipc_technology_xlsx: str | Path,
+    workers: int,
+    filters: Filters | None = None,
+    keep_intermediate_columns: bool = False,
+    embedding_backend: str = DEFAULT_EMBEDDING_BACKEND,
+    embedding_options: dict | None = None,
+    arrow_inputs: bool = False,
+    entity_store: str | Path | None = None,
+    lemmatizer: str = "spacy",
+    scoring_threads: int = 1,
+    id_dictionary: IdDictionary | None = None,
+    sample: Sample | None = None,
+    author_history: tuple[pd.DataFrame, np.ndarray] | None = None,
+) -> pd.DataFrame:
+    """Hash-partition the input by pair across `workers` processes, then run the global stages.
+
+    Shards travel to and from the workers as Arrow IPC files in shared memory; the
+    results are memory-mapped, put back in input order and converted once. The global
+    `author_experience` stage then runs on the compact index the workers prepared.
+    Identifier columns are interned once here (into `id_dictionary`, or a new one)
+    before sharding, so the shards carry int32 codes instead of id strings. `sample`
+    and `author_history` are as in `run_pipeline` and `build_features`.
+    """
+    id_dictionary = IdDictionary() if id_dictionary is None else id_dictionary
+    with shard_directory() as tmp:
+        table = load_table(input_path, filters=filters, memory_map=True, sample=sample)
+        if not table.num_rows:
+            raise ValueError(f"build_features_sharded: no input rows match in {input_path}")
+        table = intern_id_table(table, id_dictionary)
+        shard_paths = write_shards(table, workers, tmp)
+        del table
+
+        worker = partial(
+            _build_shard_features,
+            ipc_technology_xlsx=ipc_technology_xlsx,
+            keep_intermediate_columns=keep_intermediate_columns,
+            embedding_backend=embedding_backend,
+            embedding_options=dict(embedding_options or {}),
+            arrow_inputs=arrow_inputs,
+            entity_store=entity_store,
+            lemmatizer=lemmatizer,
+            scoring_threads=scoring_threads,
+            id_dictionary_path=id_dictionary.write(Path(tmp) / "id_dictionary.parquet"),
+        )
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(shard_paths)),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            result_paths = list(pool.map(worker, shard_paths))
+
+        results = pa.concat_tables(
+            [read_ipc(path) for path in result_paths], promote_options="permissive"
+        )
+        results = results.take(pc.sort_indices(results[ROW_COLUMN]))
+        # List columns stay Arrow-backed; `build_features` converts them to Python lists.
+        df = results.drop_columns([ROW_COLUMN]).to_pandas(types_mapper=_arrow_list_dtype)
+        del results
+    print(f"build_features_sharded: shards={len(shard_paths)} rows={len(df)}")
+
+    return build_features(
+        df,
+        ipc_technology_xlsx=ipc_technology_xlsx,
+        keep_intermediate_columns=keep_intermediate_columns,
+        stages=GLOBAL_STAGES,
+        author_history=author_history,
+    )
+
+
+def _write_export_bundle(
+    df: pd.DataFrame,
+    output_dir: Path,
+    basename: str,
+    *,
+    parquet_options: dict | None = None,
+    csv_options: dict | None = None,
+    summary_extra: dict | None = None,
+) -> dict:
+    """Write `df` as parquet, CSV and Excel, plus summary-statistics and pair index sidecars.
+
+    The frame is converted to Arrow once for the parquet and CSV writers; the summary
+    is computed from the same table on a background thread while they write. The
+    `pair_id` index is built from the written parquet's key column and row groups.
+    """
     parquet_path = output_dir / f"{basename}.parquet"
     csv_path = output_dir / f"{basename}.csv"
     excel_path = output_dir / f"{basename}.xlsx"
+    summary_path = output_dir / f"{basename}.summary.json"
+    index_path = None
 
-    df.to_parquet(parquet_path, index=False)
-    export_to_csv(df, csv_path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary") as pool:
+        summary = pool.submit(summarize_table, table, extra=summary_extra)
+        export_to_parquet(table, parquet_path, **(parquet_options or {}))
+        if "pair_id" in table.column_names:
+            index_path = write_pair_index(parquet_path)
+        export_to_csv(table, csv_path, **(csv_options or {}))
+        write_summary(summary.result(), summary_path)
+    del table
     try:
         export_to_excel(df, excel_path)
     except ImportError as exc:
@@ -64,50 +502,331 @@ def _write_export_bundle(df: pd.DataFrame, output_dir: Path, basename: str) -> d
         "parquet": parquet_path,
         "csv": csv_path,
         "excel": excel_path,
+        "summary": summary_path,
+        "pair_index": index_path,
     }
 
 
+def _write_control_sidecars(
+    export_df: pd.DataFrame,
+    aligned: dict[str, pd.DataFrame],
+    output_dir: Path,
+    names: dict[str, str],
+    *,
+    parquet_options: dict | None = None,
+    match_stats: dict[str, dict],
+) -> dict:
+    """Write each `align_controls` frame as a sidecar in `final_features.parquet`'s row order.
+
+    Each sidecar also gets a summary-statistics sidecar of its control columns.
+    """
+    parquet_options = dict(parquet_options or {})
+    parquet_options.pop("partition_cols", None)
+    sort_by = parquet_options.pop("sort_by", None)
+    order = None
+    if sort_by:
+        order = sidecar_order(pa.Table.from_pandas(export_df[sort_by], preserve_index=False), sort_by)
+
+    outputs = {}
+    for key, controls in aligned.items():
+        path = write_control_sidecar(
+            controls, sidecar_path(output_dir, names[key]), order=order, **parquet_options
+        )
+        summary_path = path.with_name(path.name.removesuffix(".parquet") + ".summary.json")
+        write_summary(
+            summarize_table(
+                pa.Table.from_pandas(controls, preserve_index=False),
+                extra={"control_match": match_stats[key]},
+            ),
+            summary_path,
+        )
+        outputs[f"{names[key]}_sidecar"] = {"parquet": path, "summary": summary_path}
+    return outputs
+
+
 def run_pipeline(
     input_path: str | Path,
     output_dir: str | Path,
     *,
     ipc_technology_xlsx: str | Path,
     control_root: str | Path | None = None,
+    embedding_controls_k: int | None = None,
+    embedding_backend: str = DEFAULT_EMBEDDING_BACKEND,
+    embedding_options: dict | None = None,
+    embedding_workers: int = 1,
+    embedding_threads: int | None = None,
+    keep_intermediate_columns: bool = False,
+    input_filters: Filters | None = None,
+    partition_workers: int = 1,
+    workers: int = 1,
+    parquet_options: dict | None = None,
+    csv_options: dict | None = None,
+    arrow_inputs: bool = False,
+    entity_store: str | Path | None = None,
+    lemmatizer: str = "spacy",
+    scoring_threads: int = 1,
+    preflight_only: bool = False,
+    sample: Sample | None = None,
+    sample_full_history: bool = False,
+    control_output: str = "merged",
 ) -> dict:
-    df = load_parquet(input_path)
-    df = prepare_inputs(df)
+    """Run the feature pipeline on `input_path` and write the outputs to `output_dir`.
 
-    df = cleanup_reference_ages(df)
-    df = build_features(df, ipc_technology_xlsx=ipc_technology_xlsx)
+    A preflight check validates the input schema, external files and dependencies
+    before any row is loaded; with `preflight_only`, nothing else runs. Identifier list
+    columns are interned as int32 codes while the features are built; the code table is
+    written to `id_dictionary.parquet` next to the outputs.
+
+    `sample` restricts the run to a deterministic, `pair_id`-hashed subset of the
+    (filtered) input. With `sample_full_history`, `author_experience` orders the
+    sampled pairs among all input pairs, so its flags match a full run.
+
+    `control_output` (one of `CONTROL_OUTPUTS`) selects whether each control merge is
+    written as a full merged bundle, as a control-columns sidecar of
+    `final_features.parquet`, or both.
+    """
+    if control_output not in CONTROL_OUTPUTS:
+        raise ValueError(
+            f"run_pipeline: control_output must be one of {', '.join(CONTROL_OUTPUTS)}, "
+            f"got {control_output!r}"
+        )
+    if partition_workers > 1 and workers > 1:
+        raise ValueError("run_pipeline: use either partition_workers or workers, not both")
+    if sample is not None and partition_workers > 1:
+        raise ValueError("run_pipeline: sampling cannot be combined with partition_workers > 1")
+    if sample_full_history and sample is None:
+        raise ValueError("run_pipeline: sample_full_history needs a sample")
+    if embedding_controls_k and (partition_workers > 1 or workers > 1):
+        raise ValueError(
+            "run_pipeline: embedding controls need the whole input at once; "
+            "they cannot be combined with partition_workers > 1 or workers > 1"
+        )
+    preflight_check(
+        input_path,
+        ipc_technology_xlsx=ipc_technology_xlsx,
+        stages=[name for name, _ in feature_stages(ipc_technology_xlsx)],
+        input_filters=input_filters,
+        control_root=control_root,
+        embedding_controls_k=embedding_controls_k,
+        embedding_backend=embedding_backend,
+        embedding_options=embedding_options,
+        lemmatizer=lemmatizer,
+        entity_store=entity_store,
+    )
+    if preflight_only:
+        return {}
+
+    embedding_options = dict(embedding_options or {})
+    if embedding_threads:
+        embedding_options.setdefault("num_threads", embedding_threads)
+    configure_embedding_backend(embedding_backend, **embedding_options)
+    configure_embedding_workers(embedding_workers, embedding_threads)
+    configure_lemmatizer(lemmatizer)
+    configure_scoring_threads(scoring_threads)
+    # Models and lookup tables load on background threads while the input is read. With
+    # worker processes, each worker warms up its own copies instead.
+    warm_up = start_warm_up(ipc_technology_xlsx) if max(workers, partition_workers) <= 1 else None
+
+    # Controls are only needed at merge time; read them while the features are built.
+    control_frames = None
+    if control_root is not None:
+        control_frames = load_control_frames_in_background(control_root)
+
+    embedding_controls = None
+    id_dictionary = IdDictionary()
+    author_history = None
+    if sample_full_history:
+        author_history = load_author_history(input_path, input_filters, sample)
+    raise_if_failed(control_frames)
+    if workers > 1:
+        df = build_features_sharded(
+            input_path,
+            ipc_technology_xlsx=ipc_technology_xlsx,
+            workers=workers,
+            filters=input_filters,
+            keep_intermediate_columns=keep_intermediate_columns,
+            embedding_backend=embedding_backend,
+            embedding_options=embedding_options,
+            arrow_inputs=arrow_inputs,
+            entity_store=entity_store,
+            lemmatizer=lemmatizer,
+            scoring_threads=scoring_threads,
+            id_dictionary=id_dictionary,
+            sample=sample,
+            author_history=author_history,
+        )
+    elif partition_workers > 1:
+        df = build_features_partitioned(
+            input_path,
+            ipc_technology_xlsx=ipc_technology_xlsx,
+            workers=partition_workers,
+            filters=input_filters,
+            keep_intermediate_columns=keep_intermediate_columns,
+            embedding_backend=embedding_backend,
+            embedding_options=embedding_options,
+            arrow_inputs=arrow_inputs,
+            entity_store=entity_store,
+            lemmatizer=lemmatizer,
+            scoring_threads=scoring_threads,
+            id_dictionary=id_dictionary,
+        )
+    else:
+        df = load_parquet(
+            input_path, filters=input_filters, arrow_backed=arrow_inputs, sample=sample
+        )
+        df = prepare_inputs(df, id_dictionary=id_dictionary)
+
+        df = cleanup_reference_ages(df)
+        raise_if_failed(control_frames)
+        warm_up.wait()
+        if embedding_controls_k:
+            embedding_controls = generate_embedding_controls(
+                df, top_k=embedding_controls_k, ipc_technology_xlsx_path=ipc_technology_xlsx
+            )
+        df = build_features(
+            df,
+            ipc_technology_xlsx=ipc_technology_xlsx,
+            keep_intermediate_columns=keep_intermediate_columns,
+            entity_store=entity_store,
+            id_dictionary=id_dictionary,
+            author_history=author_history,
+        )
     export_df = prepare_export(df)
+    del df
 
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
     outputs = {
-        "final_features": _write_export_bundle(export_df, output_dir, "final_features")
+        "final_features": _write_export_bundle(
+            export_df, output_dir, "final_features", parquet_options=parquet_options,
+            csv_options=csv_options,
+        )
     }
 
-    if control_root is not None:
-        control_frames = load_and_prepare_control_frames(control_root)
-        merged_outputs = merge_compact_with_controls(export_df, control_frames)
+    if control_frames is not None:
+        match_stats: dict[str, dict] = {}
         output_names = {
             "control_combined_y0": "final_features_control_combined_y0",
             "control_combined_y5": "final_features_control_combined_y5",
             "control_noselfcite_combined_y0": "final_features_control_noselfcite_combined_y0",
             "control_noselfcite_combined_y5": "final_features_control_noselfcite_combined_y5",
         }
-        for key, merged_df in merged_outputs.items():
-            outputs[output_names[key]] = _write_export_bundle(
-                merged_df, output_dir, output_names[key]
+        if control_output in ("sidecar", "both"):
+            outputs.update(
+                _write_control_sidecars(
+                    export_df,
+                    align_controls(export_df, control_frames.result(), match_stats=match_stats),
+                    output_dir,
+                    output_names,
+                    parquet_options=parquet_options,
+                    match_stats=match_stats,
+                )
             )
+        if control_output in ("merged", "both"):
+            merged_outputs = merge_compact_with_controls(
+                export_df, control_frames.result(), match_stats=match_stats
+            )
+            for key, merged_df in merged_outputs.items():
+                outputs[output_names[key]] = _write_export_bundle(
+                    merged_df,
+                    output_dir,
+                    output_names[key],
+                    parquet_options=parquet_options,
+                    csv_options=csv_options,
+                    summary_extra={"control_match": match_stats[key]},
+                )
+
+    if embedding_controls is not None and len(embedding_controls):
+        control_df = build_features(
+            embedding_controls,
+            ipc_technology_xlsx=ipc_technology_xlsx,
+            keep_intermediate_columns=keep_intermediate_columns,
+            entity_store=entity_store,
+            id_dictionary=id_dictionary,
+        )
+        outputs["final_features_control_embedding_knn"] = _write_export_bundle(
+            prepare_export(control_df),
+            output_dir,
+            "final_features_control_embedding_knn",
+            parquet_options=parquet_options,
+            csv_options=csv_options,
+        )
 
+    outputs["id_dictionary"] = id_dictionary.write(output_dir / "id_dictionary.parquet")
     return outputs
 
 
 def _parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Publish-ready feature pipeline")
-    parser.add_argument("--input", required=True, help="Path to input parquet")
+    parser.add_argument(
+        "--input",
+        required=True,
+        help=(
+            "Input parquet: a file, a directory (optionally hive-partitioned, e.g. "
+            "pair_source=our_data/) or a quoted glob such as 'extracts/*.parquet'"
+        ),
+    )
+    parser.add_argument(
+        "--filter",
+        dest="filters",
+        action="append",
+        type=parse_filter,
+        help=(
+            "Input row filter pushed into the parquet scan, e.g. pair_source=our_data or "
+            "'patent_num_claims>=5'; repeat to combine with AND."
+        ),
+    )
+    parser.add_argument(
+        "--partition-workers",
+        type=int,
+        default=1,
+        help=(
+            "Process independent input partitions (hive partitions, or files of a "
+            "multi-file input) in this many worker processes."
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Hash-partition the input by pair_id into this many shards and featurize "
+            "them in parallel worker processes."
+        ),
+    )
+    sample = parser.add_mutually_exclusive_group()
+    sample.add_argument(
+        "--sample",
+        type=float,
+        metavar="FRACTION",
+        help=(
+            "Process only this fraction of the pairs, selected by a hash of pair_id, so "
+            "every run gets the same sample."
+        ),
+    )
+    sample.add_argument(
+        "--sample-rows",
+        type=int,
+        metavar="N",
+        help="Process only the N pairs with the smallest pair_id hash.",
+    )
+    parser.add_argument(
+        "--sample-full-history",
+        action="store_true",
+        help=(
+            "With --sample/--sample-rows, compute author experience over all input "
+            "pairs and report it for the sampled ones."
+        ),
+    )
+    parser.add_argument(
+        "--arrow-inputs",
+        action="store_true",
+        help=(
+            "Memory-map the input and keep columns Arrow-backed; list columns are only "
+            "converted to Python lists for the stages that need them."
+        ),
+    )
     parser.add_argument(
         "--output-dir",
         default="publish_outputs",
@@ -125,9 +844,187 @@ def _parse_args() -> argparse.Namespace:
             "pierre_data_noselfcite/ controls to left-merge by pair_id."
         ),
     )
+    parser.add_argument(
+        "--control-output",
+        choices=CONTROL_OUTPUTS,
+        default="merged",
+        help=(
+            "How to write each control merge: full merged bundles (default), "
+            "control-columns-only sidecars of final_features.parquet "
+            "(<name>.sidecar.parquet, joined at read time with "
+            "publish.export.control_sidecar.read_with_controls), or both"
+        ),
+    )
+    parser.add_argument(
+        "--embedding-controls-k",
+        type=int,
+        help=(
+            "Optional number of embedding nearest-neighbour control patents to "
+            "generate per real pair (same ipc_sectors and patent_priority_year block)."
+        ),
+    )
+    parser.add_argument(
+        "--embedding-backend",
+        default=DEFAULT_EMBEDDING_BACKEND,
+        choices=sorted(EMBEDDING_BACKENDS),
+        help=(
+            "Embedding backend for semantic similarity: sbert (sentence-transformers), "
+            "onnx (ONNX Runtime on CPU, needs --embedding-model-dir) or hashing "
+            "(deterministic, no model download)."
+        ),
+    )
+    parser.add_argument(
+        "--embedding-model-dir",
+        help="Local model directory (tokenizer.json + model.onnx) for the onnx backend.",
+    )
+    parser.add_argument(
+        "--embedding-quantize",
+        action="store_true",
+        help="For the onnx backend, create and use an int8-quantized model.",
+    )
+    parser.add_argument(
+        "--embedding-workers",
+        type=int,
+        default=1,
+        help="Shard embedding inference across this many worker processes.",
+    )
+    parser.add_argument(
+        "--embedding-threads",
+        type=int,
+        help="Intra-op threads per embedding process (default: CPU count / workers).",
+    )
+    parser.add_argument(
+        "--lemmatizer",
+        default="spacy",
+        choices=LEMMATIZERS,
+        help=(
+            "Lemmatizer for word overlap: spacy (pipeline) or fast (cached spaCy tokenizer "
+            "tables applied with compiled regexes; same output, see publish/lemmatizer.py)."
+        ),
+    )
+    parser.add_argument(
+        "--scoring-threads",
+        type=int,
+        default=1,
+        help=(
+            "Threads for the row-level scoring in text_similarity (word overlap), "
+            "geo_distance and patent_classification. They scale across cores on a "
+            "free-threaded (3.13t) Python; the spaCy lemmatizer is serialized, so "
+            "combine with --lemmatizer fast."
+        ),
+    )
+    parser.add_argument(
+        "--entity-store",
+        help=(
+            "Directory of the persistent paper/patent feature store; entities seen in "
+            "earlier runs (with unchanged source columns) are not recomputed."
+        ),
+    )
+    parser.add_argument(
+        "--keep-intermediate-columns",
+        action="store_true",
+        help=(
+            "Keep raw input and intermediate columns until export (debugging); by default "
+            "they are dropped once their last consuming stage has run."
+        ),
+    )
+    parser.add_argument(
+        "--parquet-partition-by",
+        help=(
+            "Comma-separated columns (e.g. publication_year,pair_source) to write each "
+            "parquet output as a hive-partitioned dataset directory."
+        ),
+    )
+    parser.add_argument(
+        "--parquet-sort-by",
+        help="Comma-separated columns to sort parquet outputs by before writing.",
+    )
+    parser.add_argument(
+        "--parquet-zstd-level",
+        type=int,
+        help="Write parquet outputs with zstd at this level (default: snappy).",
+    )
+    parser.add_argument(
+        "--parquet-row-group-size",
+        type=int,
+        help="Maximum rows per parquet row group.",
+    )
+    parser.add_argument(
+        "--parquet-page-index",
+        action="store_true",
+        help="Write the parquet page index (column/offset indexes) for page skipping.",
+    )
+    parser.add_argument(
+        "--no-parquet-statistics",
+        dest="parquet_statistics",
+        action="store_false",
+        help="Do not write parquet column statistics.",
+    )
+    parser.add_argument(
+        "--csv-list-format",
+        choices=LIST_FORMATS,
+        default="json",
+        help="How list columns are written to CSV: JSON arrays (default) or delimiter-joined.",
+    )
+    parser.add_argument(
+        "--csv-list-delimiter",
+        default="; ",
+        help="Element separator for --csv-list-format delimited (default: '; ').",
+    )
+    parser.add_argument(
+        "--csv-threads",
+        type=int,
+        help="Threads used to serialize CSV outputs (default: CPU count).",
+    )
+    parser.add_argument(
+        "--preflight-only",
+        action="store_true",
+        help="Only check the input schema, external files and dependencies, then exit.",
+    )
     return parser.parse_args()
 
 
+def _split_columns(value: str | None) -> list[str] | None:
+    return [c.strip() for c in value.split(",") if c.strip()] if value else None
+
+
+def _parquet_options(args: argparse.Namespace) -> dict:
+    options = {
+        "partition_cols": _split_columns(args.parquet_partition_by),
+        "sort_by": _split_columns(args.parquet_sort_by),
+        "row_group_size": args.parquet_row_group_size,
+        "write_page_index": args.parquet_page_index,
+        "write_statistics": args.parquet_statistics,
+    }
+    if args.parquet_zstd_level is not None:
+        options["compression"] = "zstd"
+        options["compression_level"] = args.parquet_zstd_level
+    return options
+
+
+def _csv_options(args: argparse.Namespace) -> dict:
+    return {
+        "list_format": args.csv_list_format,
+        "list_delimiter": args.csv_list_delimiter,
+        "threads": args.csv_threads,
+    }
+
+
+def _sample(args: argparse.Namespace) -> Sample | None:
+    if args.sample is None and args.sample_rows is None:
+        return None
+    return Sample(fraction=args.sample, rows=args.sample_rows)
+
+
+def embedding_options_from_args(args: argparse.Namespace) -> dict:
+    """`configure_embedding_backend` options from the `--embedding-*` flags."""
+    if args.embedding_backend == "onnx":
+        if not args.embedding_model_dir:
+            raise SystemExit("--embedding-backend onnx requires --embedding-model-dir")
+        return {"model_dir": args.embedding_model_dir, "quantize": args.embedding_quantize}
+    return {}
+
+
 if __name__ == "__main__":
     args = _parse_args()
     outputs = run_pipeline(
@@ -135,5 +1032,25 @@ if __name__ == "__main__":
         args.output_dir,
         ipc_technology_xlsx=args.ipc_technology_xlsx,
         control_root=args.control_root,
+        embedding_controls_k=args.embedding_controls_k,
+        embedding_backend=args.embedding_backend,
+        embedding_options=embedding_options_from_args(args),
+        embedding_workers=args.embedding_workers,
+        embedding_threads=args.embedding_threads,
+        keep_intermediate_columns=args.keep_intermediate_columns,
+        input_filters=args.filters,
+        partition_workers=args.partition_workers,
+        workers=args.workers,
+        parquet_options=_parquet_options(args),
+        csv_options=_csv_options(args),
+        arrow_inputs=args.arrow_inputs,
+        entity_store=args.entity_store,
+        lemmatizer=args.lemmatizer,
+        scoring_threads=args.scoring_threads,
+        preflight_only=args.preflight_only,
+        sample=_sample(args),
+        sample_full_history=args.sample_full_history,
+        control_output=args.control_output,
     )
-    print("Wrote outputs:", outputs)
+    if outputs:
+        print("Wrote outputs:", outputs)
@@ -1,16 +1,86 @@
 """Scoring utilities used by the publish pipeline.
 
 This module is intentionally self-contained and avoids expensive work at import time.
-Heavy dependencies (SpaCy pipeline, SBERT model) are lazy-loaded when first used.
+Heavy dependencies (SpaCy pipeline, embedding backends) are lazy-loaded when first used.
+
+The row-level scoring functions are safe to call from several threads: lazily loaded
+models are created once under a lock (`synchronized_cache`), and calls into the spaCy
+pipeline, which is not thread-safe, are serialized. `thread_map` runs them on
+`configure_scoring_threads` threads, which scale across cores on a free-threaded
+(3.13t) build.
 """
 
 from __future__ import annotations
 
-from functools import lru_cache
-from typing import Iterable, Optional
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, wraps
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Sequence
+
+import numpy as np
+
+
+def synchronized_cache(maxsize: int):
+    """`lru_cache` whose calls hold a lock, so concurrent first calls build the value once.
+
+    For the lazily loaded models and lookup tables; the wrapper keeps `cache_clear`.
+    """
+
+    def decorate(func):
+        cached = lru_cache(maxsize=maxsize)(func)
+        lock = threading.Lock()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with lock:
+                return cached(*args, **kwargs)
+
+        wrapper.cache_clear = cached.cache_clear
+        wrapper.cache_info = cached.cache_info
+        return wrapper
+
+    return decorate
+
+
+_SCORING_THREADS = 1
 
+# Each thread gets several chunks, so uneven rows (long abstracts) balance out.
+_CHUNKS_PER_THREAD = 4
 
-@lru_cache(maxsize=1)
+
+def configure_scoring_threads(threads: int = 1) -> None:
+    """Run the row-level scoring of `thread_map` callers on `threads` threads."""
+    global _SCORING_THREADS
+
+    _SCORING_THREADS = max(1, int(threads))
+
+
+def scoring_threads() -> int:
+    return _SCORING_THREADS
+
+
+def thread_map(func: Callable, *iterables: Iterable) -> list:
+    """`list(map(func, *iterables))`, split into chunks over the scoring threads."""
+    rows = list(zip(*iterables))
+    threads = min(_SCORING_THREADS, len(rows))
+    if threads <= 1:
+        return [func(*row) for row in rows]
+
+    size = -(-len(rows) // (threads * _CHUNKS_PER_THREAD))
+    chunks = [rows[start : start + size] for start in range(0, len(rows), size)]
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="scoring") as pool:
+        results = pool.map(lambda chunk: [func(*row) for row in chunk], chunks)
+        return [value for chunk in results for value in chunk]
+
+
+@synchronized_cache(maxsize=1)
 def _spacy_nlp():
     """Create a lightweight English pipeline for tokenization + lemmatization."""
     from spacy.lang.en import English
@@ -22,28 +92,78 @@ def _spacy_nlp():
     return nlp
 
 
-@lru_cache(maxsize=1)
+@synchronized_cache(maxsize=1)
 def _stopwords() -> set[str]:
     from spacy.lang.en.stop_words import STOP_WORDS
 
     return {w.lower() for w in STOP_WORDS}
 
 
-@lru_cache(maxsize=200_000)
-def _lemmatize_cached(text: str) -> tuple[str, ...]:
+LEMMATIZERS = ("spacy", "fast")
+_LEMMATIZER = "spacy"
+
+
+def configure_lemmatizer(name: str = "spacy") -> None:
+    """Select `lemmatize`'s implementation: the spaCy pipeline or `publish.lemmatizer`."""
+    global _LEMMATIZER
+    if name not in LEMMATIZERS:
+        raise ValueError(f"Unknown lemmatizer {name!r}; expected one of: {', '.join(LEMMATIZERS)}")
+    if name != _LEMMATIZER:
+        _LEMMATIZER = name
+        _lemmatize_cached.cache_clear()
+
+
+def load_lemmatizer() -> None:
+    """Load the configured lemmatizer's pipeline or tables now instead of on first use."""
+    if _LEMMATIZER == "fast":
+        from publish.lemmatizer import fast_lemmatizer
+
+        fast_lemmatizer()
+    else:
+        _spacy_nlp()
+        _stopwords()
+
+
+# spaCy's pipeline and vocabulary are not safe to use from several threads at once.
+_SPACY_LOCK = threading.Lock()
+
+
+def spacy_lemmatize(text: str) -> tuple[str, ...]:
+    """Uncached lemmas of `text` from the spaCy pipeline, without punctuation and stopwords."""
     nlp = _spacy_nlp()
     stopwords = _stopwords()
 
-    doc = nlp(text)
     lemmas: list[str] = []
-    for token in doc:
-        lemma = (token.lemma_ or "").strip().lower()
-        if not lemma or token.is_punct or lemma in stopwords:
-            continue
-        lemmas.append(lemma)
+    # Reading lemmas also goes through the shared vocabulary's string store.
+    with _SPACY_LOCK:
+        for token in nlp(text):
+            lemma = (token.lemma_ or "").strip().lower()
+            if not lemma or token.is_punct or lemma in stopwords:
+                continue
+            lemmas.append(lemma)
     return tuple(lemmas)
 
 
+# `lru_cache` keeps its own bookkeeping consistent under concurrent calls (with or
+# without the GIL); two threads missing the same text both compute the same lemmas.
+@lru_cache(maxsize=200_000)
+def _lemmatize_cached(text: str) -> tuple[str, ...]:
+    if _LEMMATIZER == "fast":
+        from publish.lemmatizer import fast_lemmatizer
+
+        return fast_lemmatizer().lemmatize(text)
+    return spacy_lemmatize(text)
+
+
+def clear_lemma_caches() -> None:
+    """Forget every cached lemma, e.g. to time lemmatization from a cold start."""
+    _lemmatize_cached.cache_clear()
+    if _LEMMATIZER == "fast":
+        from publish.lemmatizer import fast_lemmatizer
+
+        fast_lemmatizer().clear_cache()
+
+
 def lemmatize(text: object) -> list[str]:
     if text is None:
         return []
@@ -53,8 +173,12 @@ def lemmatize(text: object) -> list[str]:
     return list(_lemmatize_cached(s))
 
 
-@lru_cache(maxsize=1)
-def _sbert_model():
+DEFAULT_SBERT_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_EMBEDDING_BACKEND = "sbert"
+
+
+@synchronized_cache(maxsize=4)
+def _sbert_model(model_name: str = DEFAULT_SBERT_MODEL):
     """Lazy-load SBERT model and pick an available device."""
     try:
         import torch
@@ -72,11 +196,313 @@ def _sbert_model():
             "Missing dependency 'sentence-transformers'. Install it to compute SBERT similarities."
         ) from exc
 
-    return SentenceTransformer("all-MiniLM-L6-v2", device=device)
+    return SentenceTransformer(model_name, device=device)
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    """Rows of `matrix` scaled to unit length, as float32; all-zero rows stay zero."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SentenceTransformerBackend:
+    """SBERT embeddings through sentence-transformers (torch)."""
+
+    name = "sbert"
+
+    def __init__(self, model_name: str = DEFAULT_SBERT_MODEL, *, num_threads: Optional[int] = None):
+        self.model_name = model_name
+        self.num_threads = num_threads
+
+    def encode(self, texts: Sequence[str], *, batch_size: int = 64) -> np.ndarray:
+        model = _sbert_model(self.model_name)
+        if self.num_threads:
+            import torch
+
+            torch.set_num_threads(self.num_threads)
+        embeddings = model.encode(
+            list(texts),
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+class OnnxEmbeddingBackend:
+    """Mean-pooled transformer embeddings through ONNX Runtime on CPU.
+
+    `model_dir` is a local export of a sentence-transformers model: `tokenizer.json`
+    plus `model.onnx` (or an int8 `model_quantized.onnx`/`model_int8.onnx`, which are
+    preferred when present). With `quantize=True` and no int8 file, one is created from
+    `model.onnx` with ONNX Runtime dynamic quantization.
+    """
+
+    name = "onnx"
+
+    _MODEL_FILES = ("model_quantized.onnx", "model_int8.onnx", "model.onnx")
+
+    def __init__(
+        self,
+        model_dir: str | Path,
+        *,
+        quantize: bool = False,
+        max_length: int = 256,
+        num_threads: Optional[int] = None,
+    ):
+        try:
+            import onnxruntime as ort
+        except Exception as exc:  # pragma: no cover
+            raise ImportError(
+                "Missing dependency 'onnxruntime'. Install it to use the ONNX embedding backend."
+            ) from exc
+        try:
+            from tokenizers import Tokenizer
+        except Exception as exc:  # pragma: no cover
+            raise ImportError(
+                "Missing dependency 'tokenizers'. Install it to use the ONNX embedding backend."
+            ) from exc
+
+        model_dir = Path(model_dir)
+        if quantize:
+            self._quantize(model_dir)
+        model_path = self.find_model(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self._session = ort.InferenceSession(
+            str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self._session.get_inputs()}
+
+        tokenizer_path = model_dir / "tokenizer.json"
+        if not tokenizer_path.exists():
+            raise FileNotFoundError(f"onnx embedding backend: tokenizer not found: {tokenizer_path}")
+        self._tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self._tokenizer.enable_truncation(max_length=max_length)
+        self._tokenizer.enable_padding()
+
+    @classmethod
+    def find_model(cls, model_dir: Path) -> Path:
+        """The ONNX model file in `model_dir` (or its `onnx/` subdirectory)."""
+        for sub in (model_dir, model_dir / "onnx"):
+            for filename in cls._MODEL_FILES:
+                if (sub / filename).exists():
+                    return sub / filename
+        raise FileNotFoundError(
+            f"onnx embedding backend: no model file ({', '.join(cls._MODEL_FILES)}) in {model_dir}"
+        )
+
+    @classmethod
+    def _quantize(cls, model_dir: Path) -> None:
+        model_path = cls.find_model(model_dir)
+        if model_path.name != "model.onnx":
+            return
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            str(model_path), str(model_path.with_name("model_int8.onnx")), weight_type=QuantType.QInt8
+        )
+
+    def encode(self, texts: Sequence[str], *, batch_size: int = 64) -> np.ndarray:
+        chunks = []
+        texts = list(texts)
+        for start in range(0, len(texts), batch_size):
+            encodings = self._tokenizer.encode_batch(texts[start : start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+            output = self._session.run(None, feeds)[0]
+            if output.ndim == 3:
+                # Token embeddings: mean-pool over non-padding tokens.
+                mask = attention_mask[:, :, None].astype(np.float32)
+                output = (output * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            chunks.append(l2_normalize(output))
+        if not chunks:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(chunks)
+
+
+class HashingEmbeddingBackend:
+    """Deterministic signed hashing-vectorizer embeddings (no model download).
+
+    Not a semantic model: similarity reduces to (hashed) word overlap. Meant for offline
+    tests, benchmarks and dry runs.
+    """
+
+    name = "hashing"
+
+    _TOKEN_RE = re.compile(r"\w+")
+
+    def __init__(self, n_features: int = 384, *, num_threads: Optional[int] = None):
+        # `num_threads` is accepted for interface parity; hashing is single-threaded.
+        self.n_features = n_features
+
+    def encode(self, texts: Sequence[str], *, batch_size: int = 64) -> np.ndarray:
+        out = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in self._TOKEN_RE.findall(str(text).lower()):
+                h = zlib.crc32(token.encode("utf-8"))
+                out[row, h % self.n_features] += 1.0 if (h >> 31) & 1 else -1.0
+        return l2_normalize(out)
+
+
+EMBEDDING_BACKENDS = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    OnnxEmbeddingBackend.name: OnnxEmbeddingBackend,
+    HashingEmbeddingBackend.name: HashingEmbeddingBackend,
+}
+
+_EMBEDDING_BACKEND_CONFIG: tuple[str, dict] = (DEFAULT_EMBEDDING_BACKEND, {})
+
+
+def configure_embedding_backend(name: str = DEFAULT_EMBEDDING_BACKEND, **options) -> None:
+    """Select the backend used by `encode_texts` (e.g. `onnx` with `model_dir=...`)."""
+    global _EMBEDDING_BACKEND_CONFIG
+
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown embedding backend {name!r}; expected one of: {', '.join(EMBEDDING_BACKENDS)}"
+        )
+    _EMBEDDING_BACKEND_CONFIG = (name, dict(options))
+    get_embedding_backend.cache_clear()
+
+
+@synchronized_cache(maxsize=1)
+def get_embedding_backend():
+    """Lazy-create the configured embedding backend."""
+    name, options = _EMBEDDING_BACKEND_CONFIG
+    return EMBEDDING_BACKENDS[name](**options)
+
+
+_EMBEDDING_WORKERS: tuple[int, Optional[int]] = (1, None)
+
+# Below this many texts, spawning worker processes costs more than it saves.
+_MIN_TEXTS_PER_WORKER = 256
+
+
+def configure_embedding_workers(workers: int = 1, threads_per_worker: Optional[int] = None) -> None:
+    """Shard `encode_texts` across `workers` processes with `threads_per_worker` intra-op threads."""
+    global _EMBEDDING_WORKERS
+
+    _EMBEDDING_WORKERS = (max(1, int(workers)), threads_per_worker)
+
+
+def encode_texts(texts: Sequence[str], *, batch_size: int = 64) -> np.ndarray:
+    """Encode texts into L2-normalized float32 embeddings, one row per text."""
+    texts = list(texts)
+    workers, threads_per_worker = _EMBEDDING_WORKERS
+    if workers > 1 and len(texts) >= workers * _MIN_TEXTS_PER_WORKER:
+        return encode_texts_sharded(
+            texts, workers=workers, threads_per_worker=threads_per_worker, batch_size=batch_size
+        )
+    return get_embedding_backend().encode(texts, batch_size=batch_size)
+
+
+def _init_encode_worker(backend_config: tuple[str, dict], threads: Optional[int]) -> None:
+    if threads:
+        # Must be set before torch/onnxruntime create their thread pools.
+        for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+            os.environ[var] = str(threads)
+    name, options = backend_config
+    if threads:
+        options = {**options, "num_threads": threads}
+    configure_embedding_backend(name, **options)
+
+
+def _encode_worker_dim() -> int:
+    return int(get_embedding_backend().encode(["dimension probe"]).shape[1])
+
+
+def _encode_worker_shard(
+    texts: list[str], start: int, out_path: str, shape: tuple[int, int], batch_size: int
+) -> int:
+    out = np.memmap(out_path, dtype=np.float32, mode="r+", shape=shape)
+    backend = get_embedding_backend()
+    for offset in range(0, len(texts), batch_size):
+        batch = texts[offset : offset + batch_size]
+        row = start + offset
+        out[row : row + len(batch)] = backend.encode(batch, batch_size=batch_size)
+    out.flush()
+    del out
+    return len(texts)
+
+
+def encode_texts_sharded(
+    texts: Sequence[str],
+    *,
+    workers: int,
+    threads_per_worker: Optional[int] = None,
+    batch_size: int = 64,
+    out_path: Optional[str | Path] = None,
+) -> np.ndarray:
+    """Encode texts across `workers` processes, each holding its own model.
+
+    Workers write their rows straight into a float32 memmap that the parent maps
+    without copying. With `out_path` the memmap is kept on disk; otherwise it lives in
+    an unlinked temporary file. Prints the achieved throughput in texts/sec.
+    """
+    texts = [str(t) for t in texts]
+    n_texts = len(texts)
+    threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+
+    if out_path is None:
+        tmp = tempfile.NamedTemporaryFile(prefix="publish_embeddings_", suffix=".f32", delete=False)
+        tmp.close()
+        path = tmp.name
+    else:
+        path = str(out_path)
+
+    started = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            # Torch is not fork-safe once initialized; always start clean workers.
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_encode_worker,
+            initargs=(_EMBEDDING_BACKEND_CONFIG, threads_per_worker),
+        ) as pool:
+            dim = pool.submit(_encode_worker_dim).result()
+            shape = (n_texts, dim)
+            out = np.memmap(path, dtype=np.float32, mode="w+", shape=shape if n_texts else (1, dim))
+
+            # A few shards per worker keeps them busy when texts differ in length.
+            shard_size = max(batch_size, -(-n_texts // (workers * 4)))
+            futures = [
+                pool.submit(
+                    _encode_worker_shard,
+                    texts[start : start + shard_size],
+                    start,
+                    path,
+                    shape,
+                    batch_size,
+                )
+                for start in range(0, n_texts, shard_size)
+            ]
+            encoded = sum(f.result() for f in futures)
+    finally:
+        if out_path is None:
+            # Removed on failure too; after success the mapping stays valid (POSIX).
+            os.unlink(path)
+    elapsed = time.perf_counter() - started
+    print(
+        f"encode_texts_sharded: texts={encoded} workers={workers} "
+        f"threads_per_worker={threads_per_worker} elapsed={elapsed:.1f}s "
+        f"throughput={encoded / elapsed if elapsed else 0.0:.1f} texts/sec"
+    )
+    return out[:n_texts]
 
 
 def semantic_similarity_score_sbert(string_one: object, string_two: object) -> Optional[float]:
-    """Cosine similarity between two strings using SBERT embeddings."""
+    """Cosine similarity between two strings using the configured embedding backend."""
     if not string_one or not string_two:
         return None
     s1 = str(string_one)
@@ -84,14 +510,8 @@ def semantic_similarity_score_sbert(string_one: object, string_two: object) -> O
     if not s1.strip() or not s2.strip():
         return None
 
-    from sentence_transformers import util
-
-    model = _sbert_model()
-    embeddings = model.encode([s1, s2], convert_to_tensor=True)
-    cosine_score = util.cos_sim(embeddings[0], embeddings[1])
-    # Convert to python float
-    score = float(cosine_score.cpu().numpy()[0][0])
-    return score
+    embeddings = encode_texts([s1, s2])
+    return float(np.dot(embeddings[0], embeddings[1]))
 
 
 def semantic_similarity_score_word_overlap(string_one: object, string_two: object) -> Optional[float]:
@@ -102,9 +522,11 @@ def semantic_similarity_score_word_overlap(string_one: object, string_two: objec
     if not string_one or not string_two:
         return None
 
-    tokens_one = lemmatize(string_one)
-    tokens_two = lemmatize(string_two)
+    return word_overlap_from_lemmas(lemmatize(string_one), lemmatize(string_two))
+
 
+def word_overlap_from_lemmas(tokens_one: Iterable[str], tokens_two: Iterable[str]) -> float:
+    """Word overlap score of two already lemmatized token lists."""
     set_one = {t.lower() for t in tokens_one if t}
     set_two = {t.lower() for t in tokens_two if t}
 
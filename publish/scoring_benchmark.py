@@ -0,0 +1,116 @@
+"""Benchmark thread-parallel row-level scoring (`--scoring-threads`).
+
+Run the same command with the regular (GIL) build and a free-threaded build to compare
+how the stages scale:
+
+    python -m publish.scoring_benchmark --input pairs.parquet --ipc-technology-xlsx ipc.xlsx
+    python3.13t -m publish.scoring_benchmark --input pairs.parquet --ipc-technology-xlsx ipc.xlsx
+
+Each row-level stage runs on the prepared input once per thread count, with cold lemma
+caches, and the best of `--repeat` runs is reported with its speedup over one thread.
+An extension module without free-threading support re-enables the GIL when it is
+imported; the reported `gil_enabled` is the state after all imports.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import sysconfig
+import time
+from typing import Callable
+
+import pandas as pd
+
+from publish.features.geo_distance import add_geo_distance
+from publish.features.patent_classification import add_patent_classification, ipc_code_to_sector_map
+from publish.features.text_similarity import word_overlap_scores
+from publish.prep.load_inputs import load_parquet, prepare_inputs
+from publish.scores import (
+    LEMMATIZERS,
+    clear_lemma_caches,
+    configure_lemmatizer,
+    configure_scoring_threads,
+    load_lemmatizer,
+)
+
+
+def _word_overlap(df: pd.DataFrame) -> None:
+    for col_a, col_b in (("work_title", "patent_title"), ("work_abstract", "patent_abstract")):
+        if {col_a, col_b} <= set(df.columns):
+            word_overlap_scores(df, col_a, col_b)
+
+
+def _best_seconds(run: Callable[[], None], repeat: int, before: Callable[[], None]) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        before()
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark(
+    df: pd.DataFrame,
+    *,
+    ipc_technology_xlsx: str,
+    thread_counts: list[int],
+    repeat: int = 3,
+) -> dict[str, dict[int, float]]:
+    """Seconds per stage and thread count, for a prepared input frame."""
+    stages = {
+        "word_overlap": lambda: _word_overlap(df),
+        "geo_distance": lambda: add_geo_distance(df.copy()),
+        "patent_classification": lambda: add_patent_classification(
+            df.copy(), ipc_technology_xlsx_path=ipc_technology_xlsx
+        ),
+    }
+    results: dict[str, dict[int, float]] = {name: {} for name in stages}
+    for threads in thread_counts:
+        configure_scoring_threads(threads)
+        for name, run in stages.items():
+            results[name][threads] = _best_seconds(
+                run, repeat, clear_lemma_caches
+            )
+    configure_scoring_threads(1)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time row-level scoring across thread counts")
+    parser.add_argument("--input", required=True, help="Input pairs parquet")
+    parser.add_argument("--ipc-technology-xlsx", required=True)
+    parser.add_argument("--threads", default="1,2,4,8", help="Comma-separated thread counts")
+    parser.add_argument("--lemmatizer", default="fast", choices=LEMMATIZERS)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is kept)")
+    args = parser.parse_args()
+
+    configure_lemmatizer(args.lemmatizer)
+    load_lemmatizer()
+    ipc_code_to_sector_map(str(args.ipc_technology_xlsx))
+    df = prepare_inputs(load_parquet(args.input))
+    thread_counts = [int(t) for t in args.threads.split(",") if t.strip()]
+
+    results = benchmark(
+        df,
+        ipc_technology_xlsx=args.ipc_technology_xlsx,
+        thread_counts=thread_counts,
+        repeat=args.repeat,
+    )
+    gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(
+        f"scoring_benchmark: python={sys.version.split()[0]} "
+        f"free_threaded_build={bool(sysconfig.get_config_var('Py_GIL_DISABLED'))} "
+        f"gil_enabled={gil_enabled} lemmatizer={args.lemmatizer} rows={len(df)}"
+    )
+    for name, seconds in results.items():
+        base = seconds[thread_counts[0]]
+        for threads, value in seconds.items():
+            print(
+                f"  {name}: threads={threads} seconds={value:.3f} "
+                f"speedup={base / value if value else float('inf'):.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
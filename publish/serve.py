@@ -0,0 +1,400 @@
+"""Long-lived scoring server that keeps the pipeline's models and tables warm.
+
+`python -m publish.serve --ipc-technology-xlsx ipc.xlsx` loads pandas, the lemmatizer,
+the embedding backend and the IPC mapping once. It then scores pairs posted to
+`POST /score`, over localhost HTTP or a Unix socket (`--socket PATH`). A request
+body is either JSON or an Arrow IPC stream of pairs with the pipeline's input
+columns. The response uses the same format and contains the `FINAL_COLUMNS`
+features of each pair, in request order.
+
+Requests that arrive together are scored as one micro-batch, so each stage
+(and the embedding backend) runs once per batch rather than once per request.
+Citation linkage and author experience are the only stages whose results depend on
+the other pairs. In a batch, author and work ids are scoped to their request, so a
+request's features do not depend on which requests shared its batch.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from publish.export.export import prepare_export
+from publish.features.author_experience import FIRST_LAST_AUTHORS_COLUMN, first_last_author_ids
+from publish.prep.cleanup import cleanup_reference_ages
+from publish.prep.entity_store import EntityStore
+from publish.prep.id_dictionary import IdDictionary, intern_id_columns
+from publish.prep.load_inputs import prepare_inputs
+from publish.run_pipeline import (
+    GLOBAL_STAGES,
+    build_features,
+    embedding_options_from_args,
+    feature_stages,
+)
+from publish.scores import (
+    DEFAULT_EMBEDDING_BACKEND,
+    EMBEDDING_BACKENDS,
+    LEMMATIZERS,
+    configure_embedding_backend,
+    configure_lemmatizer,
+    configure_scoring_threads,
+)
+from publish.utils import python_object_columns
+from publish.warm_up import start_warm_up
+
+JSON_CONTENT_TYPE = "application/json"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+# Interned columns the global stages compare across pairs.
+SCOPED_ID_COLUMNS = (
+    "work_author_ids",
+    FIRST_LAST_AUTHORS_COLUMN,
+    "patent_inventor_ids",
+    "work_referenced_works",
+    "patent_cited_works",
+)
+
+
+def warm_up(ipc_technology_xlsx: str | Path) -> float:
+    """Load the IPC mapping, the lemmatizer and the embedding model; return the seconds taken."""
+    start = time.perf_counter()
+    seconds = start_warm_up(ipc_technology_xlsx).wait("serve: warm_up")
+    if seconds["embedding"] is None:
+        print("serve: semantic similarity disabled (missing embedding dependency)")
+    return time.perf_counter() - start
+
+
+def score_frames(
+    frames: Sequence[pd.DataFrame],
+    *,
+    ipc_technology_xlsx: str | Path,
+    entity_store: Optional[str | Path | EntityStore] = None,
+) -> list[pd.DataFrame]:
+    """Export-ready features of each prepared frame, scoring them as one batch.
+
+    The frames must have the same columns.
+    """
+    sizes = [len(frame) for frame in frames]
+    id_dictionary = IdDictionary()
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+    df = intern_id_columns(df, id_dictionary)
+    df = cleanup_reference_ages(df)
+    local_stages = [n for n, _ in feature_stages(ipc_technology_xlsx) if n not in GLOBAL_STAGES]
+    df = build_features(
+        df,
+        ipc_technology_xlsx=ipc_technology_xlsx,
+        stages=local_stages,
+        later_stages=GLOBAL_STAGES,
+        entity_store=entity_store,
+        id_dictionary=id_dictionary,
+    )
+    _scope_ids_to_requests(df, sizes, len(id_dictionary))
+    df = build_features(df, ipc_technology_xlsx=ipc_technology_xlsx, stages=GLOBAL_STAGES)
+    export_df = prepare_export(df)
+
+    bounds = np.cumsum([0, *sizes])
+    return [
+        export_df.iloc[start:stop].reset_index(drop=True)
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def _scope_ids_to_requests(df: pd.DataFrame, sizes: Sequence[int], n_ids: int) -> None:
+    """Offset each request's id codes by `request * n_ids`, so requests share no authors or works."""
+    python_object_columns(
+        df,
+        [
+            "work_author_ids",
+            "work_author_positions",
+            "work_author_positions_list",
+            "work_referenced_works",
+            "patent_cited_works",
+        ],
+    )
+    if "work_author_ids" in df.columns:
+        df[FIRST_LAST_AUTHORS_COLUMN] = first_last_author_ids(df)
+    offsets = np.repeat(np.arange(len(sizes)) * n_ids, sizes)
+    for column in SCOPED_ID_COLUMNS:
+        if column not in df.columns:
+            continue
+        df[column] = [
+            [code + offset for code in codes] if isinstance(codes, list) else codes
+            for codes, offset in zip(df[column], offsets)
+        ]
+
+
+class MicroBatcher:
+    """Collect concurrent requests into batches scored by one background thread.
+
+    A batch closes when it holds `max_rows` pairs or `max_wait` seconds after its
+    first request arrived. Requests with different input columns are scored
+    separately. If a batch fails, its requests are retried one by one, so an error
+    is only reported to the request that caused it.
+    """
+
+    def __init__(
+        self,
+        *,
+        ipc_technology_xlsx: str | Path,
+        entity_store: Optional[str | Path | EntityStore] = None,
+        max_rows: int = 2048,
+        max_wait: float = 0.005,
+    ):
+        self.ipc_technology_xlsx = ipc_technology_xlsx
+        self.entity_store = entity_store
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self.batches = 0
+        self.pairs = 0
+        self._queue: queue.Queue[tuple[pd.DataFrame, Future]] = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="scoring-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, df: pd.DataFrame) -> Future:
+        """Queue prepared pairs for scoring; the future resolves to their features."""
+        future: Future = Future()
+        self._queue.put((df, future))
+        return future
+
+    def score(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.submit(df).result()
+
+    def _next_batch(self) -> list[tuple[pd.DataFrame, Future]]:
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_rows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            groups: dict[tuple[str, ...], list[tuple[pd.DataFrame, Future]]] = {}
+            for item in batch:
+                groups.setdefault(tuple(item[0].columns), []).append(item)
+            for items in groups.values():
+                self._score_group(items)
+            self.batches += 1
+            self.pairs += sum(len(df) for df, _ in batch)
+
+    def _score_group(self, items: list[tuple[pd.DataFrame, Future]]) -> None:
+        try:
+            results = score_frames(
+                [df for df, _ in items],
+                ipc_technology_xlsx=self.ipc_technology_xlsx,
+                entity_store=self.entity_store,
+            )
+        except Exception as exc:
+            if len(items) > 1:
+                for item in items:
+                    self._score_group([item])
+            else:
+                items[0][1].set_exception(exc)
+            return
+        for (_, future), result in zip(items, results):
+            future.set_result(result)
+
+
+def read_pairs(body: bytes, content_type: str) -> pd.DataFrame:
+    """Pairs from a request body: an Arrow IPC stream, or JSON records.
+
+    JSON is either a list of pair objects or an object with a `pairs` list.
+    """
+    if content_type == ARROW_CONTENT_TYPE:
+        return pa.ipc.open_stream(body).read_all().to_pandas()
+    if content_type not in (JSON_CONTENT_TYPE, ""):
+        raise ValueError(f"serve: unsupported content type {content_type!r}")
+    payload = json.loads(body)
+    records = payload.get("pairs") if isinstance(payload, dict) else payload
+    if not isinstance(records, list):
+        raise ValueError('serve: expected a JSON list of pairs or {"pairs": [...]}')
+    return pd.DataFrame.from_records(records)
+
+
+def write_features(df: pd.DataFrame, content_type: str) -> bytes:
+    if content_type == ARROW_CONTENT_TYPE:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+    return df.to_json(orient="records", date_format="iso").encode()
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """`POST /score` scores a batch of pairs; `GET /health` reports the server's counters."""
+
+    server: "ScoringServer"
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self) -> str:
+        # Unix socket peers have no (host, port) address.
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes, content_type: str = JSON_CONTENT_TYPE) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str) -> None:
+        self._send(status, json.dumps({"error": message}).encode())
+
+    def do_GET(self) -> None:
+        if self.path != "/health":
+            self._send_error(404, f"unknown path {self.path}")
+            return
+        batcher = self.server.batcher
+        status = {"status": "ok", "batches": batcher.batches, "pairs": batcher.pairs}
+        self._send(200, json.dumps(status).encode())
+
+    def do_POST(self) -> None:
+        if self.path != "/score":
+            self._send_error(404, f"unknown path {self.path}")
+            return
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip()
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        start = time.perf_counter()
+        try:
+            df = prepare_inputs(read_pairs(body, content_type))
+            features = self.server.batcher.score(df) if len(df) else prepare_export(df)
+        except (ValueError, KeyError, pa.ArrowInvalid) as exc:
+            self._send_error(400, str(exc))
+            return
+        except Exception as exc:
+            self._send_error(500, f"{type(exc).__name__}: {exc}")
+            return
+        response_type = ARROW_CONTENT_TYPE if content_type == ARROW_CONTENT_TYPE else JSON_CONTENT_TYPE
+        self.log_message("scored %d pairs in %.1f ms", len(df), (time.perf_counter() - start) * 1e3)
+        self._send(200, write_features(features, response_type), response_type)
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, batcher: MicroBatcher, *, verbose: bool = False):
+        self.batcher = batcher
+        self.verbose = verbose
+        super().__init__(address, ScoringHandler)
+
+
+class UnixScoringServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, path: str | Path, batcher: MicroBatcher, *, verbose: bool = False):
+        self.batcher = batcher
+        self.verbose = verbose
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(str(path), ScoringHandler)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Score paper-patent pairs with warm models")
+    parser.add_argument(
+        "--ipc-technology-xlsx",
+        required=True,
+        help="Path to external ipc_technology.xlsx mapping file",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (HTTP).")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (HTTP).")
+    parser.add_argument("--socket", help="Listen on this Unix socket instead of HTTP over TCP.")
+    parser.add_argument(
+        "--max-batch-rows",
+        type=int,
+        default=2048,
+        help="Close a micro-batch once it holds this many pairs.",
+    )
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=5.0,
+        help="Wait at most this long for more requests to join a micro-batch.",
+    )
+    parser.add_argument(
+        "--embedding-backend",
+        default=DEFAULT_EMBEDDING_BACKEND,
+        choices=sorted(EMBEDDING_BACKENDS),
+        help="Embedding backend for semantic similarity (see publish.run_pipeline).",
+    )
+    parser.add_argument(
+        "--embedding-model-dir",
+        help="Local model directory (tokenizer.json + model.onnx) for the onnx backend.",
+    )
+    parser.add_argument(
+        "--embedding-quantize",
+        action="store_true",
+        help="For the onnx backend, create and use an int8-quantized model.",
+    )
+    parser.add_argument("--lemmatizer", default="spacy", choices=LEMMATIZERS)
+    parser.add_argument(
+        "--scoring-threads",
+        type=int,
+        default=1,
+        help="Threads for row-level scoring within a batch (see publish.run_pipeline).",
+    )
+    parser.add_argument(
+        "--entity-store",
+        help="Directory of the persistent paper/patent feature store to read and extend.",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    configure_embedding_backend(args.embedding_backend, **embedding_options_from_args(args))
+    configure_lemmatizer(args.lemmatizer)
+    configure_scoring_threads(args.scoring_threads)
+    seconds = warm_up(args.ipc_technology_xlsx)
+    entity_store = EntityStore(args.entity_store) if args.entity_store else None
+    batcher = MicroBatcher(
+        ipc_technology_xlsx=args.ipc_technology_xlsx,
+        entity_store=entity_store,
+        max_rows=args.max_batch_rows,
+        max_wait=args.max_wait_ms / 1000,
+    )
+    if args.socket:
+        server = UnixScoringServer(args.socket, batcher, verbose=args.verbose)
+        where = f"unix:{args.socket}"
+    else:
+        server = ScoringServer((args.host, args.port), batcher, verbose=args.verbose)
+        where = f"http://{args.host}:{args.port}"
+    print(f"serve: listening on {where} warmup={seconds:.1f}s")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if entity_store is not None:
+            entity_store.flush()
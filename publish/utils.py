@@ -2,30 +2,45 @@
 from __future__ import annotations
 
 import ast
+import json
+import operator
 import re
+from itertools import chain, repeat
 from typing import Iterable, List, Optional, Sequence
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
 _ILLEGAL_EXCEL_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
 
 
-def require_columns(df: pd.DataFrame, columns: Sequence[str], *, context: str) -> None:
+def require_columns(df: pd.DataFrame | pa.Table, columns: Sequence[str], *, context: str) -> None:
     """Fail fast if any required columns are missing."""
-    missing = [c for c in columns if c not in df.columns]
+    present = df.column_names if isinstance(df, pa.Table) else df.columns
+    missing = [c for c in columns if c not in present]
     if missing:
         raise ValueError(f"{context}: missing required columns: {', '.join(missing)}")
 
 
-def decode_list(value):
-    """Decode a stringified list into a Python list when possible."""
+def decode_list(value, delimiter: Optional[str] = None):
+    """Decode a stringified list into a Python list when possible.
+
+    Accepts Python list literals and JSON arrays. With `delimiter`, strings are instead
+    split on it, reading back the `delimited` CSV list format.
+    """
     if isinstance(value, list):
         return value
+    if isinstance(value, np.ndarray):
+        # Native parquet list cells arrive as (possibly nested) arrays.
+        return [decode_list(v) if isinstance(v, np.ndarray) else v for v in value.tolist()]
     if value is None or (isinstance(value, float) and np.isnan(value)):
         return pd.NA
     if not isinstance(value, str):
         return pd.NA
+    if delimiter is not None:
+        return value.split(delimiter) if value else []
 
     s = value.strip()
     if not (s.startswith("[") and s.endswith("]")):
@@ -33,13 +48,51 @@ def decode_list(value):
 
     try:
         parsed = ast.literal_eval(s)
-        return parsed if isinstance(parsed, list) else pd.NA
     except Exception:
-        return pd.NA
+        try:
+            # JSON arrays with null/true/false
+            parsed = json.loads(s)
+        except ValueError:
+            return pd.NA
+    return parsed if isinstance(parsed, list) else pd.NA
+
+
+def is_arrow_list(series: pd.Series) -> bool:
+    """True for an Arrow-backed column of native lists (`pd.ArrowDtype(pa.list_(...))`)."""
+    if not isinstance(series.dtype, pd.ArrowDtype):
+        return False
+    arrow_type = series.dtype.pyarrow_dtype
+    return pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type)
+
+
+def to_python_objects(series: pd.Series) -> pd.Series:
+    """Convert an Arrow-backed column to the form the per-row stages expect.
+
+    List columns become Python lists with pd.NA for missing lists (as `decode_list`
+    produces); other columns get the default Arrow-to-pandas dtypes. Columns that are
+    not Arrow-backed are returned unchanged.
+    """
+    if not isinstance(series.dtype, pd.ArrowDtype):
+        return series
+    arr = pa.chunked_array(pa.array(series.array))
+    if is_arrow_list(series):
+        cells = np.empty(len(arr), dtype=object)
+        cells[:] = [pd.NA if cell is None else cell for cell in arr.to_pylist()]
+        return pd.Series(cells, index=series.index, name=series.name)
+    return pd.Series(arr.to_pandas(), index=series.index, name=series.name)
+
+
+def python_object_columns(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    """Replace any Arrow-backed `columns` of `df` with `to_python_objects` in place."""
+    for column in columns:
+        if column in df.columns and isinstance(df[column].dtype, pd.ArrowDtype):
+            df[column] = to_python_objects(df[column])
+    return df
 
 
 def normalize_list_column(df: pd.DataFrame, column: str) -> pd.DataFrame:
-    if column in df.columns:
+    # Native Arrow list columns are already decoded; keep them in their Arrow buffers.
+    if column in df.columns and not is_arrow_list(df[column]):
         df[column] = df[column].apply(decode_list)
     return df
 
@@ -50,6 +103,11 @@ def normalize_list_columns(df: pd.DataFrame, columns: Sequence[str]) -> pd.DataF
     return df
 
 
+def from_entity_store(df: pd.DataFrame, column: str) -> bool:
+    """True when `column` was attached by `publish.prep.entity_store` and can be reused."""
+    return column in df.attrs.get("entity_features", ())
+
+
 def safe_len(value) -> Optional[int]:
     if isinstance(value, list):
         return len(value)
@@ -65,6 +123,119 @@ def mean_or_nan(values: Optional[Iterable]) -> float:
     return float(np.mean(numeric))
 
 
+def arrow_list_array(series: pd.Series) -> Optional[pa.Array]:
+    """View a decoded list column (lists or missing values) as an Arrow list array.
+
+    Returns None when the column cannot be represented as one Arrow list type (e.g.
+    undecoded strings mixed with lists); callers then fall back to per-cell helpers.
+    """
+    values = series.array if isinstance(series.dtype, pd.ArrowDtype) else series.to_numpy(dtype=object)
+    try:
+        arr = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return None
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    if pa.types.is_null(arr.type) or pa.types.is_list(arr.type) or pa.types.is_large_list(arr.type):
+        return arr
+    return None
+
+
+def list_lengths(series: pd.Series) -> pd.Series:
+    """Vectorized `series.apply(safe_len)`: list length, pd.NA for missing lists."""
+    arr = arrow_list_array(series)
+    if arr is None:
+        return series.apply(safe_len)
+    if pa.types.is_null(arr.type):
+        lengths = pd.array([pd.NA] * len(arr), dtype="Int64")
+    else:
+        lengths = pd.array(pc.list_value_length(arr).to_pandas(), dtype="Int64")
+    # Same dtypes as `apply`: int64 when every row is a list, object ints + pd.NA otherwise.
+    if lengths.isna().any() or not len(lengths):
+        lengths = lengths.astype(object)
+    else:
+        lengths = lengths.astype("int64")
+    return pd.Series(lengths, index=series.index, name=series.name)
+
+
+def list_means(series: pd.Series) -> pd.Series:
+    """Vectorized `series.apply(mean_or_nan)`.
+
+    Means are taken over the flattened list values grouped by their parent row, with
+    None/NaN elements ignored; empty, all-missing and missing lists give NaN.
+    """
+    arr = arrow_list_array(series)
+    if arr is not None and not pa.types.is_null(arr.type):
+        value_type = arr.type.value_type
+        numeric = pa.types.is_integer(value_type) or pa.types.is_floating(value_type)
+        if not (numeric or pa.types.is_null(value_type)):
+            arr = None
+    if arr is None:
+        return series.apply(mean_or_nan)
+
+    n = len(arr)
+    means = np.full(n, np.nan)
+    if not pa.types.is_null(arr.type) and not pa.types.is_null(arr.type.value_type):
+        values = pc.list_flatten(arr).cast(pa.float64()).to_numpy(zero_copy_only=False)
+        parents = pc.list_parent_indices(arr).to_numpy()
+        valid = ~np.isnan(values)
+        sums = np.bincount(parents[valid], weights=values[valid], minlength=n)
+        counts = np.bincount(parents[valid], minlength=n)
+        has_values = counts > 0
+        means[has_values] = sums[has_values] / counts[has_values]
+    return pd.Series(means, index=series.index, name=series.name)
+
+
+def explode_list_column(series: pd.Series) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Flatten a decoded list column.
+
+    Returns `(is_list, values, parents)`: a per-row mask of list cells (any other cell,
+    such as a missing value or an undecoded string, counts as not a list), the concatenated
+    list elements as an object array, and the row position each element came from.
+    Arrow-backed list columns are flattened without building per-row Python lists.
+    """
+    if is_arrow_list(series):
+        arr = pa.chunked_array(pa.array(series.array)).combine_chunks()
+        flat = pc.list_flatten(arr)
+        if pa.types.is_string(flat.type) or pa.types.is_large_string(flat.type):
+            values = flat.to_numpy(zero_copy_only=False)
+        else:
+            values = np.empty(len(flat), dtype=object)
+            values[:] = flat.to_pylist()
+        is_list = arr.is_valid().to_numpy(zero_copy_only=False)
+        parents = pc.list_parent_indices(arr).to_numpy().astype(np.int64, copy=False)
+        return is_list, values, parents
+
+    cells = series.to_numpy(dtype=object)
+    is_list = np.fromiter((isinstance(cell, list) for cell in cells), dtype=bool, count=len(cells))
+    lists = cells[is_list]
+    lengths = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+    values = np.fromiter(chain.from_iterable(lists), dtype=object, count=int(lengths.sum()))
+    parents = np.repeat(np.flatnonzero(is_list), lengths)
+    return is_list, values, parents
+
+
+def is_identical(values: np.ndarray, obj) -> np.ndarray:
+    """Elementwise `value is obj` over an object array."""
+    return np.fromiter(map(operator.is_, values, repeat(obj)), dtype=bool, count=len(values))
+
+
+def count_distinct_per_row(parents: np.ndarray, codes: np.ndarray, n_rows: int) -> np.ndarray:
+    """Number of distinct integer `codes` per row, given each code's row in `parents`."""
+    if not len(codes):
+        return np.zeros(n_rows, dtype=np.int64)
+    width = int(codes.max()) + 1
+    pairs = np.unique(parents.astype(np.int64) * width + codes)
+    return np.bincount(pairs // width, minlength=n_rows)
+
+
+def masked_result(values: np.ndarray, mask: np.ndarray, index: pd.Index) -> pd.Series:
+    """`values` where `mask`, pd.NA elsewhere, with the dtype a per-row `apply` would infer."""
+    out = np.full(len(mask), pd.NA, dtype=object)
+    out[mask] = np.asarray(values, dtype=object)[mask]
+    return pd.Series(out, index=index).infer_objects()
+
+
 def strip_illegal_excel_chars(value):
     if isinstance(value, str):
         return _ILLEGAL_EXCEL_RE.sub("", value)
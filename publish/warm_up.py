@@ -0,0 +1,76 @@
+"""Load the pipeline's models and lookup tables before the first row needs them.
+
+The lemmatizer, the embedding model and the IPC mapping are loaded lazily (and cached)
+by the stages that use them. `start_warm_up` loads them on background threads instead,
+so they load while the input parquet is read and prepared; `WarmUp.wait` is called
+just before the feature stages and reports how long each resource took.
+"""
+from __future__ import annotations
+
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from publish.features.patent_classification import ipc_code_to_sector_map
+from publish.scores import encode_texts, load_lemmatizer
+
+
+def _timed(load, *args) -> float:
+    start = time.perf_counter()
+    load(*args)
+    return time.perf_counter() - start
+
+
+def _load_embedding_model() -> None:
+    encode_texts(["Warming up the embedding model."])
+
+
+class WarmUp:
+    """Resources loading in the background; see `start_warm_up`."""
+
+    def __init__(self, futures: dict[str, Future], started: float):
+        self._futures = futures
+        self._started = started
+
+    def wait(self, context: str = "warm_up") -> dict[str, float | None]:
+        """Block until every resource is loaded; print and return the seconds each took.
+
+        A resource whose optional dependency is missing is reported as unavailable
+        (None); the stage that needs it handles that as it would without warm-up.
+        Other loading errors are raised.
+        """
+        wait_start = time.perf_counter()
+        seconds: dict[str, float | None] = {}
+        for name, future in self._futures.items():
+            try:
+                seconds[name] = future.result()
+            except ImportError:
+                seconds[name] = None
+        waited = time.perf_counter() - wait_start
+        loaded = " ".join(
+            f"{name}={'unavailable' if value is None else f'{value:.2f}s'}"
+            for name, value in seconds.items()
+        )
+        print(
+            f"{context}: {loaded} total={time.perf_counter() - self._started:.2f}s "
+            f"waited={waited:.2f}s"
+        )
+        return seconds
+
+
+def start_warm_up(ipc_technology_xlsx: str | Path) -> WarmUp:
+    """Start loading the configured lemmatizer, embedding backend and IPC mapping.
+
+    Call it after `configure_lemmatizer` and `configure_embedding_backend`, so the
+    configured implementations are the ones loaded.
+    """
+    started = time.perf_counter()
+    loads = {
+        "ipc_map": (ipc_code_to_sector_map, str(ipc_technology_xlsx)),
+        "lemmatizer": (load_lemmatizer,),
+        "embedding": (_load_embedding_model,),
+    }
+    executor = ThreadPoolExecutor(max_workers=len(loads), thread_name_prefix="warm-up")
+    futures = {name: executor.submit(_timed, *load) for name, load in loads.items()}
+    executor.shutdown(wait=False)
+    return WarmUp(futures, started)